@@ -0,0 +1,132 @@
+"""Compară extragerea paragrafelor: calea veche (html.parser, arbore complet) cu cea nouă.
+
+Timpii se raportează separat fără limită de octeți (același conținut parsat) și cu limita
+SCRAPER_MAX_PAGE_BYTES aplicată ca la citirea răspunsului. Secțiunea de fidelitate compară
+textul extras pe fragmente HTML malformate, pentru fiecare parser disponibil.
+
+Rulare din rădăcina proiectului:
+    python -m benchmarks.bench_extraction [--repeat 5] [--output rezultate.json]
+"""
+import json
+import time
+import argparse
+import statistics
+from bs4 import BeautifulSoup
+
+from server.scripts.web_scraper import extract_paragraph_text, HTML_PARSER, MAX_PAGE_BYTES
+
+PAGE_SIZES_KB = [50, 500, 2000, 8000]
+
+SCRIPT_BLOCK = "<script>window.__STATE__ = {" + ",".join(f'"k{i}": "{"x" * 40}"' for i in range(50)) + "};</script>\n"
+PARAGRAPH = ("<p>The central bank said on Tuesday that inflation in the euro area slowed again, "
+             "giving policymakers more room to <a href='#'>cut rates</a> later this year.</p>\n")
+NOISE = "<div class='widget'><ul>" + "".join(f"<li><a href='/s/{i}'>Story {i}</a></li>" for i in range(20)) + "</ul></div>\n"
+HEAD_SCRIPTS = 10
+
+# HTML malformat întâlnit în pagini reale; parserele îl repară diferit
+MALFORMED = {
+    'div_in_p': '<p>x<div>y</div>z</p>',
+    'table_in_p': '<p>a<table><tr><td>b</td></tr></table>c</p>',
+    'list_in_p': '<p>a<ul><li>b</li></ul>c</p>',
+    'unclosed_p': '<p>one<p>two<p>three',
+    'nested_p': '<p>a<p>b</p>c</p>',
+    'p_in_inline': '<span><p>a</p></span>',
+    'entities': '<p>a &amp; b &nbsp;c</p>',
+    'script_in_p': '<p>a<script>var x = 1;</script>b</p>',
+}
+
+def build_page(size_kb):
+    # Pagini tipice de știri: câteva scripturi în <head>, apoi paragrafe amestecate cu widget-uri
+    # și scripturi inline, astfel încât paragrafele sunt distribuite uniform în toată pagina
+    target = size_kb * 1024
+    parts = ["<html><head><title>News</title>", SCRIPT_BLOCK * HEAD_SCRIPTS, "</head><body>"]
+    unit = PARAGRAPH * 3 + NOISE + SCRIPT_BLOCK
+    size = sum(len(part) for part in parts)
+    while size < target:
+        parts.append(unit)
+        size += len(unit)
+    parts.append("</body></html>")
+    return "".join(parts).encode('utf-8')
+
+def baseline_extract(content):
+    soup = BeautifulSoup(content, 'html.parser')
+    paragraphs = soup.find_all('p')
+    return ' '.join([para.get_text() for para in paragraphs])
+
+def fast_extract(content):
+    return extract_paragraph_text(content)
+
+def fast_extract_capped(content):
+    # Echivalentul căii de producție: limita de octeți aplicată la citire, apoi parserul restricționat la <p>
+    return extract_paragraph_text(content[:MAX_PAGE_BYTES])
+
+def measure(func, content, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+def fidelity():
+    parsers = ['html.parser'] + ([HTML_PARSER] if HTML_PARSER != 'html.parser' else [])
+    rows = []
+    for name, html in MALFORMED.items():
+        expected = baseline_extract(html)
+        outputs = {parser: extract_paragraph_text(html, parser) for parser in parsers}
+        rows.append({
+            'fixture': name,
+            'baseline': expected,
+            'outputs': outputs,
+            'same': {parser: text == expected for parser, text in outputs.items()}
+        })
+    return rows
+
+def run(repeat):
+    rows = []
+    for size_kb in PAGE_SIZES_KB:
+        content = build_page(size_kb)
+        baseline_seconds, baseline_text = measure(baseline_extract, content, repeat)
+        fast_seconds, fast_text = measure(fast_extract, content, repeat)
+        capped_seconds, capped_text = measure(fast_extract_capped, content, repeat)
+        rows.append({
+            'page_kb': len(content) // 1024,
+            'capped': len(content) > MAX_PAGE_BYTES,
+            'baseline_ms': round(baseline_seconds * 1000, 2),
+            # Același conținut parsat de ambele căi: câștigul vine doar din parser și SoupStrainer
+            'fast_ms': round(fast_seconds * 1000, 2),
+            'speedup': round(baseline_seconds / fast_seconds, 2) if fast_seconds else None,
+            'same_text': baseline_text == fast_text,
+            # Cu limita de octeți: peste ea se parsează mai puțin text, deci timpii nu mai sunt comparabili
+            'capped_ms': round(capped_seconds * 1000, 2),
+            'capped_text_ratio': round(len(capped_text) / len(baseline_text), 3) if baseline_text else None
+        })
+    return {'parser': HTML_PARSER, 'max_page_bytes': MAX_PAGE_BYTES, 'repeat': repeat,
+            'results': rows, 'fidelity': fidelity()}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--output', help='fișier JSON în care se salvează rezultatele')
+    args = parser.parse_args()
+
+    report = run(args.repeat)
+    print(f"Parser: {report['parser']}, limită: {report['max_page_bytes']} octeți")
+    print(f"{'KB':>8} {'vechi (ms)':>12} {'nou (ms)':>10} {'accelerare':>11} {'identic':>8} "
+          f"{'cu limită (ms)':>15} {'text păstrat':>13}")
+    for row in report['results']:
+        print(f"{row['page_kb']:>8} {row['baseline_ms']:>12} {row['fast_ms']:>10} {row['speedup']:>11} "
+              f"{str(row['same_text']):>8} {row['capped_ms']:>15} {row['capped_text_ratio']:>13}")
+
+    print("\nFidelitate pe HTML malformat (față de html.parser cu arbore complet):")
+    for row in report['fidelity']:
+        outputs = ', '.join(f"{parser}={text!r}" for parser, text in row['outputs'].items())
+        print(f"  {row['fixture']:>12}: vechi={row['baseline']!r}, {outputs}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, ensure_ascii=False)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Timpul și memoria maximă (RSS) a preprocesării în funcție de mărimea textului unei pagini.
+
+Compară calea veche (un singur nlp(text) pe tot textul) cu preprocesarea pe bucăți.
+Fiecare măsurătoare rulează într-un proces Python nou, ca vârful de memorie să fie al ei.
+Rulare din rădăcina proiectului:
+    python -m benchmarks.bench_large_pages [--sizes-kb 50 500 2000 8000] [--output rezultate.json]
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+PAGE_SIZES_KB = [50, 500, 2000, 8000]
+
+PROBE = """
+import hashlib, json, random, resource, time
+from server.scripts import preprocess
+from benchmarks.fixtures import TOPIC_WORDS
+
+def build_text(size):
+    # Text de știri determinist, cu propoziții de lungimi variate
+    rng = random.Random(size)
+    words = ' '.join(TOPIC_WORDS.values()).split()
+    sentences = []
+    length = 0
+    while length < size:
+        sentence = ' '.join(rng.choice(words) for _ in range(rng.randint(8, 25))).capitalize() + '.'
+        sentences.append(sentence)
+        length += len(sentence) + 1
+    return ' '.join(sentences)
+
+def baseline(text):
+    # Calea dinaintea împărțirii pe bucăți
+    nlp = preprocess.get_nlp()
+    return ' '.join(preprocess._filter_words(nlp(preprocess._clean(text)), preprocess.get_stop_words()))
+
+preprocess.get_nlp()
+preprocess.get_stop_words()
+text = build_text({size})
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+try:
+    output = {func}(text)
+    error = None
+except Exception as e:
+    output, error = '', str(e).splitlines()[0]
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': round(elapsed, 3),
+    'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    'rss_growth_mb': round((resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before) / 1024, 1),
+    'output_words': len(output.split()),
+    'output_hash': hashlib.sha256(output.encode('utf-8')).hexdigest() if not error else None,
+    'error': error
+}}))
+"""
+
+def measure(size, func):
+    code = PROBE.format(size=size, func=func)
+    completed = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True)
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr else 'proces eșuat'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run(sizes_kb):
+    rows = []
+    for size_kb in sizes_kb:
+        size = size_kb * 1024
+        old = measure(size, 'baseline')
+        new = measure(size, 'preprocess.preprocess_text')
+        rows.append({
+            'text_kb': size_kb,
+            'baseline': old,
+            'chunked': new,
+            # Sub pragul de împărțire, rezultatul trebuie să fie identic
+            'same_output': (old.get('output_hash') == new.get('output_hash')) if not old.get('error') else None
+        })
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes-kb', type=int, nargs='+', default=PAGE_SIZES_KB)
+    parser.add_argument('--output', help='fișier JSON în care se salvează rezultatele')
+    args = parser.parse_args()
+
+    from server.scripts.preprocess import CHUNK_THRESHOLD, CHUNK_CHARS, MAX_CHARS, MAX_TOKENS
+    report = {
+        'chunk_threshold': CHUNK_THRESHOLD,
+        'chunk_chars': CHUNK_CHARS,
+        'max_chars': MAX_CHARS,
+        'max_tokens': MAX_TOKENS,
+        'results': run(args.sizes_kb)
+    }
+    print(f"{'KB':>6} {'vechi (s)':>10} {'vechi RSS':>10} {'nou (s)':>9} {'nou RSS':>9} {'identic':>8}")
+    for row in report['results']:
+        old, new = row['baseline'], row['chunked']
+        print(f"{row['text_kb']:>6} {str(old.get('seconds', old.get('error')))[:10]:>10} {str(old.get('peak_rss_mb')):>10} "
+              f"{str(new.get('seconds', new.get('error')))[:9]:>9} {str(new.get('peak_rss_mb')):>9} {str(row['same_output']):>8}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Măsoară timpul de import al aplicației și memoria (RSS) unui proces worker.
+
+Fiecare scenariu rulează într-un proces Python nou, ca importurile să nu fie deja în cache.
+Rulare din rădăcina proiectului:
+    python -m benchmarks.bench_startup [--output rezultate.json]
+"""
+import sys
+import json
+import argparse
+import subprocess
+
+SCENARIOS = {
+    # Ce plătește un worker la pornire
+    'import_app': "import server.main",
+    # Ce plătește prima cerere /predict dacă nu există preload
+    'import_app_and_warmup': "import server.main\nfrom server.scripts.warmup import warmup\nwarmup()",
+}
+
+PROBE = """
+import json, time, resource, sys
+start = time.perf_counter()
+{code}
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': round(elapsed, 3),
+    'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    'heavy_modules_loaded': [m for m in ('spacy', 'sklearn', 'pandas', 'nltk', 'scipy') if m in sys.modules]
+}}))
+"""
+
+def run_scenario(code):
+    output = subprocess.run([sys.executable, '-c', PROBE.format(code=code)],
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--output', help='fișier JSON în care se salvează rezultatele')
+    args = parser.parse_args()
+
+    report = {}
+    for name, code in SCENARIOS.items():
+        try:
+            report[name] = run_scenario(code)
+        except subprocess.CalledProcessError as e:
+            report[name] = {'error': e.stderr.strip().splitlines()[-1] if e.stderr else str(e)}
+        print(f"{name}: {report[name]}")
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2)
+
+if __name__ == '__main__':
+    main()
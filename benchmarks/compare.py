@@ -0,0 +1,67 @@
+"""Compară două rulări ale run_benchmarks și afișează diferențele relative.
+
+Rulare din rădăcina proiectului:
+    python -m benchmarks.compare benchmarks/results/vechi.json benchmarks/results/nou.json
+"""
+import json
+import argparse
+
+# Metricile pentru care o valoare mai mare înseamnă o îmbunătățire
+HIGHER_IS_BETTER = ('per_sec',)
+
+
+def flatten(report, prefix=''):
+    values = {}
+    if isinstance(report, dict):
+        for key, value in report.items():
+            if key == 'metadata':
+                continue
+            values.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(report, list):
+        for item in report:
+            # Rândurile din tabele sunt identificate după primul câmp (de ex. batch_size)
+            label = next(iter(item.items()))
+            values.update(flatten({k: v for k, v in item.items() if k != label[0]}, f"{prefix}{label[0]}={label[1]}."))
+    elif isinstance(report, (int, float)) and not isinstance(report, bool):
+        values[prefix.rstrip('.')] = report
+    return values
+
+
+def compare(old, new, threshold):
+    old_values, new_values = flatten(old), flatten(new)
+    rows = []
+    for name in sorted(old_values.keys() & new_values.keys()):
+        before, after = old_values[name], new_values[name]
+        change = (after - before) / before if before else None
+        regression = False
+        if change is not None and not name.endswith(('count', 'rows', 'documents', 'avg_chars', 'batch_size')):
+            better_when_higher = name.endswith(HIGHER_IS_BETTER)
+            regression = (change < -threshold) if better_when_higher else (change > threshold)
+        rows.append((name, before, after, change, regression))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='variația relativă peste care o metrică este marcată ca regresie')
+    args = parser.parse_args()
+
+    with open(args.old) as old_file, open(args.new) as new_file:
+        old, new = json.load(old_file), json.load(new_file)
+
+    print(f"vechi: {old['metadata'].get('git_commit')} ({old['metadata'].get('timestamp')})")
+    print(f"nou:   {new['metadata'].get('git_commit')} ({new['metadata'].get('timestamp')})")
+    regressions = 0
+    for name, before, after, change, regression in compare(old, new, args.threshold):
+        marker = 'REGRESIE' if regression else ''
+        change_text = f"{change:+.1%}" if change is not None else 'n/a'
+        print(f"{name:<50} {before:>12} {after:>12} {change_text:>9} {marker}")
+        regressions += regression
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Infrastructură offline pentru benchmark-uri: server HTTP local cu pagini de știri și MongoDB în memorie."""
+import os
+import glob
+import zlib
+import random
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+TOPIC_WORDS = {
+    'SCIENCE': "researchers study species climate laboratory experiment cell molecule astronomer telescope "
+               "fossil genome particle physics chemistry ocean planet discovery evolution scientist data",
+    'TECHNOLOGY': "software smartphone startup chip processor cloud device app platform algorithm network "
+                  "developer security update battery browser robot computer internet feature",
+    'BUSINESS': "market shares investor revenue profit company stock quarter earnings economy bank inflation "
+                "merger deal price growth customer retail industry forecast",
+    'HEALTH': "patient hospital vaccine doctor disease treatment virus symptom study trial medicine infection "
+              "health care nurse therapy diet risk clinic dose",
+    'WORLD': "government minister election president country border protest military parliament official "
+             "treaty crisis refugee capital policy leader region embassy sanction",
+    'ENTERTAINMENT': "film movie actor actress album singer show series festival director star premiere "
+                     "music concert award fan song streaming episode celebrity",
+    'SPORTS': "team match season coach player goal league championship game tournament victory score "
+              "club fan stadium injury transfer final cup",
+}
+
+COMMON_WORDS = "new year week report people time world day way part number group week city plan issue".split()
+
+SCRIPT_BLOCK = "<script>window.__AD_CONFIG__ = {" + ",".join(f'"slot{i}": "{"x" * 30}"' for i in range(30)) + "};</script>"
+NAV = "<nav><ul>" + "".join(f"<li><a href='/section/{i}'>Section {i}</a></li>" for i in range(15)) + "</ul></nav>"
+
+
+def synthetic_page(topic, seed, paragraphs=20):
+    """Pagină de știri deterministă pentru (topic, seed), cu structura tipică a site-urilor reale."""
+    rng = random.Random(f"{topic}-{seed}")
+    topic_words = TOPIC_WORDS.get(topic, TOPIC_WORDS['WORLD']).split()
+    body = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(2, 4)):
+            words = [rng.choice(topic_words if rng.random() < 0.6 else COMMON_WORDS) for _ in range(rng.randint(8, 18))]
+            sentences.append(' '.join(words).capitalize() + '.')
+        body.append(f"<p>{' '.join(sentences)}</p>")
+    return (f"<html><head><title>{topic.title()} news {seed}</title>{SCRIPT_BLOCK * 5}</head>"
+            f"<body>{NAV}<article>{''.join(body)}</article><footer><p>Copyright</p></footer></body></html>").encode('utf-8')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        recorded = self.server.recorded_pages
+        if parts.path.startswith('/recorded/') and recorded:
+            # Paginile înregistrate sunt servite circular, după indexul din URL
+            index = int(parts.path.rsplit('/', 1)[-1]) % len(recorded)
+            with open(recorded[index], 'rb') as page_file:
+                body = page_file.read()
+        elif parts.path.startswith('/news/'):
+            params = parse_qs(parts.query)
+            topic = params.get('topic', ['WORLD'])[0]
+            body = synthetic_page(topic, parts.path, int(params.get('paragraphs', [20])[0]))
+        else:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer:
+    """Server HTTP local pe 127.0.0.1; pornește într-un thread separat."""
+
+    def __init__(self, pages_dir=None):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.recorded_pages = sorted(glob.glob(os.path.join(pages_dir, '*.html'))) if pages_dir else []
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def news_url(self, topic, key, paragraphs=20):
+        if self.httpd.recorded_pages:
+            return f"{self.base_url}/recorded/{zlib.crc32(key.encode('utf-8'))}"
+        return f"{self.base_url}/news/{key}?topic={topic}&paragraphs={paragraphs}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def use_mongo_standin():
+    """Înlocuiește baza de date comună cu una în memorie (mongomock), fără server MongoDB."""
+    import mongomock
+    from server.scripts.database import Database, set_db
+
+    database = Database(client=mongomock.MongoClient(), write_behind=False)
+    set_db(database)
+    return database
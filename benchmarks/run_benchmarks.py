@@ -0,0 +1,211 @@
+"""Suita de benchmark-uri offline: preprocesare, /predict, /batch_predict și antrenarea pe data/training_data.csv.
+
+Paginile vin de la un server HTTP local (benchmarks/fixtures.py), iar MongoDB este înlocuit cu mongomock.
+Rulare din rădăcina proiectului:
+    python -m benchmarks.run_benchmarks [--train-limit 1000] [--output rezultate.json]
+    python -m benchmarks.compare vechi.json nou.json
+"""
+import os
+import io
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import datetime
+import subprocess
+
+# Configurația se fixează înaintea importului modulelor serverului, care o citesc la import
+WORK_DIR = tempfile.mkdtemp(prefix='bench-')
+os.environ.setdefault('MODELS_DIR', os.path.join(WORK_DIR, 'models'))
+os.environ.setdefault('CORPUS_CACHE_DIR', os.path.join(WORK_DIR, 'corpus_cache'))
+os.environ.setdefault('DB_WRITE_BEHIND', '0')
+# Toate paginile vin de la aceeași gazdă locală: limita per gazdă nu trebuie să fie cea de producție
+os.environ.setdefault('BATCH_FETCH_PER_HOST', os.getenv('BATCH_FETCH_WORKERS', '16'))
+
+import pandas as pd
+
+from benchmarks.fixtures import FixtureServer, TOPIC_WORDS, use_mongo_standin
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+PAGES_DIR = os.path.join(os.path.dirname(__file__), 'pages')
+TRAINING_CSV = os.path.join('data', 'training_data.csv')
+BATCH_SIZES = [1, 10, 50, 200]
+TOPICS = sorted(TOPIC_WORDS)
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    if not ordered:
+        return {}
+
+    def pick(q):
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    return {
+        'count': len(ordered),
+        'p50_ms': round(pick(0.50) * 1000, 2),
+        'p95_ms': round(pick(0.95) * 1000, 2),
+        'p99_ms': round(pick(0.99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+
+def bench_preprocessing(server, n_docs):
+    from server.scripts.web_scraper import fetch_paragraph_text
+    from server.scripts.preprocess import preprocess_text, preprocess_texts, get_nlp
+
+    get_nlp()
+    texts = [fetch_paragraph_text(server.news_url(TOPICS[i % len(TOPICS)], f"pre-{i}")) for i in range(n_docs)]
+
+    start = time.perf_counter()
+    for text in texts:
+        preprocess_text(text)
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preprocess_texts(texts)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        'documents': n_docs,
+        'avg_chars': sum(len(text) for text in texts) // max(n_docs, 1),
+        'preprocess_text_docs_per_sec': round(n_docs / single_seconds, 2),
+        'preprocess_texts_docs_per_sec': round(n_docs / batch_seconds, 2)
+    }
+
+
+def write_training_csv(server, limit):
+    # Aceleași topicuri și același număr de rânduri ca data/training_data.csv, cu linkurile pe serverul local
+    df = pd.read_csv(TRAINING_CSV)
+    if limit:
+        df = df.groupby('topic').head(max(limit // df['topic'].nunique(), 1))
+    df = df.reset_index(drop=True)
+    df['link'] = [server.news_url(topic, f"train-{idx}") for idx, topic in enumerate(df['topic'])]
+    path = os.path.join(WORK_DIR, 'training_data.csv')
+    df.to_csv(path, index=False)
+    return path, len(df)
+
+
+def bench_training(server, limit):
+    from server.scripts.model_training import process_csv
+
+    path, rows = write_training_csv(server, limit)
+    start = time.perf_counter()
+    stages = process_csv(path)
+    total = time.perf_counter() - start
+    return {
+        'rows': rows,
+        'total_seconds': round(total, 2),
+        'stages_seconds': {stage: round(seconds, 3) for stage, seconds in stages.items()}
+    }
+
+
+def bench_predict(client, server, n_requests):
+    uncached = []
+    cached = []
+    urls = [server.news_url(TOPICS[i % len(TOPICS)], f"predict-{i}") for i in range(n_requests)]
+
+    for url in urls:
+        start = time.perf_counter()
+        response = client.post('/predict', json={'url': url, 'user_id': 'bench'})
+        uncached.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+
+    # A doua trecere pe aceleași URL-uri este servită din cache
+    for url in urls:
+        start = time.perf_counter()
+        response = client.post('/predict', json={'url': url, 'user_id': 'bench'})
+        cached.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+
+    return {'uncached': percentiles(uncached), 'cached': percentiles(cached)}
+
+
+def bench_batches(client, server, batch_sizes):
+    rows = []
+    for size in batch_sizes:
+        urls = [server.news_url(TOPICS[i % len(TOPICS)], f"batch-{size}-{i}") for i in range(size)]
+        payload = '\n'.join(urls).encode('utf-8')
+        start = time.perf_counter()
+        response = client.post('/batch_predict', data={
+            'user_id': 'bench',
+            'file': (io.BytesIO(payload), 'urls.txt')
+        }, content_type='multipart/form-data')
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 200, response.get_json()
+        rows.append({
+            'batch_size': size,
+            'seconds': round(elapsed, 3),
+            'urls_per_sec': round(size / elapsed, 2)
+        })
+    return rows
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    report = {
+        'metadata': {
+            'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pages': 'recorded' if os.path.isdir(PAGES_DIR) and os.listdir(PAGES_DIR) else 'synthetic'
+        }
+    }
+
+    with FixtureServer(PAGES_DIR) as server:
+        use_mongo_standin()
+
+        print("Preprocesare...", file=sys.stderr)
+        report['preprocessing'] = bench_preprocessing(server, args.preprocess_docs)
+
+        # /predict are nevoie de un model publicat: antrenarea rulează înaintea benchmark-urilor de predicție
+        print("Antrenare (process_csv)...", file=sys.stderr)
+        report['training'] = bench_training(server, args.train_limit)
+
+        from server.main import app
+        client = app.test_client()
+
+        print("/predict...", file=sys.stderr)
+        report['predict'] = bench_predict(client, server, args.predict_requests)
+
+        print("/batch_predict...", file=sys.stderr)
+        report['batch'] = bench_batches(client, server, args.batch_sizes)
+
+    return report
+
+
+def default_output_path():
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    return os.path.join(RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%d_%H%M%S') + '.json')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--preprocess-docs', type=int, default=200)
+    parser.add_argument('--predict-requests', type=int, default=200)
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=BATCH_SIZES)
+    parser.add_argument('--train-limit', type=int, default=None,
+                        help='numărul aproximativ de rânduri din CSV folosite la antrenare (implicit toate)')
+    parser.add_argument('--output', help='fișierul JSON cu rezultatele (implicit benchmarks/results/<timestamp>.json)')
+    args = parser.parse_args()
+
+    report = run(args)
+    output = args.output or default_output_path()
+    with open(output, 'w') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(json.dumps(report, indent=2))
+    print(f"Rezultate salvate în {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
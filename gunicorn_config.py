@@ -1,2 +1,38 @@
+import os
+
 bind = '0.0.0.0:8080'
 workers = 4
+
+# Cu preload, aplicația și modulele NLP/ML se încarcă o singură dată în master
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') == '1'
+
+
+def on_starting(server):
+    # Metricile unei rulări anterioare nu se adună la cele noi
+    from server.scripts.metrics import clear_snapshots
+    clear_snapshots()
+
+
+def when_ready(server):
+    if preload_app:
+        from server.scripts.warmup import warmup
+        from server.scripts import metrics
+        warmup()
+        # Încărcarea din master este raportată o singură dată, din fișierul masterului
+        metrics.set_role('master')
+        metrics.flush()
+
+
+def post_fork(server, worker):
+    # Workerul pornește cu metricile goale, nu cu copia celor măsurate de master
+    from server.scripts import metrics
+    metrics.reset('worker')
+
+
+def worker_exit(server, worker):
+    # Golește scrierile din coada write-behind înainte ca workerul să se oprească
+    from server.scripts.database import write_buffer
+    write_buffer.close()
+    # Ultimele valori ale workerului rămân în /metrics după oprirea lui
+    from server.scripts.metrics import flush
+    flush()
@@ -1,15 +1,47 @@
-from flask import request, jsonify, send_file
+from flask import request, jsonify, send_file, Response, stream_with_context
 from flask_cors import cross_origin
 import os
+import hmac
+from functools import wraps
 
-from server.scripts.database import Database
+from server.scripts.database import get_db
 from server.scripts.prediction import predict_topic, batch_predict
-from server.scripts.model_training import process_csv, retrain_model
 from server.scripts.content_management import save_content, get_file_path
+from server.scripts.model_registry import list_versions, read_current_version, rollback_model
+from server.scripts.batch_jobs import submit_batch_job, get_batch_job_status, stream_ndjson, stream_sse
+from server.scripts.training_jobs import submit_csv_job, submit_retrain_job, get_training_job_status, list_training_jobs
+from server.scripts import metrics
+from server.scripts.fetch_policy import policy as fetch_policy
 
-from server.web_server import app
+from server.web_server import app, ADMIN_TOKEN
 
-db = Database()
+def admin_required(view):
+    # Token în antetul Authorization: Bearer <ADMIN_TOKEN>; fără ADMIN_TOKEN configurat ruta e dezactivată
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not ADMIN_TOKEN:
+            return jsonify({"success": False, "message": "Ruta administrativă este dezactivată (ADMIN_TOKEN nesetat)"}), 403
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8')):
+            return jsonify({"success": False, "message": "Token de administrare invalid"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+@app.before_request
+def start_request_timing():
+    metrics.start_request()
+
+@app.after_request
+def finish_request_timing(response):
+    server_timing = metrics.finish_request(request.endpoint)
+    if server_timing:
+        response.headers['Server-Timing'] = server_timing
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_route():
+    # Valorile tuturor workerilor gunicorn, în formatul text Prometheus
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/upload_csv', methods=['POST'])
 @cross_origin()
@@ -23,13 +55,14 @@ def upload_csv():
 
     if file:
         try:
-            file_path = 'uploaded_file.csv'
-            file.save(file_path)
-            process_csv(file_path)
-            return jsonify({"message": "CSV procesat și datele stocate în MongoDB"}), 200
+            # Antrenarea rulează în procesul trainer; aici fișierul doar se salvează și jobul intră în coadă.
+            # mode=streaming: antrenare pe bucăți, cu memorie constantă, pentru CSV-uri mari
+            streaming = request.form.get('mode', request.args.get('mode')) == 'streaming'
+            result, status_code = submit_csv_job(file, streaming, request.form.get('user_id'))
+            return jsonify(result), status_code
         except Exception as e:
-            app.logger.error(f"Eroare la procesarea CSV: {str(e)}")
-            return jsonify({"error": f"Eroare la procesarea CSV: {str(e)}"}), 500
+            app.logger.error(f"Eroare la încărcarea CSV: {str(e)}")
+            return jsonify({"error": f"Eroare la încărcarea CSV: {str(e)}"}), 500
     else:
         return jsonify({"error": "Niciun fișier încărcat"}), 400
 
@@ -42,6 +75,10 @@ def predict():
     result, status_code = predict_topic(url, user_id)
     return jsonify(result), status_code
 
+def _read_uploaded_urls():
+    content = request.files['file'].read().decode('utf-8')
+    return [url.strip() for url in content.split('\n') if url.strip()]
+
 @app.route('/batch_predict', methods=['POST'])
 @cross_origin()
 def batch_predict_route():
@@ -56,8 +93,7 @@ def batch_predict_route():
 
     if file:
         try:
-            content = file.read().decode('utf-8')
-            urls = [url.strip() for url in content.split('\n') if url.strip()]
+            urls = _read_uploaded_urls()
             
             result, status_code = batch_predict(urls, user_id)
             return jsonify(result), status_code
@@ -67,6 +103,42 @@ def batch_predict_route():
     else:
         return jsonify({"error": "Niciun fișier încărcat"}), 400
 
+@app.route('/batch_jobs', methods=['POST'])
+@cross_origin()
+def create_batch_job():
+    if 'file' not in request.files:
+        return jsonify({"error": "Nu există partea de fișier în cerere"}), 400
+
+    file = request.files['file']
+    user_id = request.form.get('user_id')
+
+    if file.filename == '':
+        return jsonify({"error": "Niciun fișier selectat"}), 400
+
+    try:
+        result, status_code = submit_batch_job(_read_uploaded_urls(), user_id)
+        return jsonify(result), status_code
+    except Exception as e:
+        app.logger.error(f"Eroare la crearea lotului: {str(e)}")
+        return jsonify({"error": f"Eroare la crearea lotului: {str(e)}"}), 500
+
+@app.route('/batch_jobs/<batch_id>', methods=['GET'])
+@cross_origin()
+def batch_job_status(batch_id):
+    result, status_code = get_batch_job_status(batch_id)
+    return jsonify(result), status_code
+
+@app.route('/batch_jobs/<batch_id>/results', methods=['GET'])
+@cross_origin()
+def batch_job_results(batch_id):
+    # SSE dacă clientul o cere (EventSource), altfel NDJSON; reluarea se face după cursor
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    if request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', ''):
+        return Response(stream_with_context(stream_sse(batch_id, cursor)), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    return Response(stream_with_context(stream_ndjson(batch_id, cursor)), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no'})
+
 @app.route('/save_content', methods=['POST'])
 @cross_origin()
 def save_content_route():
@@ -86,19 +158,39 @@ def download_content(filename):
     
     return send_file(filepath, as_attachment=True, download_name=os.path.basename(filepath))
 
+HISTORY_MAX_LIMIT = 500
+
 @app.route('/history', methods=['GET'])
-@cross_origin()
+@cross_origin(expose_headers=['X-Next-Cursor'])
 def get_history():
+    db = get_db()
     user_id = request.args.get('user_id')
-    limit = int(request.args.get('limit', 50))
-    
-    history = db.get_history(user_id, limit)
-    return jsonify(history), 200
+    limit = min(max(int(request.args.get('limit', 50)), 1), HISTORY_MAX_LIMIT)
+    # Textul preprocesat poate avea zeci de KB per intrare: se trimite doar la cerere
+    include_text = request.args.get('include_text') == '1'
+
+    try:
+        history, next_cursor = db.get_history(user_id, limit, request.args.get('cursor'), include_text)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    for item in history:
+        item['_id'] = str(item['_id'])
+        if 'timestamp' in item:
+            item['timestamp'] = item['timestamp'].isoformat()
+
+    # Corpul rămâne o listă, ca înainte; cursorul paginii următoare vine în antet.
+    # O pagină are cel mult HISTORY_MAX_LIMIT intrări, deci se serializează direct
+    response = jsonify(history)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
 
 
 @app.route('/history/<entry_id>', methods=['DELETE'])
 @cross_origin()
 def delete_history_entry(entry_id):
+    db = get_db()
     user_id = request.args.get('user_id')
 
     if not entry_id:
@@ -117,12 +209,27 @@ def delete_history_entry(entry_id):
 @app.route('/analytics', methods=['GET'])
 @cross_origin()
 def get_analytics():
+    db = get_db()
     user_id = request.args.get('user_id')
     days = int(request.args.get('days', 7))
     
     analytics = db.get_analytics(user_id, days)
     return jsonify(analytics), 200
 
+@app.route('/cache/stats', methods=['GET'])
+@cross_origin()
+def cache_stats():
+    db = get_db()
+    # Contoarele sunt per proces (worker gunicorn)
+    return jsonify(dict(db.cache_stats(), pid=os.getpid())), 200
+
+@app.route('/fetch_policy/hosts', methods=['GET'])
+@cross_origin()
+def fetch_policy_hosts():
+    # Starea circuitelor și timeout-urile derivate per domeniu; ca /cache/stats, sunt per proces
+    hosts = fetch_policy.snapshot(request.args.get('state'))
+    return jsonify({'pid': os.getpid(), 'hosts': hosts}), 200
+
 @app.route('/retrain_model', methods=['POST'])
 @cross_origin()
 def retrain_model_route():
@@ -136,13 +243,44 @@ def retrain_model_route():
 
         app.logger.info(f"Reantrenarea modelului cu {len(urls)} URL-uri pentru utilizatorul {user_id}")
         
-        success, message = retrain_model(urls, user_id)
-        return jsonify({"success": success, "message": message}), 200 if success else 500
+        result, status_code = submit_retrain_job(urls, user_id)
+        return jsonify(result), status_code
     
     except Exception as e:
         app.logger.error(f"Eroare în retrain_model: {str(e)}")
         return jsonify({"success": False, "message": f"Eroare de server: {str(e)}"}), 500
 
+@app.route('/training_jobs', methods=['GET'])
+@cross_origin()
+def training_jobs_list():
+    limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    result, status_code = list_training_jobs(request.args.get('status'), limit)
+    return jsonify(result), status_code
+
+@app.route('/training_jobs/<job_id>', methods=['GET'])
+@cross_origin()
+def training_job_status(job_id):
+    result, status_code = get_training_job_status(job_id)
+    return jsonify(result), status_code
+
+@app.route('/models', methods=['GET'])
+@cross_origin()
+def list_models():
+    return jsonify({"current": read_current_version(), "versions": list_versions()}), 200
+
+@app.route('/models/rollback', methods=['POST'])
+@cross_origin()
+@admin_required
+def rollback_model_route():
+    version = (request.json or {}).get('version')
+    if not version:
+        return jsonify({"success": False, "message": "Nu a fost specificată versiunea"}), 400
+    try:
+        rollback_model(version)
+        return jsonify({"success": True, "current": version}), 200
+    except ValueError as e:
+        return jsonify({"success": False, "message": str(e)}), 404
+
 
 if __name__ == '__main__':
     app.run(debug=False)
\ No newline at end of file
@@ -0,0 +1,194 @@
+import os
+import json
+import time
+import uuid
+import socket
+import datetime
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from bson.objectid import ObjectId
+from .database import get_db
+from .prediction import _predict_batch
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('BATCH_JOB_WORKERS', 2))
+JOB_CHUNK_SIZE = int(os.getenv('BATCH_JOB_CHUNK_SIZE', 25))
+# Un stream se închide după acest interval; clientul se reconectează cu ultimul cursor
+# (EventSource o face singur prin Last-Event-ID), astfel un worker sync nu e ținut ocupat
+STREAM_MAX_SECONDS = float(os.getenv('BATCH_STREAM_MAX_SECONDS', 20))
+STREAM_POLL_INTERVAL = float(os.getenv('BATCH_STREAM_POLL_INTERVAL', 1))
+# Rezultatele se citesc din history în pagini de atâtea rânduri
+STREAM_PAGE_SIZE = int(os.getenv('BATCH_STREAM_PAGE_SIZE', 500))
+# Un lot fără progres raportat atâta timp (worker oprit, timeout gunicorn) este preluat de alt worker;
+# trebuie să depășească durata unei bucăți (BATCH_FETCH_DEADLINE)
+STALE_SECONDS = float(os.getenv('BATCH_JOB_STALE_SECONDS', 900))
+RECLAIM_INTERVAL = float(os.getenv('BATCH_JOB_RECLAIM_INTERVAL', 60))
+MAX_ATTEMPTS = int(os.getenv('BATCH_JOB_MAX_ATTEMPTS', 3))
+
+TERMINAL_STATUSES = {'completed', 'failed'}
+
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='batch-job')
+_reclaimer = None
+_reclaimer_lock = threading.Lock()
+
+def _owner():
+    # Unic pentru fiecare rulare a unui lot, și în același proces: un lot preluat din nou
+    # nu mai poate fi continuat de rularea anterioară
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+def _run_job(batch_id, urls, user_id, worker, start=0):
+    db = get_db()
+    try:
+        # Lotul poate fi preluat de alt worker cât timp a așteptat în coada executorului
+        if not db.update_batch_job_progress(batch_id, worker, 0, []):
+            logger.info(f"Lotul {batch_id} este procesat de alt worker")
+            return
+        # Reluarea continuă după ultima bucată raportată; bucata în curs la oprire se procesează din nou
+        for chunk_start in range(start, len(urls), JOB_CHUNK_SIZE):
+            chunk = urls[chunk_start:chunk_start + JOB_CHUNK_SIZE]
+            results = _predict_batch(chunk, user_id, batch_id)
+            errors = [result for result in results if 'error' in result]
+            # Rândurile lotului trebuie să fie în history înainte ca progresul să le numere
+            db.flush()
+            if not db.update_batch_job_progress(batch_id, worker, len(chunk), errors):
+                logger.warning(f"Lotul {batch_id} a fost preluat de alt worker; procesarea locală se oprește")
+                return
+        db.finish_batch_job(batch_id, 'completed', worker=worker)
+        logger.info(f"Lotul {batch_id} a fost procesat ({len(urls)} URL-uri)")
+    except Exception as e:
+        logger.error(f"Eroare la procesarea lotului {batch_id}: {e}")
+        db.finish_batch_job(batch_id, 'failed', str(e), worker=worker)
+
+def reclaim_stale_jobs():
+    """Preia loturile rămase fără worker și le reia de la progresul salvat; întoarce câte au fost preluate."""
+    db = get_db()
+    stale_before = datetime.datetime.now() - datetime.timedelta(seconds=STALE_SECONDS)
+    reclaimed = 0
+    while True:
+        worker = _owner()
+        job = db.claim_stale_batch_job(worker, stale_before)
+        if job is None:
+            return reclaimed
+        if job['attempts'] > MAX_ATTEMPTS:
+            db.finish_batch_job(job['_id'], 'failed', f"Lotul a fost întrerupt de {job['attempts'] - 1} ori",
+                                worker=worker)
+            continue
+        logger.warning(f"Lotul {job['_id']} este reluat de la {job['processed']}/{job['total']} "
+                       f"(încercarea {job['attempts']})")
+        _executor.submit(_run_job, job['_id'], job['urls'], job['user_id'], worker, job['processed'])
+        reclaimed += 1
+
+def _reclaim_loop():
+    while True:
+        try:
+            reclaim_stale_jobs()
+        except Exception as e:
+            logger.warning(f"Eroare la preluarea loturilor întrerupte: {e}")
+        time.sleep(RECLAIM_INTERVAL)
+
+def _ensure_reclaimer():
+    # Pornit la prima folosire a loturilor în procesul curent, nu la import (înainte de fork)
+    global _reclaimer
+    with _reclaimer_lock:
+        if _reclaimer is None or not _reclaimer.is_alive():
+            _reclaimer = threading.Thread(target=_reclaim_loop, name='batch-job-reclaim', daemon=True)
+            _reclaimer.start()
+
+def submit_batch_job(urls, user_id=None):
+    db = get_db()
+    urls = [url for url in urls if url]
+    if not urls:
+        return {"error": "Nu au fost furnizate URL-uri"}, 400
+
+    _ensure_reclaimer()
+    batch_id = str(uuid.uuid4())
+    worker = _owner()
+    db.create_batch_job(batch_id, user_id, urls, worker)
+    _executor.submit(_run_job, batch_id, urls, user_id, worker)
+    return {'batch_id': batch_id, 'status': 'queued', 'total': len(urls)}, 202
+
+def _progress(job):
+    return {
+        'batch_id': job['_id'],
+        'status': job['status'],
+        'total': job['total'],
+        'processed': job['processed'],
+        'failed': job['failed'],
+        'succeeded': job['processed'] - job['failed'],
+        'message': job.get('message'),
+        'created_at': job['created_at'].isoformat(),
+        'finished_at': job['finished_at'].isoformat() if job.get('finished_at') else None
+    }
+
+def get_batch_job_status(batch_id):
+    db = get_db()
+    _ensure_reclaimer()
+    job = db.get_batch_job(batch_id)
+    if not job:
+        return {"error": "Lotul nu a fost găsit"}, 404
+    return _progress(job), 200
+
+def encode_cursor(last_id, errors_seen):
+    return f"{last_id or ''}.{errors_seen}"
+
+def decode_cursor(cursor):
+    # Cursorul are forma "<ultimul _id din history>.<numărul de erori deja trimise>"
+    if not cursor:
+        return None, 0
+    last_id, _, errors_seen = cursor.partition('.')
+    return (ObjectId(last_id) if last_id else None), int(errors_seen or 0)
+
+def iter_batch_events(batch_id, cursor=None):
+    """Generează evenimente (cursor, dict) pentru rezultatele noi ale unui lot, până la final sau timeout."""
+    db = get_db()
+    _ensure_reclaimer()
+    last_id, errors_seen = decode_cursor(cursor)
+    stop_at = time.monotonic() + STREAM_MAX_SECONDS
+
+    while True:
+        # Starea se citește înaintea rezultatelor: dacă lotul era deja terminat,
+        # toate rândurile sale din history sunt vizibile în citirea care urmează
+        job = db.get_batch_job(batch_id, with_errors=True)
+        if not job:
+            return
+
+        # Toate paginile disponibile: evenimentul final de progres vine abia după ultimul rezultat
+        while True:
+            rows = db.get_batch_results(batch_id, last_id, STREAM_PAGE_SIZE)
+            for row in rows:
+                last_id = row['_id']
+                yield encode_cursor(last_id, errors_seen), {
+                    'type': 'result',
+                    'url': row['url'],
+                    'predicted_topic': row.get('prediction', ''),
+                    'confidence': row.get('confidence')
+                }
+            if len(rows) < STREAM_PAGE_SIZE:
+                break
+
+        for error in job['errors'][errors_seen:]:
+            errors_seen += 1
+            yield encode_cursor(last_id, errors_seen), {
+                'type': 'error',
+                'url': error['url'],
+                'error': error['error']
+            }
+
+        finished = job['status'] in TERMINAL_STATUSES
+        yield encode_cursor(last_id, errors_seen), dict(_progress(job), type='progress')
+        if finished or time.monotonic() >= stop_at:
+            return
+        time.sleep(STREAM_POLL_INTERVAL)
+
+def stream_ndjson(batch_id, cursor=None):
+    for event_cursor, event in iter_batch_events(batch_id, cursor):
+        event['cursor'] = event_cursor
+        yield json.dumps(event, ensure_ascii=False) + '\n'
+
+def stream_sse(batch_id, cursor=None):
+    for event_cursor, event in iter_batch_events(batch_id, cursor):
+        yield f"id: {event_cursor}\nevent: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
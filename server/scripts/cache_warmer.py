@@ -0,0 +1,112 @@
+"""Reîmprospătează în avans intrările de cache ale URL-urilor populare, înainte să expire.
+
+URL-urile se ordonează după numărul de cereri recente din history; cele fără intrare în cache
+sau cu intrarea aproape de expirare se extrag și se prezic din nou, cu o rată limitată.
+
+Rulare din rădăcina proiectului (proces separat de gunicorn):
+    python -m server.scripts.cache_warmer [--once]
+"""
+import os
+import time
+import argparse
+import datetime
+import logging
+from .cache import normalize_url
+from .database import get_db
+from .prediction import _compute_keys
+from .single_flight import single_flight
+from . import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fereastra din history folosită pentru popularitate și câte URL-uri se urmăresc
+LOOKBACK_HOURS = float(os.getenv('WARM_LOOKBACK_HOURS', 24))
+TOP_N = int(os.getenv('WARM_TOP_N', 500))
+MIN_HITS = int(os.getenv('WARM_MIN_HITS', 2))
+# O intrare care expiră în mai puțin de atât este reîmprospătată
+REFRESH_BEFORE_SECONDS = float(os.getenv('WARM_REFRESH_BEFORE_SECONDS', 2 * 3600))
+# Rata maximă de reîmprospătare, ca să nu concureze cu traficul normal pentru site-uri și CPU
+RATE_PER_MINUTE = float(os.getenv('WARM_RATE_PER_MINUTE', 30))
+BATCH_SIZE = int(os.getenv('WARM_BATCH_SIZE', 10))
+INTERVAL_SECONDS = float(os.getenv('WARM_INTERVAL_SECONDS', 300))
+
+def select_candidates(db, now=None):
+    """URL-urile populare al căror cache lipsește sau expiră curând, în ordinea popularității."""
+    now = now or datetime.datetime.utcnow()
+    since = datetime.datetime.now() - datetime.timedelta(hours=LOOKBACK_HOURS)
+
+    # Variantele aceluiași URL (parametri de tracking etc.) se adună pe cheia normalizată,
+    # iar MIN_HITS și TOP_N se aplică sumelor; reprezentantul este varianta cea mai cerută
+    hits = {}
+    representative = {}
+    for url, count in db.get_popular_urls(since):
+        key = normalize_url(url)
+        hits[key] = hits.get(key, 0) + count
+        representative.setdefault(key, url)
+    popular = [key for key in sorted(hits, key=hits.get, reverse=True) if hits[key] >= MIN_HITS][:TOP_N]
+
+    expiry = db.get_cache_expiry([representative[key] for key in popular])
+    refresh_before = now + datetime.timedelta(seconds=REFRESH_BEFORE_SECONDS)
+    return [
+        representative[key] for key in popular
+        if expiry.get(representative[key]) is None or expiry[representative[key]] <= refresh_before
+    ]
+
+def refresh(urls):
+    """Extrage și prezice din nou URL-urile, în loturi, fără a depăși RATE_PER_MINUTE."""
+    db = get_db()
+    refreshed = failed = 0
+    for start in range(0, len(urls), BATCH_SIZE):
+        chunk = urls[start:start + BATCH_SIZE]
+        key_urls = {normalize_url(url): url for url in chunk}
+        started = time.perf_counter()
+        with metrics.timed('warm_refresh'):
+            # Prin single_flight: o cerere /predict simultană pentru același URL așteaptă acest calcul
+            outcomes = single_flight.run_many(list(key_urls), lambda keys: _compute_keys(keys, key_urls))
+        db.flush()
+        elapsed = time.perf_counter() - started
+
+        errors = sum(1 for outcome in outcomes.values() if 'error' in outcome)
+        refreshed += len(outcomes) - errors
+        failed += errors
+        metrics.inc('cache_warmer_refreshed_total', len(outcomes) - errors, result='ok')
+        metrics.inc('cache_warmer_refreshed_total', errors, result='error')
+        metrics.inc('cache_warmer_seconds_total', elapsed)
+        metrics.flush()
+
+        # Rata medie rămâne sub RATE_PER_MINUTE oricât de rapide ar fi extragerile
+        budget = len(chunk) * 60.0 / RATE_PER_MINUTE
+        if elapsed < budget:
+            time.sleep(budget - elapsed)
+    return refreshed, failed
+
+def run_once():
+    db = get_db()
+    candidates = select_candidates(db)
+    if not candidates:
+        logger.info("Nicio intrare de cache de reîmprospătat")
+        return 0, 0
+    started = time.perf_counter()
+    refreshed, failed = refresh(candidates)
+    logger.info(f"Cache reîmprospătat pentru {refreshed} URL-uri ({failed} eșecuri) "
+                f"în {time.perf_counter() - started:.1f}s")
+    return refreshed, failed
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--once', action='store_true', help='o singură trecere, apoi ieșire')
+    args = parser.parse_args()
+
+    while True:
+        started = time.monotonic()
+        try:
+            run_once()
+        except Exception as e:
+            logger.error(f"Eroare la reîmprospătarea cache-ului: {e}")
+        if args.once:
+            break
+        time.sleep(max(INTERVAL_SECONDS - (time.monotonic() - started), 0))
+
+if __name__ == '__main__':
+    main()
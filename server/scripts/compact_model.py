@@ -0,0 +1,146 @@
+import os
+import json
+import logging
+import numpy as np
+import scipy.sparse as sp
+from scipy.special import logsumexp
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Parametrii care determină tokenizarea; restul configurației vectorizatorului nu contează la inferență
+ANALYZER_PARAMS = ['input', 'encoding', 'decode_error', 'strip_accents', 'lowercase',
+                   'stop_words', 'token_pattern', 'ngram_range', 'analyzer', 'binary']
+HASHING_PARAMS = ANALYZER_PARAMS + ['n_features', 'alternate_sign', 'norm']
+
+
+def _json_params(vectorizer, names):
+    params = vectorizer.get_params()
+    if params.get('preprocessor') is not None or params.get('tokenizer') is not None:
+        raise ValueError("Vectorizatorii cu preprocessor/tokenizer propriu nu pot fi exportați")
+    exported = {}
+    for name in names:
+        value = params[name]
+        if isinstance(value, (list, tuple, frozenset, set)):
+            value = sorted(value) if isinstance(value, (frozenset, set)) else list(value)
+        exported[name] = value
+    return exported
+
+
+def export_compact_model(model, vectorizer, directory):
+    """Scrie vocabularul sortat și parametrii MultinomialNB ca tablouri NumPy mapabile în memorie."""
+    os.makedirs(directory, exist_ok=True)
+
+    if hasattr(vectorizer, 'vocabulary_'):
+        kind = 'count'
+        params = _json_params(vectorizer, ANALYZER_PARAMS)
+        terms = sorted(vectorizer.vocabulary_)
+        encoded = [term.encode('utf-8') for term in terms]
+        max_term_bytes = max((len(term) for term in encoded), default=1)
+        # Termenii sortați ca octeți, cu lățime fixă: căutarea este un np.searchsorted vectorizat
+        np.save(os.path.join(directory, 'vocab_terms.npy'), np.array(encoded, dtype=f'S{max_term_bytes}'))
+        np.save(os.path.join(directory, 'vocab_index.npy'),
+                np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.int64))
+    else:
+        kind = 'hashing'
+        params = _json_params(vectorizer, HASHING_PARAMS)
+
+    # (n_features, n_classes), C-contiguu: produsul rar citește doar rândurile termenilor din document
+    np.save(os.path.join(directory, 'feature_log_prob_t.npy'), np.ascontiguousarray(model.feature_log_prob_.T))
+    np.save(os.path.join(directory, 'class_log_prior.npy'), model.class_log_prior_)
+    np.save(os.path.join(directory, 'classes.npy'), np.asarray(model.classes_, dtype=str))
+
+    with open(os.path.join(directory, 'meta.json'), 'w') as meta_file:
+        json.dump({'kind': kind, 'params': params}, meta_file)
+
+
+class CompactModel:
+    """Inferență MultinomialNB pe artefactele exportate, mapate în memorie și partajate între workeri.
+
+    Expune aceeași interfață ca LoadedModel: transform, predict, predict_with_confidence.
+    """
+
+    def __init__(self, directory, version=None):
+        from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+        with open(os.path.join(directory, 'meta.json'), 'r') as meta_file:
+            meta = json.load(meta_file)
+        params = meta['params']
+        params['ngram_range'] = tuple(params['ngram_range'])
+
+        self.version = version
+        self.kind = meta['kind']
+        self.binary = params.get('binary', False)
+        # mmap_mode='r': paginile sunt în page cache-ul sistemului, comune tuturor proceselor
+        self.feature_log_prob_t = np.load(os.path.join(directory, 'feature_log_prob_t.npy'), mmap_mode='r')
+        self.class_log_prior = np.load(os.path.join(directory, 'class_log_prior.npy'))
+        self.classes = np.load(os.path.join(directory, 'classes.npy'))
+
+        if self.kind == 'count':
+            self.vocab_terms = np.load(os.path.join(directory, 'vocab_terms.npy'), mmap_mode='r')
+            self.vocab_index = np.load(os.path.join(directory, 'vocab_index.npy'), mmap_mode='r')
+            self.max_term_bytes = self.vocab_terms.dtype.itemsize
+            self.analyzer = CountVectorizer(**params).build_analyzer()
+        else:
+            self.hashing_vectorizer = HashingVectorizer(**params)
+
+    def _feature_indices(self, text):
+        encoded = [term.encode('utf-8') for term in self.analyzer(text)]
+        # Termenii mai lungi decât cel mai lung termen din vocabular nu pot exista în el
+        encoded = [term for term in encoded if len(term) <= self.max_term_bytes]
+        if not encoded:
+            return np.empty(0, dtype=np.int64)
+        candidates = np.array(encoded, dtype=self.vocab_terms.dtype)
+        positions = np.searchsorted(self.vocab_terms, candidates)
+        positions[positions == len(self.vocab_terms)] = 0
+        found = self.vocab_terms[positions] == candidates
+        return self.vocab_index[positions[found]]
+
+    def transform(self, texts):
+        if self.kind == 'hashing':
+            return self.hashing_vectorizer.transform(texts)
+
+        indptr = [0]
+        indices = []
+        data = []
+        for text in texts:
+            # np.unique întoarce indicii sortați, ca CountVectorizer după sort_indices
+            feature_indices, counts = np.unique(self._feature_indices(text), return_counts=True)
+            indices.append(feature_indices)
+            data.append(np.ones_like(counts) if self.binary else counts)
+            indptr.append(indptr[-1] + len(feature_indices))
+        n_features = self.feature_log_prob_t.shape[0]
+        return sp.csr_matrix(
+            (np.concatenate(data) if data else np.empty(0, dtype=np.int64),
+             np.concatenate(indices) if indices else np.empty(0, dtype=np.int64),
+             np.array(indptr)),
+            shape=(len(texts), n_features), dtype=np.int64
+        )
+
+    def _joint_log_likelihood(self, texts):
+        # Aceeași operație ca MultinomialNB: X @ feature_log_prob_.T + class_log_prior_
+        return self.transform(texts) @ self.feature_log_prob_t + self.class_log_prior
+
+    def predict(self, texts):
+        return self.classes[np.argmax(self._joint_log_likelihood(texts), axis=1)]
+
+    def predict_with_confidence(self, texts):
+        jll = self._joint_log_likelihood(texts)
+        best = np.argmax(jll, axis=1)
+        probabilities = np.exp(jll - np.atleast_2d(logsumexp(jll, axis=1)).T)
+        return self.classes[best], probabilities[np.arange(len(best)), best]
+
+
+def verify_compact_model(directory, model, vectorizer, documents):
+    """Verifică pe documentele date că inferența compactă dă exact predicțiile lui model.predict."""
+    if not documents:
+        # Un export neverificat nu se publică: workerii folosesc atunci fișierele pickle
+        logger.warning("Nu există documente pentru verificarea modelului compact; exportul nu se publică")
+        return False
+    compact = CompactModel(directory)
+    expected = np.asarray(model.predict(vectorizer.transform(documents)), dtype=str)
+    actual = compact.predict(documents)
+    mismatches = int(np.sum(expected != actual))
+    if mismatches:
+        logger.error(f"Modelul compact diferă de model.predict pe {mismatches}/{len(documents)} documente")
+    return mismatches == 0
@@ -1,25 +1,23 @@
 import os
 import logging
 from .web_scraper import scrape_text_from_url
-from .database import Database
+from .database import get_db
 
 # Configurare logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Inițializare bază de date
-db = Database()
-
 def save_content(url, user_id=None):
+    db = get_db()
     if not url:
         return {"error": "Nu a fost furnizat niciun URL"}, 400
     
     try:
         # Verifică mai întâi dacă există în cache
         cached_result = db.check_cache(url)
-        if cached_result and 'text' in cached_result:
-            content = cached_result['text']
-        else:
+        # Textul vine din colecția contents, după hash-ul din documentul de cache
+        content = db.resolve_texts([cached_result])[0] if cached_result else None
+        if content is None:
             # Dacă nu există în cache, extrage conținutul
             content = scrape_text_from_url(url)
         
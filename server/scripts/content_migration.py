@@ -0,0 +1,63 @@
+"""Migrare în fundal: mută textul din history, cache și pages în colecția contents, referit prin hash.
+
+Poate rula în paralel cu serverul (cititorii acceptă ambele forme ale documentelor) și poate fi
+reluată oricând: procesează doar documentele care mai au câmpul text.
+
+Rulare din rădăcina proiectului:
+    python -m server.scripts.content_migration [--batch-size 1000] [--pause 0.2]
+"""
+import time
+import argparse
+import datetime
+import logging
+from pymongo import UpdateOne
+from .cache import content_hash
+from .database import get_db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate_collection(db, collection, batch_size=1000, pause=0.2):
+    converted = 0
+    while True:
+        docs = list(collection.find({'text': {'$exists': True}}, {'text': 1}).limit(batch_size))
+        if not docs:
+            return converted
+
+        now = datetime.datetime.now()
+        texts = {}
+        updates = []
+        for doc in docs:
+            text = doc.get('text') or ''
+            text_hash = content_hash(text)
+            texts[text_hash] = text
+            # Condiția pe text: un document rescris între timp de server (fără text, cu hash nou) rămâne neatins
+            updates.append(UpdateOne({'_id': doc['_id'], 'text': {'$exists': True}},
+                                     {'$set': {'content_hash': text_hash}, '$unset': {'text': ''}}))
+
+        # Textele se scriu înaintea referințelor: niciun document nu indică un hash inexistent
+        db.contents_collection.bulk_write([
+            UpdateOne({'_id': text_hash}, {'$setOnInsert': {'text': text, 'created_at': now}}, upsert=True)
+            for text_hash, text in texts.items()
+        ], ordered=False)
+        collection.bulk_write(updates, ordered=False)
+
+        converted += len(updates)
+        logger.info(f"{collection.name}: {converted} documente convertite ({len(texts)} texte distincte în ultimul lot)")
+        # Pauza lasă loc traficului normal când migrarea rulează pe o bază în producție
+        time.sleep(pause)
+
+def migrate_contents(batch_size=1000, pause=0.2):
+    db = get_db()
+    totals = {}
+    for collection in (db.cache_collection, db.pages_collection, db.history_collection):
+        totals[collection.name] = migrate_collection(db, collection, batch_size, pause)
+    logger.info(f"Migrarea conținutului s-a încheiat: {totals}")
+    return totals
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--pause', type=float, default=0.2, help='secunde de pauză între loturi')
+    args = parser.parse_args()
+    migrate_contents(args.batch_size, args.pause)
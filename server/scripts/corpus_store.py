@@ -0,0 +1,103 @@
+import os
+import glob
+import hashlib
+import datetime
+import logging
+import joblib
+import scipy.sparse as sp
+from .cache import content_hash
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CORPUS_CACHE_DIR = os.getenv('CORPUS_CACHE_DIR', os.path.join('database', 'corpus_cache'))
+# Câte seturi de caracteristici (DTM + vectorizator) se păstrează pe disc
+FEATURE_CACHE_KEEP = int(os.getenv('FEATURE_CACHE_KEEP', 3))
+# Documentele verificate acum mai mult de atâtea zile se extrag din nou (0 = refolosite oricât)
+CORPUS_MAX_AGE_DAYS = float(os.getenv('CORPUS_MAX_AGE_DAYS', 30))
+
+def _is_stale(doc, now, max_age_days):
+    if not max_age_days:
+        return False
+    checked_at = doc.get('checked_at') or doc.get('timestamp')
+    return checked_at is None or now - checked_at > datetime.timedelta(days=max_age_days)
+
+def load_documents(db, links, scrape, refresh=False, max_age_days=CORPUS_MAX_AGE_DAYS):
+    """Textele preprocesate pentru links; se extrag doar URL-urile noi și cele verificate demult."""
+    unique_links = list(dict.fromkeys(links))
+    stored = {} if refresh else db.get_corpus_documents(unique_links)
+    now = datetime.datetime.now()
+    missing = [link for link in unique_links if not (stored.get(link) or {}).get('text')]
+    stale = [link for link in unique_links if (stored.get(link) or {}).get('text')
+             and _is_stale(stored[link], now, max_age_days)]
+    logger.info(f"Corpus: {len(unique_links) - len(missing) - len(stale)} documente refolosite, "
+                f"{len(missing)} de extras, {len(stale)} de verificat")
+
+    texts = {link: doc.get('text', '') for link, doc in stored.items()}
+    to_scrape = missing + stale
+    if to_scrape:
+        scraped = dict(zip(to_scrape, scrape(to_scrape)))
+        # Extragerile eșuate nu se salvează, ca să fie reîncercate la următoarea antrenare;
+        # pentru documentele vechi se păstrează textul stocat
+        fresh = {link: scraped[link] for link in missing if scraped.get(link)}
+        changed, unchanged = [], []
+        for link in stale:
+            text = scraped.get(link)
+            if not text:
+                continue
+            # Hash-ul stocat arată dacă pagina s-a schimbat de la extragerea anterioară
+            if stored[link].get('content_hash') == content_hash(text):
+                unchanged.append(link)
+            else:
+                changed.append(link)
+                fresh[link] = text
+        if stale:
+            logger.info(f"Corpus: {len(changed)} documente verificate s-au schimbat, {len(unchanged)} sunt neschimbate")
+        db.save_corpus_documents(fresh)
+        db.touch_corpus_documents(unchanged)
+        texts.update(fresh)
+
+    return [texts.get(link, '') for link in links]
+
+def features_key(documents, vectorizer_params):
+    # Cheia depinde de configurația vectorizatorului și de conținutul documentelor, în ordine
+    digest = hashlib.sha256(repr(sorted(vectorizer_params.items())).encode('utf-8'))
+    for document in documents:
+        digest.update(content_hash(document).encode('ascii'))
+    return digest.hexdigest()
+
+def _feature_paths(key):
+    return os.path.join(CORPUS_CACHE_DIR, f"{key}.npz"), os.path.join(CORPUS_CACHE_DIR, f"{key}.vectorizer.pkl")
+
+def load_features(key):
+    dtm_path, vectorizer_path = _feature_paths(key)
+    if not (os.path.exists(dtm_path) and os.path.exists(vectorizer_path)):
+        return None
+    try:
+        vectorizer = joblib.load(vectorizer_path)
+        dtm = sp.load_npz(dtm_path).tocsr()
+        logger.info(f"Matricea document-termen refolosită din {dtm_path}")
+        return vectorizer, dtm
+    except Exception as e:
+        logger.warning(f"Nu s-a putut încărca matricea document-termen {key}: {e}")
+        return None
+
+def save_features(key, vectorizer, dtm):
+    os.makedirs(CORPUS_CACHE_DIR, exist_ok=True)
+    dtm_path, vectorizer_path = _feature_paths(key)
+    tmp_suffix = f".tmp-{os.getpid()}"
+    # save_npz adaugă extensia .npz dacă lipsește, de aceea sufixul temporar o precede
+    sp.save_npz(f"{dtm_path[:-4]}{tmp_suffix}.npz", dtm.tocsr(), compressed=True)
+    joblib.dump(vectorizer, f"{vectorizer_path}{tmp_suffix}")
+    os.replace(f"{vectorizer_path}{tmp_suffix}", vectorizer_path)
+    os.replace(f"{dtm_path[:-4]}{tmp_suffix}.npz", dtm_path)
+    _prune_features()
+
+def _prune_features():
+    entries = sorted(glob.glob(os.path.join(CORPUS_CACHE_DIR, '*.npz')), key=os.path.getmtime, reverse=True)
+    for dtm_path in entries[FEATURE_CACHE_KEEP:]:
+        for path in (dtm_path, f"{dtm_path[:-4]}.vectorizer.pkl"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
@@ -1,110 +1,709 @@
+import json
+import atexit
+import base64
 import datetime
-from pymongo import MongoClient
+import threading
+from pymongo import MongoClient, UpdateOne, InsertOne, ReturnDocument
+from pymongo.errors import BulkWriteError
+from bson.objectid import ObjectId
+from bson.errors import InvalidId
 import os
+from .cache import LRUCache, normalize_url, content_hash
+from .write_buffer import WriteBehindBuffer
+from . import metrics
+
+# Durata de viață a unei intrări din cache; expirarea o face indexul TTL din MongoDB
+CACHE_TTL_SECONDS = int(os.getenv('CACHE_TTL_SECONDS', 86400))
+# Cât timp se păstrează validatorii HTTP și hash-ul conținutului unei pagini
+PAGE_TTL_SECONDS = int(os.getenv('PAGE_TTL_SECONDS', 30 * 86400))
+LOCAL_CACHE_SIZE = int(os.getenv('LOCAL_CACHE_SIZE', 2048))
+LOCAL_CACHE_TTL_SECONDS = int(os.getenv('LOCAL_CACHE_TTL_SECONDS', 300))
+# Rândurile agregate fără filtru de utilizator (toate intrările din istoric)
+ALL_USERS = '__all__'
+# Acoperite de indexurile compuse (url, user_id, timestamp), (user_id, timestamp, _id),
+# (timestamp, _id) și (batch_id, _id); se șterg la migrare
+REDUNDANT_HISTORY_INDEXES = ['url_1', 'user_id_1', 'timestamp_-1', 'batch_id_1']
+# Câte erori per URL se păstrează în documentul unui lot; restul sunt doar numărate în failed
+BATCH_JOB_MAX_ERRORS = int(os.getenv('BATCH_JOB_MAX_ERRORS', 1000))
+# Câmpurile întoarse implicit de /history; textul preprocesat se cere explicit
+HISTORY_SUMMARY_FIELDS = {'url': 1, 'prediction': 1, 'confidence': 1, 'timestamp': 1, 'user_id': 1, 'batch_id': 1}
+
+# Primul nivel de cache, comun tuturor instanțelor Database din procesul curent
+local_cache = LRUCache(maxsize=LOCAL_CACHE_SIZE, ttl=LOCAL_CACHE_TTL_SECONDS)
+_mongo_cache_stats = {'hits': 0, 'misses': 0}
+# Hash-urile textelor trimise deja spre colecția contents din acest proces: nu se mai rescriu
+_stored_contents = LRUCache(maxsize=int(os.getenv('CONTENT_REF_CACHE_SIZE', 10000)), ttl=3600)
+_stats_lock = threading.Lock()
+
+# Scrierile din cache și istoric sunt trimise în fundal, în loturi, în afara căii de răspuns
+WRITE_BEHIND = os.getenv('DB_WRITE_BEHIND', '1') == '1'
+write_buffer = WriteBehindBuffer(
+    max_batch=int(os.getenv('DB_WRITE_BATCH', 500)),
+    flush_interval=float(os.getenv('DB_WRITE_FLUSH_INTERVAL', 1.0)),
+    max_pending=int(os.getenv('DB_WRITE_MAX_PENDING', 10000)),
+    retries=int(os.getenv('DB_WRITE_RETRIES', 3)),
+    backoff=float(os.getenv('DB_WRITE_BACKOFF', 0.5))
+)
+
+atexit.register(write_buffer.close)
+
+_db = None
+_db_lock = threading.Lock()
+
+def get_db():
+    # Un singur client MongoDB per proces, creat la prima utilizare (după fork-ul gunicorn)
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                _db = Database()
+    return _db
+
+def encode_history_cursor(doc):
+    # Cursor opac: poziția (timestamp, _id) a ultimei intrări din pagină
+    payload = json.dumps({'t': doc['timestamp'].isoformat(), 'i': str(doc['_id'])})
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+def decode_history_cursor(cursor):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return datetime.datetime.fromisoformat(payload['t']), ObjectId(payload['i'])
+    except (ValueError, KeyError, TypeError, InvalidId) as e:
+        raise ValueError(f"Cursor invalid: {cursor}") from e
+
+def local_to_utc(timestamp):
+    # Câmpurile timestamp sunt scrise cu datetime.now() (ora locală, fără fus orar)
+    return timestamp.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+def set_db(database):
+    # Înlocuiește instanța comună (folosit de benchmark-urile offline)
+    global _db
+    with _db_lock:
+        _db = database
+    local_cache.clear()
 
 class Database:
-    def __init__(self, mongo_uri=None):
+    def __init__(self, mongo_uri=None, write_behind=WRITE_BEHIND, client=None):
         # Inițializează conexiunea la baza de date
+        self.write_behind = write_behind
         self.mongo_uri = mongo_uri or os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
-        self.client = MongoClient(self.mongo_uri)
+        # connect=False: conexiunea se deschide la prima operație, deci un MongoDB
+        # indisponibil temporar nu oprește pornirea workerului.
+        # client permite un înlocuitor compatibil (de ex. mongomock în benchmark-uri)
+        self.client = client or MongoClient(self.mongo_uri, connect=False)
         self.db = self.client['web_topic_modeling']
         self.collection = self.db['webpages']
         self.history_collection = self.db['history']
         self.cache_collection = self.db['cache']
+        self.batch_jobs_collection = self.db['batch_jobs']
+        self.corpus_collection = self.db['corpus']
+        self.pages_collection = self.db['pages']
+        # Textele preprocesate, o singură copie per hash; history, cache și pages le referă prin content_hash
+        self.contents_collection = self.db['contents']
+        # Lease-uri scurte pentru calculul unei predicții: un singur proces calculează un URL la un moment dat
+        self.leases_collection = self.db['leases']
+        # Contoare pre-agregate (scope, zi, topic), actualizate la fiecare scriere în istoric
+        self.analytics_collection = self.db['analytics_daily']
+        # Coada persistentă a antrenărilor, consumată de procesul trainer
+        self.training_jobs_collection = self.db['training_jobs']
+
+    def ensure_indexes(self):
+        # Pasul de migrare, rulat o singură dată (python -m server.scripts.migrate),
+        # nu la fiecare pornire de worker
+        self.history_collection.create_index([('url', 1), ('user_id', 1), ('timestamp', 1)])
+        self.history_collection.create_index([('batch_id', 1), ('_id', 1)])
+        # Paginare keyset pentru /history, cu și fără filtru de utilizator
+        self.history_collection.create_index([('user_id', 1), ('timestamp', -1), ('_id', -1)])
+        self.history_collection.create_index([('timestamp', -1), ('_id', -1)])
+        # Indexurile vechi pe un singur câmp sunt prefixe ale celor compuse de mai sus: doar încetinesc scrierile
+        existing = self.history_collection.index_information()
+        for name in REDUNDANT_HISTORY_INDEXES:
+            if name in existing:
+                self.history_collection.drop_index(name)
         
-        # Creează indexuri
-        self.history_collection.create_index([('url', 1)])
-        self.history_collection.create_index([('user_id', 1)])
-        self.history_collection.create_index([('timestamp', -1)])
-        self.history_collection.create_index([('batch_id', 1)])
-        
+        self.corpus_collection.create_index([('url', 1)], unique=True)
+
+        self.pages_collection.create_index([('url', 1)], unique=True)
+        self.pages_collection.create_index([('raw_hash', 1), ('model_version', 1)])
+        self.pages_collection.create_index([('expires_at', 1)], expireAfterSeconds=0)
+
+        self.analytics_collection.create_index([('scope', 1), ('day', 1), ('topic', 1)], unique=True)
+
+        self.leases_collection.create_index([('expires_at', 1)], expireAfterSeconds=0)
+
+        self.batch_jobs_collection.create_index([('status', 1), ('heartbeat_at', 1)])
+
+        # Preluarea următorului job: cel mai vechi dintre cele în așteptare
+        self.training_jobs_collection.create_index([('status', 1), ('created_at', 1)])
+        self.training_jobs_collection.create_index([('created_at', -1)])
+
         self.cache_collection.create_index([('url', 1)], unique=True)
         self.cache_collection.create_index([('timestamp', 1)])
-    
+        self.cache_collection.create_index([('expires_at', 1)], expireAfterSeconds=0)
+        self.backfill_cache_expiry()
+
+    def backfill_cache_expiry(self, batch_size=1000):
+        # Documentele vechi, fără expires_at, ar rămâne altfel în cache pentru totdeauna.
+        # timestamp este ora locală naivă, iar indexul TTL compară cu UTC: se convertește în Python,
+        # cu fusul orar al sistemului (inclusiv ora de vară) valabil la momentul respectiv
+        while True:
+            docs = list(self.cache_collection.find({'expires_at': {'$exists': False}}, {'timestamp': 1}).limit(batch_size))
+            if not docs:
+                return
+            now = datetime.datetime.utcnow()
+            self.cache_collection.bulk_write([
+                UpdateOne({'_id': doc['_id']}, {'$set': {'expires_at': (
+                    local_to_utc(doc['timestamp']) if doc.get('timestamp') else now
+                ) + datetime.timedelta(seconds=CACHE_TTL_SECONDS)}})
+                for doc in docs
+            ], ordered=False)
+
+    def _is_fresh(self, doc, now):
+        # Verificarea la citire: indexul TTL poate lipsi (migrare nerulată) și șterge cu până la 60s întârziere
+        if doc.get('expires_at') is not None:
+            return doc['expires_at'] > now
+        timestamp = doc.get('timestamp')
+        return timestamp is not None and local_to_utc(timestamp) + datetime.timedelta(seconds=CACHE_TTL_SECONDS) > now
+
+    def _remember(self, key, doc):
+        # Intrarea locală nu trăiește mai mult decât documentul din MongoDB
+        if doc.get('expires_at') is None:
+            return
+        remaining = (doc['expires_at'] - datetime.datetime.utcnow()).total_seconds()
+        local_cache.set(key, doc, ttl=remaining)
+
     def check_cache(self, url):
-        # Verifică dacă pagina este în cache
-        cached_result = self.cache_collection.find_one({'url': url})
+        # Verifică dacă pagina este în cache: întâi în proces, apoi în MongoDB
+        key = normalize_url(url)
+        cached_result = local_cache.get(key)
+        metrics.inc('cache_lookups_total', layer='local', result='hit' if cached_result is not None else 'miss')
+        if cached_result is not None:
+            return cached_result
+
+        cached_result = self.cache_collection.find_one({'url': key})
+        if cached_result and not self._is_fresh(cached_result, datetime.datetime.utcnow()):
+            cached_result = None
+        metrics.inc('cache_lookups_total', layer='mongo', result='hit' if cached_result else 'miss')
+        with _stats_lock:
+            _mongo_cache_stats['hits' if cached_result else 'misses'] += 1
         if cached_result:
-            cache_time = cached_result.get('timestamp', datetime.datetime.min)
-            if (datetime.datetime.now() - cache_time).total_seconds() < 86400:  # 24 de ore în secunde
-                return cached_result
-        return None
-    
-    def save_to_cache(self, url, text, prediction, word_frequencies=None):
-        self.cache_collection.update_one(
-            {'url': url},
-            {'$set': {
-                'url': url,
-                'text': text,
-                'prediction': prediction,
-                'word_frequencies': word_frequencies,
-                'timestamp': datetime.datetime.now()
-            }},
-            upsert=True
-        )
+            self._remember(key, cached_result)
+        return cached_result
+
+    def check_cache_many(self, urls):
+        # Ca check_cache, pentru mai multe URL-uri: o singură interogare $in pentru ce lipsește local
+        results = {}
+        missing = {}
+        for url in urls:
+            key = normalize_url(url)
+            cached_result = local_cache.get(key)
+            metrics.inc('cache_lookups_total', layer='local', result='hit' if cached_result is not None else 'miss')
+            if cached_result is not None:
+                results[url] = cached_result
+            else:
+                missing.setdefault(key, []).append(url)
+
+        if missing:
+            now = datetime.datetime.utcnow()
+            found = {doc['url']: doc for doc in self.cache_collection.find({'url': {'$in': list(missing)}})
+                     if self._is_fresh(doc, now)}
+            with _stats_lock:
+                _mongo_cache_stats['hits'] += len(found)
+                _mongo_cache_stats['misses'] += len(missing) - len(found)
+            metrics.inc('cache_lookups_total', len(found), layer='mongo', result='hit')
+            metrics.inc('cache_lookups_total', len(missing) - len(found), layer='mongo', result='miss')
+            for key, doc in found.items():
+                self._remember(key, doc)
+                for url in missing[key]:
+                    results[url] = doc
+        return results
+
+    def _cache_document(self, key, text_hash, prediction, word_frequencies):
+        return {
+            'url': key,
+            'content_hash': text_hash,
+            'prediction': prediction,
+            'word_frequencies': word_frequencies,
+            'timestamp': datetime.datetime.now(),
+            'expires_at': datetime.datetime.utcnow() + datetime.timedelta(seconds=CACHE_TTL_SECONDS)
+        }
+
+    def _write(self, collection, operations, on_written=None):
+        # operations: listă de perechi (operație, cheie de deduplicare);
+        # on_written(cheie) se apelează pentru fiecare operație după confirmarea scrierii
+        if self.write_behind:
+            for operation, key in operations:
+                write_buffer.put(collection, operation, key,
+                                 (lambda key=key: on_written(key)) if on_written else None)
+        elif operations:
+            collection.bulk_write([operation for operation, _ in operations], ordered=False)
+            if on_written:
+                for _, key in operations:
+                    on_written(key)
+
+    def _write_cache_documents(self, docs):
+        # Cache-ul local se actualizează imediat, înainte ca scrierea să ajungă în MongoDB
+        for doc in docs:
+            self._remember(doc['url'], doc)
+        self._write(self.cache_collection, [
+            # Documentele vechi păstrau textul integral; altfel ar rămâne lângă noul content_hash
+            (UpdateOne({'url': doc['url']}, {'$set': doc, '$unset': {'text': ''}}, upsert=True), doc['url'])
+            for doc in docs
+        ])
+
+    def _store_contents(self, texts):
+        # texts: dicționar hash -> text; un text deja existent nu este suprascris
+        now = datetime.datetime.now()
+        operations = []
+        for text_hash, text in texts.items():
+            if _stored_contents.get(text_hash):
+                continue
+            operations.append((UpdateOne({'_id': text_hash}, {'$setOnInsert': {'text': text, 'created_at': now}},
+                                         upsert=True), text_hash))
+        # Hash-ul se reține doar după confirmarea scrierii: o scriere eșuată este trimisă din nou
+        # la următoarea apariție a textului
+        self._write(self.contents_collection, operations, lambda text_hash: _stored_contents.set(text_hash, True))
+
+    def _content_refs(self, entries):
+        # Hash-ul textului fiecărei intrări; textele noi se salvează o singură dată în contents.
+        # Pe un hit de cache intrarea are doar content_hash, iar textul nu mai este scris deloc
+        texts = {}
+        refs = []
+        for entry in entries:
+            text = entry.get('text')
+            text_hash = entry.get('content_hash') or content_hash(text or '')
+            if text is not None:
+                texts[text_hash] = text
+            refs.append(text_hash)
+        self._store_contents(texts)
+        return refs
+
+    def get_contents(self, hashes, chunk_size=1000):
+        hashes = list(hashes)
+        contents = {}
+        for start in range(0, len(hashes), chunk_size):
+            for doc in self.contents_collection.find({'_id': {'$in': hashes[start:start + chunk_size]}}):
+                contents[doc['_id']] = doc.get('text', '')
+        return contents
+
+    def resolve_texts(self, docs):
+        # Textul fiecărui document: direct (documente dinaintea migrării) sau din contents, după hash
+        hashes = {doc['content_hash'] for doc in docs if doc.get('text') is None and doc.get('content_hash')}
+        contents = self.get_contents(hashes) if hashes else {}
+        return [doc['text'] if doc.get('text') is not None else contents.get(doc.get('content_hash')) for doc in docs]
+
+    def _write_history_documents(self, docs):
+        self._write(self.history_collection, [(InsertOne(doc), None) for doc in docs])
+        self._update_analytics(docs, 1)
+
+    def _update_analytics(self, docs, sign):
+        # Un $inc per (scope, zi, topic): lotul întreg se reduce la câteva upsert-uri
+        increments = {}
+        for doc in docs:
+            day = doc['timestamp'].strftime('%Y-%m-%d')
+            scopes = [ALL_USERS] + ([doc['user_id']] if doc.get('user_id') else [])
+            for scope in scopes:
+                key = (scope, day, doc.get('prediction'))
+                increments[key] = increments.get(key, 0) + sign
+        self._write(self.analytics_collection, [
+            (UpdateOne({'scope': scope, 'day': day, 'topic': topic}, {'$inc': {'count': count}}, upsert=True), None)
+            for (scope, day, topic), count in increments.items()
+        ])
+
+    def flush(self):
+        write_buffer.flush()
+
+    def close(self):
+        write_buffer.close()
+
+    def save_to_cache(self, url, text, prediction, word_frequencies=None, text_hash=None):
+        key = normalize_url(url)
+        text_hash = self._content_refs([{'text': text, 'content_hash': text_hash}])[0]
+        self._write_cache_documents([self._cache_document(key, text_hash, prediction, word_frequencies)])
+
+    def get_pages(self, urls):
+        # Validatorii și ultima predicție pentru fiecare URL, cu o singură interogare $in
+        keys = {normalize_url(url): url for url in urls}
+        pages = {}
+        for doc in self.pages_collection.find({'url': {'$in': list(keys)}}):
+            pages[keys[doc['url']]] = doc
+        return pages
+
+    def find_pages_by_hash(self, raw_hashes, model_version):
+        # Pagini cu același text extras (neschimbate sau articole preluate de alte site-uri),
+        # prezise cu aceeași versiune de model
+        pages = {}
+        query = {'raw_hash': {'$in': list(raw_hashes)}, 'model_version': model_version}
+        for doc in self.pages_collection.find(query):
+            pages.setdefault(doc['raw_hash'], doc)
+        return pages
+
+    def save_pages(self, pages):
+        # pages: dicționare cu url, etag, last_modified, raw_hash, text și/sau content_hash,
+        # prediction, confidence, word_frequencies, model_version
+        if not pages:
+            return
+        now = datetime.datetime.now()
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=PAGE_TTL_SECONDS)
+        refs = self._content_refs(pages)
+        self._write(self.pages_collection, [
+            (UpdateOne(
+                {'url': normalize_url(page['url'])},
+                {
+                    '$set': dict({key: value for key, value in page.items() if key != 'text'},
+                                 url=normalize_url(page['url']), content_hash=text_hash,
+                                 timestamp=now, expires_at=expires_at),
+                    # Documentele vechi păstrau textul integral
+                    '$unset': {'text': ''}
+                },
+                upsert=True
+            ), normalize_url(page['url']))
+            for page, text_hash in zip(pages, refs)
+        ])
+
+    def acquire_leases(self, keys, owner, ttl):
+        """Încearcă să obțină lease-ul pentru fiecare cheie; întoarce mulțimea cheilor obținute."""
+        now = datetime.datetime.utcnow()
+        expires_at = now + datetime.timedelta(seconds=ttl)
+        keys = list(keys)
+        if not keys:
+            return set()
+        taken = set()
+        try:
+            self.leases_collection.insert_many(
+                [{'_id': key, 'owner': owner, 'done': False, 'expires_at': expires_at} for key in keys],
+                ordered=False
+            )
+        except BulkWriteError as e:
+            errors = e.details.get('writeErrors', [])
+            # Doar cheia duplicată înseamnă un lease existent; orice altă eroare ajunge la apelant,
+            # care calculează local (lease-urile inserate totuși rămân ale lui și sunt eliberate de el)
+            if any(error.get('code') != 11000 for error in errors):
+                raise
+            taken = {keys[error['index']] for error in errors}
+
+        acquired = set(keys) - taken
+        # Lease-urile expirate (proces oprit în timpul calculului) sunt preluate;
+        # indexul TTL le șterge doar periodic, deci pot exista încă
+        for key in taken:
+            if self.leases_collection.find_one_and_update(
+                {'_id': key, 'expires_at': {'$lt': now}},
+                {'$set': {'owner': owner, 'done': False, 'expires_at': expires_at}, '$unset': {'result': ''}}
+            ):
+                acquired.add(key)
+        return acquired
+
+    def publish_lease_results(self, results, owner, ttl):
+        # Rezultatul rămâne în lease încă ttl secunde, pentru cei care așteaptă și pentru cererile
+        # care sosesc înainte ca scrierea write-behind în cache să ajungă în MongoDB
+        expires_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)
+        if results:
+            self.leases_collection.bulk_write([
+                UpdateOne({'_id': key, 'owner': owner},
+                          {'$set': {'done': True, 'result': result, 'expires_at': expires_at}})
+                for key, result in results.items()
+            ], ordered=False)
+
+    def release_leases(self, keys, owner):
+        # Calculul a eșuat: ceilalți workeri nu mai așteaptă expirarea lease-ului și calculează ei
+        keys = list(keys)
+        if keys:
+            self.leases_collection.delete_many({'_id': {'$in': keys}, 'owner': owner, 'done': False})
+
+    def get_leases(self, keys):
+        return {doc['_id']: doc for doc in self.leases_collection.find({'_id': {'$in': list(keys)}})}
+
+    def cache_stats(self):
+        with _stats_lock:
+            hits, misses = _mongo_cache_stats['hits'], _mongo_cache_stats['misses']
+        lookups = hits + misses
+        mongo_stats = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': hits / lookups if lookups else 0.0
+        }
+        return {'local': local_cache.stats(), 'mongo': mongo_stats, 'write_buffer': write_buffer.stats()}
     
-    def save_to_history(self, url, text, prediction, user_id=None, batch_id=None):
-        self.history_collection.insert_one({
+    def save_to_history(self, url, text, prediction, user_id=None, batch_id=None, text_hash=None):
+        # text poate lipsi (hit de cache) când se cunoaște text_hash
+        text_hash = self._content_refs([{'text': text, 'content_hash': text_hash}])[0]
+        self._write_history_documents([{
             'url': url,
-            'text': text,
+            'content_hash': text_hash,
             'prediction': prediction,
             'timestamp': datetime.datetime.now(),
             'user_id': user_id,
             'batch_id': batch_id
-        })
+        }])
     
-    def get_history(self, user_id=None, limit=50):
+    def save_many_to_cache(self, entries):
+        # entries: listă de dicționare cu cheile url, text și/sau content_hash, prediction, word_frequencies
+        refs = self._content_refs(entries)
+        self._write_cache_documents([
+            self._cache_document(normalize_url(entry['url']), text_hash, entry['prediction'],
+                                 entry.get('word_frequencies'))
+            for entry, text_hash in zip(entries, refs)
+        ])
+
+    def save_many_to_history(self, entries, user_id=None, batch_id=None):
+        now = datetime.datetime.now()
+        refs = self._content_refs(entries)
+        self._write_history_documents([
+            {
+                'url': entry['url'],
+                'content_hash': text_hash,
+                'prediction': entry['prediction'],
+                'confidence': entry.get('confidence'),
+                'timestamp': now,
+                'user_id': user_id,
+                'batch_id': batch_id
+            }
+            for entry, text_hash in zip(entries, refs)
+        ])
+
+    def get_popular_urls(self, since):
+        # Numărul de cereri după `since` pentru fiecare URL, exact cum a fost cerut, descrescător.
+        # Pragul și limita se aplică de apelant după comasarea variantelor pe URL-ul normalizat:
+        # aplicate aici, ar elimina variantele care doar împreună sunt populare
+        pipeline = [
+            {'$match': {'timestamp': {'$gte': since}}},
+            {'$group': {'_id': '$url', 'hits': {'$sum': 1}}},
+            {'$sort': {'hits': -1}}
+        ]
+        return ((doc['_id'], doc['hits']) for doc in self.history_collection.aggregate(pipeline, allowDiskUse=True))
+
+    def get_cache_expiry(self, urls):
+        # expires_at pentru fiecare URL din cache (cheie normalizată), cu o singură interogare $in
+        keys = {normalize_url(url): url for url in urls}
+        cursor = self.cache_collection.find({'url': {'$in': list(keys)}}, {'url': 1, 'expires_at': 1})
+        return {keys[doc['url']]: doc.get('expires_at') for doc in cursor}
+
+    def get_latest_history_for_urls(self, urls, user_id=None):
+        # Cea mai recentă intrare din istoric pentru fiecare URL, cu o singură interogare $in
+        query = {'url': {'$in': list(urls)}, 'user_id': user_id}
+        cursor = self.history_collection.find(query, {'url': 1, 'prediction': 1, 'timestamp': 1}).sort('timestamp', 1)
+        return {doc['url']: doc for doc in cursor}
+
+    def create_batch_job(self, batch_id, user_id, urls, worker):
+        now = datetime.datetime.now()
+        self.batch_jobs_collection.insert_one({
+            '_id': batch_id,
+            'user_id': user_id,
+            'status': 'queued',
+            # Lista URL-urilor rămâne în job: un lot întrerupt este reluat de la progresul salvat
+            'urls': urls,
+            'total': len(urls),
+            'processed': 0,
+            'failed': 0,
+            'errors': [],
+            'worker': worker,
+            'attempts': 1,
+            'created_at': now,
+            'heartbeat_at': now,
+            'finished_at': None
+        })
+
+    def claim_stale_batch_job(self, worker, stale_before):
+        """Preia un lot al cărui worker nu a mai raportat progres (oprit sau repornit de gunicorn)."""
+        return self.batch_jobs_collection.find_one_and_update(
+            {'status': {'$in': ['queued', 'running']}, 'heartbeat_at': {'$lt': stale_before}},
+            {'$set': {'worker': worker, 'heartbeat_at': datetime.datetime.now()}, '$inc': {'attempts': 1}},
+            projection={'errors': 0},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def update_batch_job_progress(self, batch_id, worker, processed, errors):
+        # Doar workerul care deține lotul îl actualizează; false înseamnă că lotul a fost preluat de altul.
+        # Lista erorilor se oprește la BATCH_JOB_MAX_ERRORS, numărul lor rămâne complet în failed
+        result = self.batch_jobs_collection.update_one(
+            {'_id': batch_id, 'worker': worker},
+            {
+                '$set': {'status': 'running', 'heartbeat_at': datetime.datetime.now()},
+                '$inc': {'processed': processed, 'failed': len(errors)},
+                '$push': {'errors': {'$each': errors, '$slice': BATCH_JOB_MAX_ERRORS}}
+            }
+        )
+        return result.matched_count > 0
+
+    def finish_batch_job(self, batch_id, status, message=None, worker=None):
+        query = {'_id': batch_id}
+        if worker is not None:
+            query['worker'] = worker
+        self.batch_jobs_collection.update_one(
+            query,
+            {'$set': {
+                'status': status,
+                'message': message,
+                'finished_at': datetime.datetime.now()
+            }}
+        )
+
+    def get_batch_job(self, batch_id, with_errors=False, with_urls=False):
+        projection = {}
+        if not with_errors:
+            projection['errors'] = 0
+        if not with_urls:
+            projection['urls'] = 0
+        return self.batch_jobs_collection.find_one({'_id': batch_id}, projection)
+
+    def create_training_job(self, job_id, kind, params, user_id=None):
+        self.training_jobs_collection.insert_one({
+            '_id': job_id,
+            'kind': kind,
+            'params': params,
+            'user_id': user_id,
+            'status': 'queued',
+            'stage': None,
+            'timings': {},
+            'attempts': 0,
+            'worker': None,
+            'message': None,
+            'result': None,
+            'created_at': datetime.datetime.now(),
+            'started_at': None,
+            'heartbeat_at': None,
+            'finished_at': None
+        })
+
+    def claim_training_job(self, worker, stale_before):
+        """Preia atomic cel mai vechi job în așteptare, sau unul al cărui trainer nu mai dă semne de viață."""
+        now = datetime.datetime.now()
+        return self.training_jobs_collection.find_one_and_update(
+            {'$or': [
+                {'status': 'queued'},
+                {'status': 'running', 'heartbeat_at': {'$lt': stale_before}}
+            ]},
+            {
+                '$set': {'status': 'running', 'worker': worker, 'stage': None, 'timings': {},
+                         'started_at': now, 'heartbeat_at': now},
+                '$inc': {'attempts': 1}
+            },
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def update_training_job(self, job_id, worker, stage=None, stage_seconds=None):
+        # Filtrul pe worker: un trainer al cărui job a fost preluat de altul nu mai scrie în el
+        update = {'$set': {'heartbeat_at': datetime.datetime.now()}}
+        if stage is not None:
+            update['$set']['stage'] = stage
+        if stage_seconds is not None:
+            update['$inc'] = {f'timings.{stage}': stage_seconds}
+        result = self.training_jobs_collection.update_one({'_id': job_id, 'worker': worker}, update)
+        return result.matched_count > 0
+
+    def finish_training_job(self, job_id, worker, status, message=None, result=None):
+        finished = self.training_jobs_collection.update_one(
+            {'_id': job_id, 'worker': worker},
+            {'$set': {
+                'status': status,
+                'stage': None,
+                'message': message,
+                'result': result,
+                'finished_at': datetime.datetime.now()
+            }}
+        )
+        return finished.matched_count > 0
+
+    def get_training_job(self, job_id):
+        return self.training_jobs_collection.find_one({'_id': job_id}, {'params': 0})
+
+    def list_training_jobs(self, status=None, limit=50):
+        query = {'status': status} if status else {}
+        return list(self.training_jobs_collection.find(query, {'params': 0}).sort('created_at', -1).limit(limit))
+
+    def get_batch_results(self, batch_id, after_id=None, limit=500):
+        # Folosește indexul (batch_id, _id): fiecare pagină continuă de unde a rămas cea anterioară
+        query = {'batch_id': batch_id}
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        projection = {'url': 1, 'prediction': 1, 'confidence': 1}
+        return list(self.history_collection.find(query, projection).sort('_id', 1).limit(limit))
+
+    def get_history(self, user_id=None, limit=50, cursor=None, include_text=False):
+        """O pagină din istoric, de la cea mai nouă intrare; întoarce (intrări, cursorul paginii următoare).
+
+        Paginarea este keyset pe (timestamp, _id): fiecare pagină este o singură citire pe index,
+        oricât de departe ar fi în istoric.
+        """
         query = {}
         if user_id:
             query['user_id'] = user_id
-        
-        # Se convertesc variabilele în string pentru a putea fi serializat în JSON
-        history = []
-        cursor = self.history_collection.find(query).sort('timestamp', -1).limit(limit)
-        
-        for doc in cursor:
-            doc['_id'] = str(doc['_id'])
-            history.append(doc)
+        if cursor:
+            timestamp, last_id = decode_history_cursor(cursor)
+            query['$or'] = [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': last_id}}
+            ]
+
+        projection = dict(HISTORY_SUMMARY_FIELDS, text=1, content_hash=1) if include_text else HISTORY_SUMMARY_FIELDS
+        # Un document în plus arată dacă mai există o pagină, fără o interogare separată
+        history = list(self.history_collection.find(query, projection)
+                       .sort([('timestamp', -1), ('_id', -1)])
+                       .limit(limit + 1))
+        next_cursor = None
+        if len(history) > limit:
+            history = history[:limit]
+            next_cursor = encode_history_cursor(history[-1])
+
+        if include_text:
+            # Textele paginii se citesc din contents cu o singură interogare $in
+            for doc, text in zip(history, self.resolve_texts(history)):
+                doc['text'] = text
+                doc.pop('content_hash', None)
+        return history, next_cursor
 
-        for item in history:
-            if 'timestamp' in item:
-                item['timestamp'] = item['timestamp'].isoformat()
-        
-        return history
-    
     def get_analytics(self, user_id=None, days=7):
-        pipeline = []
-        
-        # Adăugăm filtru pentru perioada de timp premergătoare actiunii
-        date_limit = datetime.datetime.now() - datetime.timedelta(days=days)
-        pipeline.append({'$match': {'timestamp': {'$gte': date_limit}}})
-        
-        # Filtrare după user_id dacă este specificat
-        if user_id:
-            pipeline.append({'$match': {'user_id': user_id}})
+        # O singură citire pe indexul (scope, day) din contoarele zilnice, indiferent de mărimea istoricului.
+        # Granularitatea este ziua: fereastra include integral ziua de acum `days` zile
+        first_day = (datetime.datetime.now() - datetime.timedelta(days=days)).strftime('%Y-%m-%d')
+        rows = self.analytics_collection.find(
+            {'scope': user_id or ALL_USERS, 'day': {'$gte': first_day}},
+            {'_id': 0, 'day': 1, 'topic': 1, 'count': 1}
+        )
 
-        topic_pipeline = pipeline + [
-            {'$group': {'_id': '$prediction', 'count': {'$sum': 1}}},
-            {'$sort': {'count': -1}}
-        ]
+        topics = {}
+        daily = {}
+        for row in rows:
+            if row['count'] <= 0:
+                continue
+            topics[row['topic']] = topics.get(row['topic'], 0) + row['count']
+            daily[row['day']] = daily.get(row['day'], 0) + row['count']
 
-        daily_pipeline = pipeline + [
-            {'$project': {
-                'date': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$timestamp'}},
-            }},
-            {'$group': {'_id': '$date', 'count': {'$sum': 1}}},
-            {'$sort': {'_id': -1}},
-            {'$limit': 7}
-        ]
+        # Aceeași formă a răspunsului ca agregările vechi peste history
+        topic_distribution = sorted(({'_id': topic, 'count': count} for topic, count in topics.items()),
+                                    key=lambda item: item['count'], reverse=True)
+        daily_activity = [{'_id': day, 'count': daily[day]} for day in sorted(daily, reverse=True)[:7]]
 
-        topic_distribution = list(self.history_collection.aggregate(topic_pipeline))
-        daily_activity = list(self.history_collection.aggregate(daily_pipeline))
-        
         return {
             'topic_distribution': topic_distribution,
             'daily_activity': daily_activity
         }
-        
+
+    def rebuild_analytics(self):
+        """Recalculează contoarele din tot istoricul; pas de migrare, rulat cu serverul oprit."""
+        day = {'$dateToString': {'format': '%Y-%m-%d', 'date': '$timestamp'}}
+        pipelines = [
+            [{'$group': {'_id': {'scope': ALL_USERS, 'day': day, 'topic': '$prediction'}, 'count': {'$sum': 1}}}],
+            [{'$match': {'user_id': {'$nin': [None, '']}}},
+             {'$group': {'_id': {'scope': '$user_id', 'day': day, 'topic': '$prediction'}, 'count': {'$sum': 1}}}]
+        ]
+        self.analytics_collection.delete_many({})
+        rows = 0
+        for pipeline in pipelines:
+            batch = []
+            for group in self.history_collection.aggregate(pipeline, allowDiskUse=True):
+                batch.append(dict(group['_id'], count=group['count']))
+                if len(batch) >= 1000:
+                    self.analytics_collection.insert_many(batch, ordered=False)
+                    rows += len(batch)
+                    batch = []
+            if batch:
+                self.analytics_collection.insert_many(batch, ordered=False)
+                rows += len(batch)
+        return rows
+
     def delete_history_entry(self, entry_id, user_id=None):
         from bson.objectid import ObjectId
         
@@ -114,16 +713,59 @@ class Database:
             if user_id:
                 query['user_id'] = user_id
 
-            result = self.history_collection.delete_one(query)
-            return result.deleted_count > 0
+            deleted = self.history_collection.find_one_and_delete(
+                query, projection={'timestamp': 1, 'user_id': 1, 'prediction': 1}
+            )
+            if deleted is None:
+                return False
+            self._update_analytics([deleted], -1)
+            return True
         except Exception as e:
             print(f"Eroare la ștergerea intrării din istoric: {str(e)}")
             return False
     
-    def store_training_data(self, links, topics, documents, lda, vectorizer):
-        for idx, link in enumerate(links):
-            self.collection.insert_one({
-                'url': link,
-                'topic': topics[idx],
-                'lda': lda.transform(vectorizer.transform([documents[idx]]))[0].tolist()
-            })
+    def get_corpus_documents(self, urls, chunk_size=1000):
+        # Documentele deja stocate (text, content_hash, checked_at), cu interogări $in pe bucăți de URL-uri
+        documents = {}
+        for start in range(0, len(urls), chunk_size):
+            cursor = self.corpus_collection.find({'url': {'$in': urls[start:start + chunk_size]}},
+                                                 {'url': 1, 'text': 1, 'content_hash': 1, 'timestamp': 1, 'checked_at': 1})
+            for doc in cursor:
+                documents[doc['url']] = doc
+        return documents
+
+    def save_corpus_documents(self, documents):
+        # documents: dicționar url -> text preprocesat
+        if not documents:
+            return
+        now = datetime.datetime.now()
+        self.corpus_collection.bulk_write([
+            UpdateOne(
+                {'url': url},
+                {'$set': {'url': url, 'text': text, 'content_hash': content_hash(text),
+                          'timestamp': now, 'checked_at': now}},
+                upsert=True
+            )
+            for url, text in documents.items()
+        ], ordered=False)
+
+    def touch_corpus_documents(self, urls):
+        # Conținutul reextras nu s-a schimbat: doar data verificării avansează
+        if urls:
+            self.corpus_collection.update_many({'url': {'$in': list(urls)}},
+                                               {'$set': {'checked_at': datetime.datetime.now()}})
+
+    def store_training_data(self, links, topics, dtm, lda, chunk_size=1000):
+        # Distribuțiile de topicuri pentru toate documentele, dintr-un singur lda.transform
+        # peste matricea document-termen deja calculată la antrenare
+        distributions = lda.transform(dtm)
+        for start in range(0, len(links), chunk_size):
+            end = start + chunk_size
+            self.collection.insert_many([
+                {
+                    'url': link,
+                    'topic': topic,
+                    'lda': distribution.tolist()
+                }
+                for link, topic, distribution in zip(links[start:end], topics[start:end], distributions[start:end])
+            ], ordered=False)
@@ -0,0 +1,202 @@
+import os
+import time
+import random
+import logging
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+from requests.exceptions import ConnectionError, Timeout, HTTPError
+from . import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Limitele timeout-urilor adaptive (secunde); fără statistici se folosesc valorile implicite
+CONNECT_TIMEOUT_MIN = float(os.getenv('FETCH_CONNECT_TIMEOUT_MIN', 2))
+CONNECT_TIMEOUT_MAX = float(os.getenv('FETCH_CONNECT_TIMEOUT_MAX', 10))
+READ_TIMEOUT_MIN = float(os.getenv('FETCH_READ_TIMEOUT_MIN', 5))
+# Reîncercări pentru erori de rețea, timeout-uri și răspunsuri 5xx/429, cu backoff aleator
+RETRIES = int(os.getenv('FETCH_RETRIES', 2))
+BACKOFF_BASE = float(os.getenv('FETCH_BACKOFF_BASE', 0.5))
+BACKOFF_MAX = float(os.getenv('FETCH_BACKOFF_MAX', 5))
+# După atâtea eșecuri consecutive domeniul este ocolit OPEN_SECONDS (dublat la fiecare redeschidere)
+FAILURE_THRESHOLD = int(os.getenv('FETCH_BREAKER_THRESHOLD', 5))
+OPEN_SECONDS = float(os.getenv('FETCH_BREAKER_OPEN_SECONDS', 60))
+OPEN_SECONDS_MAX = float(os.getenv('FETCH_BREAKER_OPEN_SECONDS_MAX', 600))
+MAX_HOSTS = int(os.getenv('FETCH_POLICY_MAX_HOSTS', 10000))
+# Timeout-ul total implicit, folosit doar la afișarea timeout-urilor derivate
+REQUEST_TIMEOUT_DEFAULT = float(os.getenv('BATCH_FETCH_TIMEOUT', 60))
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """Domeniul a eșuat repetat; cererea este refuzată fără a mai fi trimisă."""
+
+    def __init__(self, host, retry_after):
+        super().__init__(f"Domeniul {host} este temporar indisponibil (reîncercare peste {retry_after:.0f}s)")
+        self.host = host
+        self.retry_after = retry_after
+
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+
+def is_retryable(error):
+    if isinstance(error, (ConnectionError, Timeout)):
+        return True
+    if isinstance(error, HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return False
+
+
+class HostState:
+    def __init__(self):
+        # Estimare a latenței ca la RTO-ul TCP: medie netezită și abatere netezită
+        self.srtt = None
+        self.rttvar = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.open_until = 0.0
+        self.open_seconds = OPEN_SECONDS
+        self.trial_running = False
+        self.last_error = None
+
+    def observe_latency(self, seconds):
+        if self.srtt is None:
+            self.srtt, self.rttvar = seconds, seconds / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - seconds)
+            self.srtt = 0.875 * self.srtt + 0.125 * seconds
+
+    def timeouts(self, timeout):
+        if self.srtt is None:
+            return min(CONNECT_TIMEOUT_MAX, timeout), timeout
+        rto = self.srtt + 4 * self.rttvar
+        connect = min(max(rto, CONNECT_TIMEOUT_MIN), CONNECT_TIMEOUT_MAX, timeout)
+        read = min(max(2 * rto, READ_TIMEOUT_MIN), timeout)
+        return connect, read
+
+
+class FetchPolicy:
+    """Timeout-uri adaptive, reîncercări și circuit breaker, separat pentru fiecare domeniu (per proces)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = OrderedDict()
+
+    def _state(self, host):
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState()
+            while len(self._hosts) > MAX_HOSTS:
+                self._hosts.popitem(last=False)
+        self._hosts.move_to_end(host)
+        return state
+
+    def _admit(self, host):
+        now = time.monotonic()
+        with self._lock:
+            state = self._state(host)
+            if state.state == OPEN:
+                if now < state.open_until:
+                    raise CircuitOpenError(host, state.open_until - now)
+                state.state = HALF_OPEN
+            if state.state == HALF_OPEN:
+                # O singură cerere de probă; celelalte sunt refuzate până la rezultatul ei
+                if state.trial_running:
+                    raise CircuitOpenError(host, 0)
+                state.trial_running = True
+
+    def _record_success(self, host, seconds):
+        with self._lock:
+            state = self._state(host)
+            state.observe_latency(seconds)
+            state.successes += 1
+            state.consecutive_failures = 0
+            state.trial_running = False
+            if state.state != CLOSED:
+                logger.info(f"Circuitul pentru {host} s-a închis")
+            state.state = CLOSED
+            state.open_seconds = OPEN_SECONDS
+
+    def _record_failure(self, host, error):
+        with self._lock:
+            state = self._state(host)
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_error = str(error)[:200]
+            reopen = state.state == HALF_OPEN
+            state.trial_running = False
+            if reopen or state.consecutive_failures >= FAILURE_THRESHOLD:
+                if reopen:
+                    state.open_seconds = min(state.open_seconds * 2, OPEN_SECONDS_MAX)
+                state.state = OPEN
+                state.open_until = time.monotonic() + state.open_seconds
+                logger.warning(f"Circuit deschis pentru {host} timp de {state.open_seconds:.0f}s: {error}")
+                return True
+            return False
+
+    def call(self, url, timeout, attempt):
+        """Rulează attempt((connect_timeout, read_timeout)) pentru url, cu politica domeniului.
+
+        Bugetul total, inclusiv reîncercările, rămâne cel al parametrului timeout.
+        """
+        host = _host(url)
+        deadline = time.monotonic() + timeout
+        for attempt_number in range(RETRIES + 1):
+            try:
+                self._admit(host)
+            except CircuitOpenError:
+                metrics.inc('fetch_attempts_total', result='circuit_open')
+                raise
+            with self._lock:
+                connect, read = self._state(host).timeouts(timeout)
+            remaining = deadline - time.monotonic()
+            started = time.monotonic()
+            try:
+                result = attempt((min(connect, remaining), min(read, remaining)))
+            except Exception as e:
+                if not is_retryable(e):
+                    # Erorile care nu țin de disponibilitatea domeniului nu afectează circuitul
+                    with self._lock:
+                        self._state(host).trial_running = False
+                    raise
+                opened = self._record_failure(host, e)
+                backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt_number))
+                if opened or attempt_number == RETRIES or deadline - time.monotonic() - backoff < CONNECT_TIMEOUT_MIN:
+                    metrics.inc('fetch_attempts_total', result='failure')
+                    raise
+                metrics.inc('fetch_attempts_total', result='retry')
+                time.sleep(backoff)
+                continue
+            self._record_success(host, time.monotonic() - started)
+            metrics.inc('fetch_attempts_total', result='ok')
+            return result
+
+    def snapshot(self, state=None):
+        now = time.monotonic()
+        with self._lock:
+            hosts = [
+                {
+                    'host': host,
+                    'state': host_state.state,
+                    'successes': host_state.successes,
+                    'failures': host_state.failures,
+                    'consecutive_failures': host_state.consecutive_failures,
+                    'latency_ms': round(host_state.srtt * 1000, 1) if host_state.srtt is not None else None,
+                    'timeouts': dict(zip(('connect', 'read'), host_state.timeouts(REQUEST_TIMEOUT_DEFAULT))),
+                    'retry_after': round(max(host_state.open_until - now, 0), 1) if host_state.state == OPEN else 0,
+                    'last_error': host_state.last_error
+                }
+                for host, host_state in self._hosts.items()
+                if state is None or host_state.state == state
+            ]
+        # Domeniile cu probleme primele
+        return sorted(hosts, key=lambda item: (item['state'] == CLOSED, -item['consecutive_failures'], item['host']))
+
+
+policy = FetchPolicy()
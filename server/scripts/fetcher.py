@@ -0,0 +1,74 @@
+import os
+import time
+import logging
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+from .web_scraper import scrape_raw_text_from_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_WORKERS = int(os.getenv('BATCH_FETCH_WORKERS', 16))
+PER_HOST_LIMIT = int(os.getenv('BATCH_FETCH_PER_HOST', 4))
+BATCH_DEADLINE = float(os.getenv('BATCH_FETCH_DEADLINE', 300))
+REQUEST_TIMEOUT = float(os.getenv('BATCH_FETCH_TIMEOUT', 60))
+
+FetchResult = namedtuple('FetchResult', ['url', 'text', 'error'])
+
+def _host(url):
+    return urlsplit(url).netloc.lower()
+
+def fetch_many(urls, fetch=scrape_raw_text_from_url, max_workers=MAX_WORKERS,
+               per_host=PER_HOST_LIMIT, deadline=BATCH_DEADLINE, timeout=REQUEST_TIMEOUT):
+    """Extrage concurent URL-urile și întoarce câte un FetchResult, în ordinea de intrare.
+
+    Implicit textul întors este brut; apelantul îl preprocesează în lot cu preprocess_texts.
+    """
+    results = [None] * len(urls)
+    if not urls:
+        return results
+
+    # Cozi separate per host: un host lent nu ocupă toate thread-urile din pool
+    pending = {}
+    for idx, url in enumerate(urls):
+        pending.setdefault(_host(url), deque()).append(idx)
+
+    active_per_host = {host: 0 for host in pending}
+    running = {}
+    stop_at = time.monotonic() + deadline
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        while pending or running:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                break
+
+            for host in list(pending):
+                while (pending[host] and active_per_host[host] < per_host
+                       and len(running) < max_workers):
+                    idx = pending[host].popleft()
+                    future = executor.submit(fetch, urls[idx], min(timeout, remaining))
+                    running[future] = (idx, host)
+                    active_per_host[host] += 1
+                if not pending[host]:
+                    del pending[host]
+
+            done, _ = wait(running, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx, host = running.pop(future)
+                active_per_host[host] -= 1
+                try:
+                    results[idx] = FetchResult(urls[idx], future.result(), None)
+                except Exception as e:
+                    logger.error(f"Eșec la extragerea {urls[idx]}: {e}")
+                    results[idx] = FetchResult(urls[idx], None, str(e))
+    finally:
+        # Cererile încă în zbor după termen sunt abandonate, nu așteptate
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    for idx, result in enumerate(results):
+        if result is None:
+            results[idx] = FetchResult(urls[idx], None, "Termenul limită al lotului a fost depășit")
+    return results
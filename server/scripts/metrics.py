@@ -0,0 +1,251 @@
+import os
+import json
+import time
+import glob
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fiecare worker gunicorn își scrie periodic valorile într-un fișier propriu din acest director;
+# /metrics, servit de oricare worker, însumează fișierele tuturor proceselor
+METRICS_DIR = os.getenv('METRICS_DIR', os.path.join(tempfile.gettempdir(), 'topic_analysis_metrics'))
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# Antetul Server-Timing expune duratele etapelor oricui face cererea, deci este opțional
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+
+PREFIX = 'topic_analysis_'
+BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0]
+
+HELP = {
+    'stage_duration_seconds': ('histogram', 'Durata fiecărei etape din calea de predicție'),
+    'request_duration_seconds': ('histogram', 'Durata cererilor HTTP, pe endpoint'),
+    'cache_lookups_total': ('counter', 'Căutări în cache, pe nivel (local/mongo) și rezultat (hit/miss)'),
+    'page_analyses_total': ('counter', 'Pagini analizate, după sursa predicției'),
+    'cache_warmer_refreshed_total': ('counter', 'Intrări de cache reîmprospătate de cache_warmer, după rezultat'),
+    'cache_warmer_seconds_total': ('counter', 'Timpul total petrecut de cache_warmer în extragere și predicție'),
+    'fetch_attempts_total': ('counter', 'Încercări de extragere, după rezultat (ok/retry/failure/circuit_open)'),
+    'write_buffer_operations_total': ('counter', 'Operații write-behind, după rezultat (flushed/retry/dead_letter/sync)'),
+    'coalesced_requests_total': ('counter', 'Predicții care au așteptat calculul altei cereri (în proces sau în alt worker)'),
+}
+
+# Rolul procesului apare în numele fișierului: la pornire, gunicorn șterge doar fișierele
+# masterului și ale workerilor, nu pe cele ale trainerului sau ale cache_warmer
+GUNICORN_ROLES = ('master', 'worker')
+_role = 'process'
+
+_lock = threading.Lock()
+# Cheia este (nume, etichete sortate); histogramele țin numărătorile cumulative per bucket
+_histograms = {}
+_counters = {}
+_last_flush = 0.0
+_local = threading.local()
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+        for idx, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram['buckets'][idx] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+@contextmanager
+def timed(stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        observe('stage_duration_seconds', elapsed, stage=stage)
+        # Duratele se adună și pe cererea curentă, pentru Server-Timing, doar în threadul cererii
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+
+def start_request():
+    _local.timings = {}
+    _local.started = time.perf_counter()
+
+
+def finish_request(endpoint):
+    """Închide măsurarea cererii curente; întoarce valoarea antetului Server-Timing (sau None)."""
+    timings = getattr(_local, 'timings', None)
+    started = getattr(_local, 'started', None)
+    _local.timings = None
+    if started is None:
+        return None
+    elapsed = time.perf_counter() - started
+    _local.started = None
+    observe('request_duration_seconds', elapsed, endpoint=endpoint or 'unknown')
+    maybe_flush()
+
+    if not SERVER_TIMING:
+        return None
+    entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in (timings or {}).items()]
+    entries.append(f"total;dur={elapsed * 1000:.1f}")
+    return ', '.join(entries)
+
+
+def _snapshot_path():
+    return os.path.join(METRICS_DIR, f"metrics-{_role}-{os.getpid()}.json")
+
+
+def set_role(role):
+    global _role
+    _role = role
+
+
+def reset(role=None):
+    """Golește valorile procesului curent; apelat în workerul gunicorn imediat după fork.
+
+    Fără el, fiecare worker ar raporta din nou ce a măsurat masterul înainte de fork
+    (de ex. încărcarea modelului la preload).
+    """
+    global _lock, _last_flush
+    # Lock-ul poate fi copiat ocupat din master, dacă alt thread îl ținea la fork
+    _lock = threading.Lock()
+    _histograms.clear()
+    _counters.clear()
+    _last_flush = 0.0
+    if role:
+        set_role(role)
+
+
+def snapshot():
+    with _lock:
+        return {
+            'histograms': [
+                {'name': name, 'labels': dict(labels), 'buckets': list(value['buckets']),
+                 'sum': value['sum'], 'count': value['count']}
+                for (name, labels), value in _histograms.items()
+            ],
+            'counters': [
+                {'name': name, 'labels': dict(labels), 'value': value}
+                for (name, labels), value in _counters.items()
+            ]
+        }
+
+
+def flush():
+    """Scrie atomic valorile procesului curent în fișierul său din METRICS_DIR."""
+    global _last_flush
+    _last_flush = time.monotonic()
+    try:
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        tmp_path = f"{_snapshot_path()}.tmp"
+        with open(tmp_path, 'w') as tmp_file:
+            json.dump(snapshot(), tmp_file)
+        os.replace(tmp_path, _snapshot_path())
+    except OSError as e:
+        logger.warning(f"Metricile nu au putut fi scrise în {METRICS_DIR}: {e}")
+
+
+def maybe_flush():
+    if time.monotonic() - _last_flush >= FLUSH_INTERVAL:
+        flush()
+
+
+def clear_snapshots(roles=GUNICORN_ROLES):
+    # Apelat o singură dată, la pornirea masterului: fișierele rulării anterioare nu se mai adună.
+    # Fișierele altor procese (trainer, cache_warmer) rămân, ele rulează independent de gunicorn
+    for role in roles:
+        for path in glob.glob(os.path.join(METRICS_DIR, f'metrics-{role}-*.json')):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _merged():
+    histograms = {}
+    counters = {}
+    # Fișierele workerilor opriți rămân: contoarele Prometheus nu trebuie să scadă
+    for path in glob.glob(os.path.join(METRICS_DIR, 'metrics-*.json')):
+        try:
+            with open(path, 'r') as snapshot_file:
+                data = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        for item in data.get('histograms', []):
+            key = _key(item['name'], item['labels'])
+            merged = histograms.setdefault(key, {'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], item['buckets'])]
+            merged['sum'] += item['sum']
+            merged['count'] += item['count']
+        for item in data.get('counters', []):
+            key = _key(item['name'], item['labels'])
+            counters[key] = counters.get(key, 0) + item['value']
+    return histograms, counters
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _cache_hit_ratios(counters):
+    totals = {}
+    for (name, labels), value in counters.items():
+        if name != 'cache_lookups_total':
+            continue
+        labels = dict(labels)
+        hits, lookups = totals.get(labels['layer'], (0, 0))
+        totals[labels['layer']] = (hits + (value if labels['result'] == 'hit' else 0), lookups + value)
+    return {layer: hits / lookups for layer, (hits, lookups) in totals.items() if lookups}
+
+
+def render():
+    """Toate metricile, însumate peste workeri, în formatul text Prometheus."""
+    flush()
+    histograms, counters = _merged()
+    lines = []
+
+    for metric, (kind, description) in HELP.items():
+        series = histograms if kind == 'histogram' else counters
+        keys = sorted(key for key in series if key[0] == metric)
+        if not keys:
+            continue
+        lines.append(f"# HELP {PREFIX}{metric} {description}")
+        lines.append(f"# TYPE {PREFIX}{metric} {kind}")
+        for key in keys:
+            labels = key[1]
+            if kind == 'counter':
+                lines.append(f"{PREFIX}{metric}{_format_labels(labels)} {series[key]}")
+                continue
+            histogram = series[key]
+            for bound, count in zip(BUCKETS, histogram['buckets']):
+                lines.append(f"{PREFIX}{metric}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{PREFIX}{metric}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{PREFIX}{metric}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{PREFIX}{metric}_count{_format_labels(labels)} {histogram['count']}")
+
+    ratios = _cache_hit_ratios(counters)
+    if ratios:
+        lines.append(f"# HELP {PREFIX}cache_hit_ratio Proporția căutărilor în cache care au găsit rezultatul")
+        lines.append(f"# TYPE {PREFIX}cache_hit_ratio gauge")
+        for layer, ratio in sorted(ratios.items()):
+            lines.append(f"{PREFIX}cache_hit_ratio{_format_labels([('layer', layer)])} {ratio}")
+
+    return '\n'.join(lines) + '\n'
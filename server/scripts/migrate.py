@@ -0,0 +1,27 @@
+"""Pas de migrare: creează indexurile MongoDB o singură dată, înaintea pornirii serverului.
+
+Rulare din rădăcina proiectului:
+    python -m server.scripts.migrate [--rebuild-analytics]
+"""
+import argparse
+import logging
+from .database import get_db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def migrate(rebuild_analytics=False):
+    db = get_db()
+    db.ensure_indexes()
+    logger.info("Indexurile MongoDB au fost create/actualizate")
+
+    # La prima rulare după introducerea contoarelor, acestea se calculează din istoricul existent
+    if rebuild_analytics or db.analytics_collection.estimated_document_count() == 0:
+        rows = db.rebuild_analytics()
+        logger.info(f"Contoarele de analiză au fost recalculate ({rows} rânduri)")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rebuild-analytics', action='store_true',
+                        help='recalculează contoarele zilnice din tot istoricul')
+    migrate(parser.parse_args().rebuild_analytics)
@@ -0,0 +1,229 @@
+import os
+import time
+import shutil
+import datetime
+import logging
+import threading
+from . import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODELS_DIR = os.getenv('MODELS_DIR', 'models')
+VERSIONS_DIR = os.path.join(MODELS_DIR, 'versions')
+# Pointerul "current": un fișier mic cu numele versiunii servite
+CURRENT_PATH = os.path.join(MODELS_DIR, 'CURRENT')
+# Artefactele vechi, dinaintea versionării, folosite doar dacă pointerul lipsește
+LEGACY_MODEL_PATH = os.path.join(MODELS_DIR, 'model.pkl')
+LEGACY_VECTORIZER_PATH = os.path.join(MODELS_DIR, 'vectorizer.pkl')
+
+MODEL_FILENAME = 'model.pkl'
+VECTORIZER_FILENAME = 'vectorizer.pkl'
+COMPACT_DIRNAME = 'compact'
+
+# Cât de des (în secunde) se verifică dacă pointerul indică o versiune nouă
+CHECK_INTERVAL = float(os.getenv('MODEL_CHECK_INTERVAL', 2))
+# Câte versiuni publicate se păstrează pe disc (cea curentă nu se șterge niciodată)
+KEEP_VERSIONS = int(os.getenv('MODEL_KEEP_VERSIONS', 5))
+# Workerii servesc din artefactele compacte, mapate în memorie, când versiunea le conține
+USE_COMPACT = os.getenv('MODEL_COMPACT', '1') == '1'
+# Câte documente de antrenare se folosesc la verificarea exportului compact
+VERIFY_SAMPLE_SIZE = int(os.getenv('MODEL_VERIFY_SAMPLE_SIZE', 500))
+
+
+def version_dir(version):
+    return os.path.join(VERSIONS_DIR, version)
+
+
+def read_current_version():
+    try:
+        with open(CURRENT_PATH, 'r') as current_file:
+            return current_file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def artifact_paths(version=None):
+    """Căile (model, vectorizator) ale unei versiuni; implicit ale celei curente."""
+    version = version or read_current_version()
+    if version is None:
+        return LEGACY_MODEL_PATH, LEGACY_VECTORIZER_PATH
+    return os.path.join(version_dir(version), MODEL_FILENAME), os.path.join(version_dir(version), VECTORIZER_FILENAME)
+
+
+def list_versions():
+    try:
+        entries = os.listdir(VERSIONS_DIR)
+    except FileNotFoundError:
+        return []
+    return sorted(entry for entry in entries if not entry.startswith('.'))
+
+
+def _point_to(version):
+    # Schimbarea versiunii curente este o singură redenumire atomică
+    tmp_path = f"{CURRENT_PATH}.tmp-{os.getpid()}"
+    with open(tmp_path, 'w') as tmp_file:
+        tmp_file.write(version)
+        tmp_file.flush()
+        os.fsync(tmp_file.fileno())
+    os.replace(tmp_path, CURRENT_PATH)
+
+
+def _prune_versions(keep=KEEP_VERSIONS):
+    current = read_current_version()
+    old_versions = [version for version in list_versions() if version != current]
+    for version in old_versions[:max(len(old_versions) - (keep - 1), 0)]:
+        shutil.rmtree(version_dir(version), ignore_errors=True)
+        logger.info(f"Versiunea de model {version} a fost ștearsă (politica de retenție)")
+
+
+def _export_compact(model, vectorizer, directory, verify_documents):
+    from .compact_model import export_compact_model, verify_compact_model
+
+    compact_dir = os.path.join(directory, COMPACT_DIRNAME)
+    try:
+        export_compact_model(model, vectorizer, compact_dir)
+        if verify_compact_model(compact_dir, model, vectorizer, list(verify_documents or [])[:VERIFY_SAMPLE_SIZE]):
+            return
+    except Exception as e:
+        logger.error(f"Exportul compact al modelului a eșuat: {e}")
+    # Fără artefacte compacte verificate, workerii folosesc fișierele pickle ale versiunii
+    shutil.rmtree(compact_dir, ignore_errors=True)
+
+
+def publish_model(model, vectorizer, verify_documents=None):
+    """Publică o versiune imuabilă nouă și mută pointerul pe ea; întoarce numele versiunii.
+
+    Pentru MultinomialNB se exportă și formatul compact, verificat pe verify_documents.
+    """
+    version = datetime.datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+    os.makedirs(VERSIONS_DIR, exist_ok=True)
+
+    # Directorul se scrie complet sub un nume temporar și apare dintr-o singură redenumire
+    tmp_dir = os.path.join(VERSIONS_DIR, f".tmp-{version}-{os.getpid()}")
+    os.makedirs(tmp_dir)
+    import joblib
+    try:
+        joblib.dump(model, os.path.join(tmp_dir, MODEL_FILENAME))
+        joblib.dump(vectorizer, os.path.join(tmp_dir, VECTORIZER_FILENAME))
+        if hasattr(model, 'feature_log_prob_'):
+            _export_compact(model, vectorizer, tmp_dir, verify_documents)
+        os.rename(tmp_dir, version_dir(version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _point_to(version)
+    _prune_versions()
+    logger.info(f"Model publicat cu versiunea {version}")
+    return version
+
+
+def rollback_model(version):
+    if version not in list_versions():
+        raise ValueError(f"Versiunea de model {version} nu există")
+    _point_to(version)
+    logger.info(f"Pointerul modelului a fost mutat pe versiunea {version}")
+    return version
+
+
+def load_artifacts(version=None, legacy=False):
+    """Încarcă o copie proprie (model, vectorizator), separată de cea servită de registry."""
+    # joblib (și odată cu el scikit-learn) se importă abia la prima încărcare a modelului
+    import joblib
+    if legacy:
+        model_path, vectorizer_path = LEGACY_MODEL_PATH, LEGACY_VECTORIZER_PATH
+    else:
+        model_path, vectorizer_path = artifact_paths(version)
+    return joblib.load(model_path), joblib.load(vectorizer_path)
+
+
+class LoadedModel:
+    """Pereche model/vectorizator încărcată împreună; nu se modifică după creare."""
+
+    def __init__(self, model, vectorizer, version):
+        self.model = model
+        self.vectorizer = vectorizer
+        self.version = version
+
+    def transform(self, texts):
+        return self.vectorizer.transform(texts)
+
+    def predict(self, texts):
+        return self.model.predict(self.transform(texts))
+
+    def predict_with_confidence(self, texts):
+        # Un singur transform rar și un singur predict_proba pentru tot lotul;
+        # argmax pe probabilități dă aceeași clasă ca model.predict
+        import numpy as np
+        probabilities = self.model.predict_proba(self.transform(texts))
+        best = probabilities.argmax(axis=1)
+        labels = self.model.classes_[best]
+        confidences = probabilities[np.arange(len(best)), best]
+        return labels, confidences
+
+
+class ModelRegistry:
+    """Ține modelul în memorie o singură dată per proces și îl reîncarcă la schimbare."""
+
+    def __init__(self, check_interval=CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._signature = None
+        self._last_check = 0.0
+
+    def _read_signature(self):
+        # Versiunile publicate sunt imuabile: pointerul ajunge drept semnătură.
+        # Fără pointer, se folosesc mtime/dimensiunea artefactelor vechi
+        version = read_current_version()
+        if version is not None:
+            return version
+        stats = []
+        for path in (LEGACY_MODEL_PATH, LEGACY_VECTORIZER_PATH):
+            st = os.stat(path)
+            stats.append((st.st_mtime_ns, st.st_size))
+        return tuple(stats)
+
+    def _load(self):
+        signature = self._read_signature()
+        if self._current is not None and signature == self._signature:
+            return
+        version = signature if isinstance(signature, str) else None
+        compact_dir = os.path.join(version_dir(version), COMPACT_DIRNAME) if version else None
+        with metrics.timed('model_load'):
+            if USE_COMPACT and compact_dir and os.path.exists(os.path.join(compact_dir, 'meta.json')):
+                from .compact_model import CompactModel
+                loaded = CompactModel(compact_dir, version)
+            else:
+                model, vectorizer = load_artifacts(version, legacy=version is None)
+                loaded = LoadedModel(model, vectorizer, version or 'legacy')
+
+        # O singură atribuire: cererile în curs păstrează referința la modelul vechi
+        self._current = loaded
+        self._signature = signature
+        logger.info(f"Model încărcat în memorie (versiunea {self._current.version})")
+
+    def get(self):
+        current = self._current
+        if current is not None and time.monotonic() - self._last_check < self.check_interval:
+            return current
+
+        with self._lock:
+            if self._current is not None and time.monotonic() - self._last_check < self.check_interval:
+                return self._current
+            self._last_check = time.monotonic()
+            try:
+                self._load()
+            except Exception as e:
+                if self._current is None:
+                    raise
+                logger.warning(f"Nu s-a putut reîncărca modelul, se folosește versiunea {self._current.version}: {e}")
+            return self._current
+
+
+registry = ModelRegistry()
+
+
+def get_model():
+    return registry.get()
@@ -1,20 +1,29 @@
 import pandas as pd
 import os
-import joblib
-import shutil
-import datetime
+import random
 import numpy as np
 import logging
-from sklearn.feature_extraction.text import CountVectorizer
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
 from sklearn.naive_bayes import MultinomialNB
-from .web_scraper import scrape_text_from_url
-from .database import Database
+from .database import get_db
+from .fetcher import fetch_many
+from .preprocess import preprocess_texts
+from .corpus_store import load_documents, features_key, load_features, save_features
+from .timing import StageTimer
+from .model_registry import publish_model, load_artifacts, VERIFY_SAMPLE_SIZE
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-db = Database()
+# Modul streaming: numărul de rânduri citite din CSV per bucată și dimensiunea spațiului hash
+STREAM_CHUNK_SIZE = int(os.getenv('TRAIN_CHUNK_SIZE', 500))
+HASH_FEATURES = int(os.getenv('TRAIN_HASH_FEATURES', 2 ** 20))
+# Extragerea pentru antrenare poate dura ore; termenul implicit al loturilor de predicție e prea scurt
+TRAIN_FETCH_DEADLINE = float(os.getenv('TRAIN_FETCH_DEADLINE', 24 * 3600))
+
+VECTORIZER_PARAMS = {'max_df': 0.95, 'min_df': 2, 'stop_words': 'english', 'ngram_range': (1, 2)}
 
 def read_csv(file_path):
     try:
@@ -33,22 +42,41 @@ def validate_columns(df, required_columns):
     return True
 
 def scrape_documents(links):
-    documents = []
-    for link in links:
-        try:
-            logger.info(f"Extragere text din URL: {link}")
-            text = scrape_text_from_url(link)
-            documents.append(text)
-        except Exception as e:
-            logger.error(f"Eșec la extragerea {link}: {e}")
-            documents.append('')
-    return documents
+    logger.info(f"Extragere text din {len(links)} URL-uri")
+    raw_texts = []
+    for result in fetch_many(links, deadline=TRAIN_FETCH_DEADLINE):
+        if result.error is not None:
+            logger.error(f"Eșec la extragerea {result.url}: {result.error}")
+        raw_texts.append(result.text or '')
+    # Preprocesarea spaCy rulează în loturi peste tot corpusul
+    return preprocess_texts(raw_texts)
+
+def drop_empty_documents(links, topics, documents):
+    # Paginile care nu au putut fi extrase (eroare, termen depășit) nu intră în antrenare ca documente goale
+    kept = [idx for idx, document in enumerate(documents) if document]
+    if len(kept) < len(documents):
+        logger.warning(f"{len(documents) - len(kept)} din {len(documents)} documente sunt goale și nu se folosesc")
+    return [links[idx] for idx in kept], [topics[idx] for idx in kept], [documents[idx] for idx in kept]
+
+def load_training_documents(links):
+    # Doar URL-urile care nu sunt deja în corpus sunt extrase și preprocesate
+    return load_documents(get_db(), links, scrape_documents)
 
 def vectorize_documents(documents):
-    vectorizer = CountVectorizer(max_df=0.95, min_df=2, stop_words='english', ngram_range=(1, 2))
+    vectorizer = CountVectorizer(**VECTORIZER_PARAMS)
     dtm = vectorizer.fit_transform(documents)
     return vectorizer, dtm
 
+def vectorize_documents_cached(documents):
+    # Același corpus și aceeași configurație refolosesc matricea salvată în format .npz
+    key = features_key(documents, VECTORIZER_PARAMS)
+    cached = load_features(key)
+    if cached is not None:
+        return cached
+    vectorizer, dtm = vectorize_documents(documents)
+    save_features(key, vectorizer, dtm)
+    return vectorizer, dtm
+
 def apply_lda(dtm, n_components=7):
     lda = LatentDirichletAllocation(n_components=n_components, random_state=42)
     lda.fit(dtm)
@@ -59,104 +87,207 @@ def train_predictive_model(dtm, topics):
     nb.fit(dtm, topics)
     return nb
 
-def save_model_and_vectorizer(model, vectorizer):
-    os.makedirs('database', exist_ok=True)
-    with open('models/model.pkl', 'wb') as model_file:
-        joblib.dump(model, model_file)
-    with open('models/vectorizer.pkl', 'wb') as vectorizer_file:
-        joblib.dump(vectorizer, vectorizer_file)
+def save_model_and_vectorizer(model, vectorizer, documents=None):
+    # Versiune nouă, imuabilă; workerii o preiau când pointerul "current" se schimbă.
+    # documents servesc la verificarea exportului compact față de model.predict
+    return publish_model(model, vectorizer, verify_documents=documents)
+
+def process_csv(file_path, timer=None):
+    db = get_db()
+    timer = timer or StageTimer('process_csv')
 
-def process_csv(file_path):
-    df = read_csv(file_path)
+    with timer.stage('read_csv'):
+        df = read_csv(file_path)
     if df is None or not validate_columns(df, ['topic', 'link']):
         raise ValueError("Format CSV invalid")
 
     topics = df['topic'].tolist()
     links = df['link'].tolist()
 
-    documents = scrape_documents(links)
-    vectorizer, dtm = vectorize_documents(documents)
-    lda = apply_lda(dtm)
+    with timer.stage('scrape'):
+        documents = load_training_documents(links)
+    links, topics, documents = drop_empty_documents(links, topics, documents)
+    if not documents:
+        raise ValueError("Nu s-a putut extrage conținut din niciunul dintre link-urile din CSV")
+    with timer.stage('vectorize'):
+        vectorizer, dtm = vectorize_documents_cached(documents)
+    with timer.stage('lda'):
+        lda = apply_lda(dtm)
 
-    db.store_training_data(links, topics, documents, lda, vectorizer)
-    nb_model = train_predictive_model(dtm, topics)
-    save_model_and_vectorizer(nb_model, vectorizer)
+    with timer.stage('store_training_data'):
+        db.store_training_data(links, topics, dtm, lda)
+    with timer.stage('train_nb'):
+        nb_model = train_predictive_model(dtm, topics)
+    with timer.stage('save_model'):
+        save_model_and_vectorizer(nb_model, vectorizer, documents)
     logger.info("CSV procesat și datele stocate în MongoDB")
+    return timer.report()
 
-def backup_models():
-    # Creează backup al modelelor curente - permite restaurarea
-    backup_time = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-    try:
-        os.makedirs('database', exist_ok=True)
-        if os.path.exists('models/vectorizer.pkl'):
-            shutil.copy('models/vectorizer.pkl', f'database/vectorizer_{backup_time}.pkl')
-        if os.path.exists('models/model.pkl'):
-            shutil.copy('models/model.pkl', f'database/model_{backup_time}.pkl')
-        logger.info(f"S-a creat backup-ul modelului cu timestamp-ul {backup_time}")
-        return backup_time
-    except Exception as e:
-        logger.warning(f"Nu s-a putut crea backup-ul modelului: {str(e)}")
-        return None
+def build_hashing_vectorizer(n_features=HASH_FEATURES):
+    # Fără vocabular de ținut în memorie; norm=None păstrează frecvențele brute cerute de NB și LDA
+    return HashingVectorizer(n_features=n_features, alternate_sign=False, norm=None,
+                             stop_words='english', ngram_range=(1, 2))
 
-def restore_models(backup_time):
-    try:
-        if os.path.exists(f'database/vectorizer_{backup_time}.pkl') and os.path.exists(f'database/model_{backup_time}.pkl'):
-            shutil.copy(f'database/vectorizer_{backup_time}.pkl', 'models/vectorizer.pkl')
-            shutil.copy(f'database/model_{backup_time}.pkl', 'models/model.pkl')
-            logger.info("Model restaurat din backup")
-            return True
-    except Exception as e:
-        logger.error(f"Eroare la restaurarea modelului din backup: {str(e)}")
-    return False
+def read_csv_summary(file_path, chunksize=STREAM_CHUNK_SIZE):
+    # Prima trecere, doar peste coloana topic: clasele (cerute de partial_fit) și numărul de rânduri
+    header = pd.read_csv(file_path, nrows=0)
+    if not validate_columns(header, ['topic', 'link']):
+        raise ValueError("Format CSV invalid")
 
-def retrain_model(urls, user_id):
-    contents = []
-    topics = []
-    
-    for url in urls:
-        history_entry = db.history_collection.find_one({"url": url, "user_id": user_id})
-        if not history_entry:
+    classes = set()
+    total = 0
+    for chunk in pd.read_csv(file_path, usecols=['topic'], chunksize=chunksize):
+        topics = chunk['topic'].dropna()
+        classes.update(topics.unique())
+        total += len(topics)
+    return sorted(classes), total
+
+def iter_csv_documents(file_path, chunksize=STREAM_CHUNK_SIZE):
+    # Bucata următoare se extrage și se preprocesează în timp ce bucata curentă este antrenată
+    reader = pd.read_csv(file_path, usecols=['topic', 'link'], chunksize=chunksize)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='train-prefetch') as executor:
+        pending = None
+        for chunk in reader:
+            chunk = chunk.dropna(subset=['topic', 'link'])
+            links = chunk['link'].tolist()
+            topics = chunk['topic'].tolist()
+            future = executor.submit(load_training_documents, links)
+            if pending is not None:
+                yield pending[0], pending[1], pending[2].result()
+            pending = (links, topics, future)
+        if pending is not None:
+            yield pending[0], pending[1], pending[2].result()
+
+class ReservoirSample:
+    """Eșantion uniform de cel mult size elemente dintr-un flux de lungime necunoscută."""
+
+    def __init__(self, size, seed=42):
+        self.size = size
+        self.items = []
+        self.seen = 0
+        self._random = random.Random(seed)
+
+    def extend(self, items):
+        for item in items:
+            self.seen += 1
+            if len(self.items) < self.size:
+                self.items.append(item)
+            else:
+                idx = self._random.randrange(self.seen)
+                if idx < self.size:
+                    self.items[idx] = item
+
+def process_csv_streaming(file_path, chunksize=STREAM_CHUNK_SIZE, n_features=HASH_FEATURES, n_components=7, timer=None):
+    """Antrenare out-of-core: memoria depinde de mărimea unei bucăți, nu de mărimea CSV-ului."""
+    db = get_db()
+    timer = timer or StageTimer('process_csv_streaming')
+
+    with timer.stage('read_csv'):
+        classes, total = read_csv_summary(file_path, chunksize)
+    if not classes:
+        raise ValueError("CSV-ul nu conține niciun topic")
+
+    vectorizer = build_hashing_vectorizer(n_features)
+    nb_model = MultinomialNB()
+    lda = LatentDirichletAllocation(n_components=n_components, learning_method='online',
+                                    total_samples=max(total, 1), random_state=42)
+
+    processed = 0
+    # Documentele pe care se verifică exportul compact, fără a ține tot corpusul în memorie
+    verify_sample = ReservoirSample(VERIFY_SAMPLE_SIZE)
+    documents_iter = iter_csv_documents(file_path, chunksize)
+    while True:
+        with timer.stage('scrape'):
+            batch = next(documents_iter, None)
+        if batch is None:
+            break
+        links, topics, documents = batch
+        processed += len(links)
+        links, topics, documents = drop_empty_documents(links, topics, documents)
+        if not documents:
             continue
-            
-        # Obține conținutul din cache sau prin extragere
-        cached_result = db.check_cache(url)
-        if cached_result and 'text' in cached_result:
-            content = cached_result['text']
+        verify_sample.extend(documents)
+
+        with timer.stage('vectorize'):
+            dtm = vectorizer.transform(documents)
+        with timer.stage('lda'):
+            lda.partial_fit(dtm)
+        with timer.stage('train_nb'):
+            nb_model.partial_fit(dtm, topics, classes=classes)
+        # Distribuțiile se calculează cu modelul LDA online de la momentul bucății curente
+        with timer.stage('store_training_data'):
+            db.store_training_data(links, topics, dtm, lda)
+
+        logger.info(f"Antrenare streaming: {processed}/{total} rânduri procesate")
+
+    if not hasattr(nb_model, 'classes_'):
+        raise ValueError("Nu s-a putut extrage conținut din niciunul dintre link-urile din CSV")
+    with timer.stage('save_model'):
+        save_model_and_vectorizer(nb_model, vectorizer, verify_sample.items)
+    logger.info("CSV procesat în mod streaming și datele stocate în MongoDB")
+    return timer.report()
+
+def retrain_model(urls, user_id, timer=None):
+    db = get_db()
+    timer = timer or StageTimer('retrain_model')
+    urls = list(dict.fromkeys(url for url in urls if url))
+
+    with timer.stage('load_history'):
+        # Câte o singură interogare $in pentru istoric și pentru cache, în loc de una per URL
+        history_entries = db.get_latest_history_for_urls(urls, user_id)
+        urls = [url for url in urls if url in history_entries]
+        cached_results = db.check_cache_many(urls)
+
+        # Textele din cache se citesc din colecția contents cu o singură interogare
+        cached_texts = dict(zip(cached_results, db.resolve_texts(list(cached_results.values()))))
+    contents = {}
+    to_scrape = []
+    for url in urls:
+        if cached_texts.get(url):
+            contents[url] = cached_texts[url]
         else:
-            try:
-                content = scrape_text_from_url(url)
-                db.save_to_cache(url, content, history_entry.get('prediction', ''))
-            except Exception as e:
-                logger.error(f"Eroare la extragerea URL-ului {url}: {str(e)}")
-                continue
-        
-        if content:
-            contents.append(content)
-            topics.append(history_entry.get('prediction', ''))
-    
-    if not contents:
+            to_scrape.append(url)
+
+    # Obține conținutul lipsă din cache prin extragere
+    if to_scrape:
+        with timer.stage('scrape'):
+            fetched = []
+            for result in fetch_many(to_scrape, deadline=TRAIN_FETCH_DEADLINE):
+                if result.error is not None:
+                    logger.error(f"Eroare la extragerea URL-ului {result.url}: {result.error}")
+                else:
+                    fetched.append(result)
+            texts = preprocess_texts([result.text for result in fetched])
+            scraped = [(result.url, text) for result, text in zip(fetched, texts)]
+            db.save_many_to_cache([
+                {'url': url, 'text': text, 'prediction': history_entries[url].get('prediction', '')}
+                for url, text in scraped
+            ])
+            contents.update(scraped)
+
+    training_urls = [url for url in urls if contents.get(url)]
+    if not training_urls:
         return False, "Nu s-a putut recupera conținut din niciunul dintre URL-urile furnizate"
 
-    backup_time = backup_models()
-    
     try:
-        vectorizer = joblib.load('models/vectorizer.pkl')
-        model = joblib.load('models/model.pkl')
+        with timer.stage('train_nb'):
+            # Copie proprie a versiunii curente: partial_fit nu modifică modelul servit de registry
+            model, vectorizer = load_artifacts()
+
+            X = vectorizer.transform([contents[url] for url in training_urls])
+            topics = [history_entries[url].get('prediction', '') for url in training_urls]
 
-        X = vectorizer.transform(contents)
+            all_classes = model.classes_
 
-        all_classes = model.classes_
-        
-        # Reantrenează clasificatorul cu noile date
-        model.partial_fit(X, topics, classes=all_classes)
+            # Reantrenează clasificatorul cu noile date
+            model.partial_fit(X, topics, classes=all_classes)
 
-        joblib.dump(vectorizer, 'models/vectorizer.pkl')
-        joblib.dump(model, 'models/model.pkl')
-        
-        return True, f"Model reantrenat cu succes cu {len(contents)} documente"
+        with timer.stage('save_model'):
+            # Versiunea anterioară rămâne pe disc; revenirea la ea înseamnă doar mutarea pointerului
+            version = save_model_and_vectorizer(model, vectorizer, [contents[url] for url in training_urls])
+        timer.report()
+
+        return True, f"Model reantrenat cu succes cu {len(training_urls)} documente (versiunea {version})"
     except Exception as e:
         logger.error(f"Eroare la reantrenarea modelului: {str(e)}")
-        if backup_time and restore_models(backup_time):
-            return False, f"Eroare la reantrenarea modelului: {str(e)} (restaurat din backup)"
-        else:
-            return False, f"Eroare la reantrenarea modelului: {str(e)} (nu s-a putut restaura din backup)"
+        return False, f"Eroare la reantrenarea modelului: {str(e)} (modelul curent nu a fost modificat)"
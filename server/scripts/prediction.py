@@ -1,57 +1,280 @@
 import logging
 import uuid
-import joblib
-import os
-from .web_scraper import scrape_text_from_url
-from .database import Database
+from requests.exceptions import Timeout
+from .web_scraper import fetch_page, Page
+from .fetcher import fetch_many, REQUEST_TIMEOUT
+from .cache import content_hash, normalize_url
+from .database import get_db
 from .text_processing import extract_word_frequencies
+from .preprocess import preprocess_texts
+from .model_registry import get_model
+from . import metrics
+from .single_flight import single_flight
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-db = Database()
+def _fetch_page(url, timeout, known_page=None):
+    try:
+        return fetch_page(url, timeout, known_page)
+    except Timeout:
+        logger.warning(f"Timeout apărut în timpul încercării de a extrage {url}")
+        return Page(url, '', None, None, False)
+
+def _known_pages(urls):
+    db = get_db()
+    # Validatorii contează doar dacă predicția salvată vine de la modelul servit acum
+    version = get_model().version
+    with metrics.timed('pages_lookup'):
+        pages = db.get_pages(urls)
+    return {url: page for url, page in pages.items() if page.get('model_version') == version}
+
+def _analyze_pages(pages, known_pages):
+    """Topicul pentru fiecare pagină extrasă; ce nu s-a schimbat refolosește predicția salvată.
+
+    Întoarce, în ordine, dicționare cu text, content_hash, prediction, confidence, word_frequencies;
+    text este None când predicția a fost refolosită, iar textul există deja în contents.
+    """
+    db = get_db()
+    model = get_model()
+    analyses = [None] * len(pages)
+    raw_hashes = [None] * len(pages)
+
+    # 304 Not Modified: pagina e aceeași, predicția salvată rămâne valabilă pentru același model
+    for idx, page in enumerate(pages):
+        known_page = known_pages.get(page.url)
+        if page.not_modified and known_page and known_page.get('model_version') == model.version:
+            analyses[idx] = known_page
+            metrics.inc('page_analyses_total', result='not_modified')
+        elif page.not_modified:
+            # Modelul s-a schimbat între timp: pagina se extrage din nou, integral
+            pages[idx] = _fetch_page(page.url, REQUEST_TIMEOUT)
+        if analyses[idx] is None:
+            raw_hashes[idx] = content_hash(pages[idx].text or '')
+
+    # Același text extras (pagină neschimbată sau articol identic pe alt URL)
+    with metrics.timed('pages_lookup'):
+        same_content = db.find_pages_by_hash({h for h in raw_hashes if h}, model.version)
+    to_compute = []
+    for idx, raw_hash in enumerate(raw_hashes):
+        if raw_hash is None:
+            continue
+        if raw_hash in same_content:
+            analyses[idx] = same_content[raw_hash]
+            metrics.inc('page_analyses_total', result='same_content')
+        else:
+            to_compute.append(idx)
+
+    if to_compute:
+        with metrics.timed('preprocess'):
+            texts = preprocess_texts([pages[idx].text or '' for idx in to_compute])
+        # Un singur transform și un singur predict_proba pentru toate documentele noi
+        with metrics.timed('inference'):
+            labels, confidences = model.predict_with_confidence(texts)
+        with metrics.timed('word_freq'):
+            word_frequencies = [extract_word_frequencies(text) for text in texts]
+        for idx, text, prediction, confidence, frequencies in zip(to_compute, texts, labels, confidences, word_frequencies):
+            analyses[idx] = {
+                'text': text,
+                'content_hash': content_hash(text),
+                'prediction': prediction,
+                'confidence': float(confidence),
+                'word_frequencies': frequencies
+            }
+        metrics.inc('page_analyses_total', len(to_compute), result='computed')
+
+    with metrics.timed('pages_write'):
+        db.save_pages([
+            {
+                'url': page.url,
+                'etag': page.etag,
+                'last_modified': page.last_modified,
+                'raw_hash': raw_hash or analysis.get('raw_hash'),
+                'text': analysis.get('text'),
+                'content_hash': analysis.get('content_hash'),
+                'prediction': analysis['prediction'],
+                'confidence': analysis.get('confidence'),
+                'word_frequencies': analysis.get('word_frequencies'),
+                'model_version': model.version
+            }
+            for page, raw_hash, analysis in zip(pages, raw_hashes, analyses)
+        ])
+
+    return [
+        {
+            'text': analysis.get('text'),
+            # Documentele salvate înaintea colecției contents au doar textul
+            'content_hash': analysis.get('content_hash') or content_hash(analysis.get('text') or ''),
+            'prediction': analysis['prediction'],
+            'confidence': analysis.get('confidence'),
+            'word_frequencies': analysis.get('word_frequencies') or {}
+        }
+        for analysis in analyses
+    ]
 
 def predict_topic(url, user_id=None):
+    db = get_db()
     if not url:
         return {"error": "Nu a fost furnizat niciun URL"}, 400
 
-    cached_result = db.check_cache(url)
+    with metrics.timed('cache_lookup'):
+        cached_result = db.check_cache(url)
     if cached_result:
-        db.save_to_history(url, cached_result.get('text', ''), cached_result.get('prediction', ''), user_id)
+        with metrics.timed('history_write'):
+            db.save_to_history(url, cached_result.get('text'), cached_result.get('prediction', ''), user_id,
+                               text_hash=cached_result.get('content_hash'))
         return {
             'predicted_topic': cached_result.get('prediction', ''),
             'word_frequencies': cached_result.get('word_frequencies', {}),
             'from_cache': True
         }, 200
 
+    # Cererile simultane pentru același URL (în worker și între workeri) așteaptă un singur calcul
+    outcome = single_flight.run(normalize_url(url), lambda: _compute_prediction(url))
+    if 'error' in outcome:
+        return {"error": outcome['error']}, 500
+
+    with metrics.timed('history_write'):
+        db.save_to_history(url, None, outcome['prediction'], user_id, text_hash=outcome['content_hash'])
+
+    return {
+        'predicted_topic': outcome['prediction'],
+        'word_frequencies': outcome['word_frequencies'],
+        'from_cache': False
+    }, 200
+
+def _outcome(analysis):
+    # Rezultatul partajat cu apelanții care au așteptat același calcul (serializabil BSON)
+    return {
+        'prediction': analysis['prediction'],
+        'confidence': analysis.get('confidence'),
+        'word_frequencies': analysis['word_frequencies'],
+        'content_hash': analysis['content_hash']
+    }
+
+def _compute_prediction(url):
+    """Extrage, prezice și pune în cache un URL; întoarce rezultatul sau {'error': ...}."""
+    db = get_db()
     try:
-        text = scrape_text_from_url(url)
+        known_pages = _known_pages([url])
+        page = _fetch_page(url, REQUEST_TIMEOUT, known_pages.get(url))
     except Exception as e:
         logger.error(f"Eșec la extragerea {url}: {e}")
-        return {"error": f"Eșec la extragerea {url}: {e}"}, 500
+        return {"error": f"Eșec la extragerea {url}: {e}"}
 
     try:
-        with open('./models/model.pkl', 'rb') as model_file:
-            model = joblib.load(model_file)
-        with open('./models/vectorizer.pkl', 'rb') as vectorizer_file:
-            vectorizer = joblib.load(vectorizer_file)
+        analysis = _analyze_pages([page], known_pages)[0]
+        with metrics.timed('cache_write'):
+            db.save_to_cache(url, analysis['text'], analysis['prediction'], analysis['word_frequencies'],
+                             text_hash=analysis['content_hash'])
+        return _outcome(analysis)
+    except Exception as e:
+        logger.error(f"Eroare la predicția topicului: {e}")
+        return {"error": f"Eroare la predicția topicului: {e}"}
 
-        text_vectorized = vectorizer.transform([text])
-        prediction = model.predict(text_vectorized)[0]
+def _compute_predictions(urls):
+    """Ca _compute_prediction, pentru mai multe URL-uri extrase concurent; întoarce {url: rezultat}."""
+    db = get_db()
+    outcomes = {}
+    # Paginile lipsă din cache se extrag concurent, cu cereri condiționate unde există validatori
+    known_pages = _known_pages(urls)
+    fetched = fetch_many(urls, fetch=lambda url, timeout: _fetch_page(url, timeout, known_pages.get(url)))
 
-        word_frequencies = extract_word_frequencies(text)
+    scraped = []
+    for fetch_result in fetched:
+        if fetch_result.error is not None:
+            outcomes[fetch_result.url] = {'error': fetch_result.error}
+        else:
+            scraped.append(fetch_result)
 
-        db.save_to_cache(url, text, prediction, word_frequencies)
-        db.save_to_history(url, text, prediction, user_id)
+    if scraped:
+        try:
+            analyses = _analyze_pages([fetch_result.text for fetch_result in scraped], known_pages)
+        except Exception as e:
+            logger.error(f"Eroare la predicția lotului: {e}")
+            for fetch_result in scraped:
+                outcomes[fetch_result.url] = {'error': str(e)}
+            analyses = []
 
-        return {
-            'predicted_topic': prediction,
-            'word_frequencies': word_frequencies,
-            'from_cache': False
-        }, 200
-    except Exception as e:
-        logger.error(f"Eroare la predicția topicului: {e}")
-        return {"error": f"Eroare la predicția topicului: {e}"}, 500
+        for fetch_result, analysis in zip(scraped, analyses):
+            outcomes[fetch_result.url] = _outcome(analysis)
+        with metrics.timed('cache_write'):
+            db.save_many_to_cache([dict(analysis, url=fetch_result.url)
+                                   for fetch_result, analysis in zip(scraped, analyses)])
+    return outcomes
+
+def _predict_batch(urls, user_id, batch_id):
+    db = get_db()
+    results = [None] * len(urls)
+    history_entries = []
+    to_fetch = []
+    # Un singur $in pentru tot lotul, nu o citire per URL
+    with metrics.timed('cache_lookup'):
+        cached_results = db.check_cache_many(urls)
+    for idx, url in enumerate(urls):
+        cached_result = cached_results.get(url)
+        if cached_result:
+            results[idx] = {
+                'url': url,
+                'predicted_topic': cached_result.get('prediction', ''),
+                'from_cache': True
+            }
+            history_entries.append({
+                'url': url,
+                'text': cached_result.get('text'),
+                'content_hash': cached_result.get('content_hash'),
+                'prediction': cached_result.get('prediction', '')
+            })
+        else:
+            to_fetch.append(idx)
+
+    if to_fetch:
+        # URL-urile calculate deja de o altă cerere (din lot sau din alt worker) nu se extrag din nou
+        key_urls = {}
+        for idx in to_fetch:
+            key_urls.setdefault(normalize_url(urls[idx]), urls[idx])
+        outcomes = single_flight.run_many(list(key_urls), lambda keys: _compute_keys(keys, key_urls))
+
+        for idx in to_fetch:
+            url = urls[idx]
+            outcome = outcomes[normalize_url(url)]
+            if 'error' in outcome:
+                results[idx] = {
+                    'url': url,
+                    'error': outcome['error']
+                }
+                continue
+            history_entries.append({
+                'url': url,
+                'content_hash': outcome['content_hash'],
+                'prediction': outcome['prediction'],
+                'confidence': outcome['confidence']
+            })
+            results[idx] = {
+                'url': url,
+                'predicted_topic': outcome['prediction'],
+                'confidence': outcome['confidence'],
+                'from_cache': False
+            }
+
+    with metrics.timed('history_write'):
+        db.save_many_to_history(history_entries, user_id, batch_id)
+    return results
+
+def _compute_keys(keys, key_urls):
+    outcomes = _compute_predictions([key_urls[key] for key in keys])
+    return {key: outcomes[key_urls[key]] for key in keys}
+
+def group_results(results):
+    grouped_results = {}
+    for result in results:
+        if 'error' in result:
+            continue
+        topic = result['predicted_topic']
+        if topic not in grouped_results:
+            grouped_results[topic] = []
+        grouped_results[topic].append(result['url'])
+    return grouped_results
 
 def batch_predict(urls, user_id=None):
     if not urls:
@@ -60,62 +283,12 @@ def batch_predict(urls, user_id=None):
     try:
         # Se generează un ID de lot
         batch_id = str(uuid.uuid4())
-        
-        results = []
-        for url in urls:
-            if not url:
-                continue
 
-            cached_result = db.check_cache(url)
-            if cached_result:
-                results.append({
-                    'url': url,
-                    'predicted_topic': cached_result.get('prediction', ''),
-                    'from_cache': True
-                })
-                db.save_to_history(url, cached_result.get('text', ''), cached_result.get('prediction', ''), user_id, batch_id)
-                continue
-            
-            try:
-                text = scrape_text_from_url(url)
-                
-                with open('./models/model.pkl', 'rb') as model_file:
-                    model = joblib.load(model_file)
-                with open('./models/vectorizer.pkl', 'rb') as vectorizer_file:
-                    vectorizer = joblib.load(vectorizer_file)
-                
-                text_vectorized = vectorizer.transform([text])
-                prediction = model.predict(text_vectorized)[0]
-
-                word_frequencies = extract_word_frequencies(text)
-
-                db.save_to_cache(url, text, prediction, word_frequencies)
-                db.save_to_history(url, text, prediction, user_id, batch_id)
-                
-                results.append({
-                    'url': url,
-                    'predicted_topic': prediction,
-                    'from_cache': False
-                })
-            except Exception as e:
-                logger.error(f"Error processing URL {url}: {e}")
-                results.append({
-                    'url': url,
-                    'error': str(e)
-                })
+        results = _predict_batch([url for url in urls if url], user_id, batch_id)
 
-        grouped_results = {}
-        for result in results:
-            if 'error' in result:
-                continue
-            topic = result['predicted_topic']
-            if topic not in grouped_results:
-                grouped_results[topic] = []
-            grouped_results[topic].append(result['url'])
-        
         return {
             'results': results,
-            'grouped_results': grouped_results,
+            'grouped_results': group_results(results),
             'batch_id': batch_id
         }, 200
         
@@ -1,27 +1,117 @@
+import os
 import re
-import spacy
-import nltk
-from nltk.corpus import stopwords
+from functools import lru_cache
 
 # nltk.download('stopwords') # Descărcă stopwords dacă nu sunt deja instalate
 
-nlp = spacy.load("en_core_web_sm")
+# Preprocesarea folosește doar etichetele POS, tipul entităților și lemele;
+# parserul de dependențe nu contribuie la rezultat și este dezactivat
+DISABLED_COMPONENTS = ['parser']
 
 additional_stopwords = [
     "-", "_", "'", "would", "could", "should", "also", "us", "said", "error",
     "please", "ad", "blocker", "site", "always", "however"
 ]
 
-def preprocess_text(text):
-    stop_words = set(stopwords.words('english')).union(set(additional_stopwords)) # Combină stopwords din NLTK cu lista personalizată
+KEPT_POS = {'NOUN', 'ADJ'}
+
+NON_ALPHA_PATTERN = re.compile(r'[^a-zA-Z\s]')
+
+PIPE_BATCH_SIZE = int(os.getenv('NLP_BATCH_SIZE', 64))
+PIPE_N_PROCESS = int(os.getenv('NLP_N_PROCESS', 1))
+
+# Textele mai lungi de CHUNK_THRESHOLD caractere se împart la granițe de propoziție în bucăți
+# de cel mult CHUNK_CHARS; sub prag, rezultatul este identic cu un singur nlp(text)
+CHUNK_THRESHOLD = int(os.getenv('NLP_CHUNK_THRESHOLD', 100000))
+CHUNK_CHARS = int(os.getenv('NLP_CHUNK_CHARS', 20000))
+# Bucățile unei pagini mari trec prin pipeline câte puține odată, ca memoria să rămână mărginită
+CHUNK_BATCH_SIZE = int(os.getenv('NLP_CHUNK_BATCH_SIZE', 4))
+# Politica de trunchiere: caracterele de după MAX_CHARS sunt ignorate, iar din rezultat se păstrează
+# cel mult MAX_TOKENS cuvinte (0 = fără limită)
+MAX_CHARS = int(os.getenv('NLP_MAX_CHARS', 2000000))
+MAX_TOKENS = int(os.getenv('NLP_MAX_TOKENS', 0))
 
-    text = re.sub(r'[^a-zA-Z\s]', '', text)
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
 
-    doc = nlp(text)
+@lru_cache(maxsize=None)
+def get_nlp():
+    # spaCy și modelul se încarcă la prima utilizare (sau în master-ul gunicorn, la preload)
+    import spacy
+    return spacy.load("en_core_web_sm", disable=DISABLED_COMPONENTS)
 
+@lru_cache(maxsize=None)
+def get_stop_words():
+    # Combină stopwords din NLTK cu lista personalizată, o singură dată per proces
+    from nltk.corpus import stopwords
+    return frozenset(set(stopwords.words('english')).union(set(additional_stopwords)))
+
+def _clean(text):
+    return NON_ALPHA_PATTERN.sub('', text)
+
+def _filter_words(doc, stop_words):
     filtered_words = []
     for token in doc:
-        if token.text.lower() not in stop_words and not token.ent_type_ and token.pos_ in {'NOUN', 'ADJ'}:
+        if token.text.lower() not in stop_words and not token.ent_type_ and token.pos_ in KEPT_POS:
             filtered_words.append(token.lemma_)
 
-    return ' '.join(filtered_words)
+    return filtered_words
+
+def split_chunks(text, threshold=CHUNK_THRESHOLD, chunk_chars=CHUNK_CHARS, max_chars=MAX_CHARS):
+    """Împarte textul în bucăți de cel mult chunk_chars, la granițe de propoziție; textele sub prag rămân întregi."""
+    if max_chars and len(text) > max_chars:
+        text = text[:max_chars]
+    if len(text) <= threshold:
+        return [text]
+
+    chunks = []
+    current = []
+    size = 0
+    for sentence in SENTENCE_BOUNDARY.split(text):
+        if size + len(sentence) > chunk_chars and current:
+            chunks.append(' '.join(current))
+            current, size = [], 0
+        # O „propoziție" mai lungă decât o bucată (text fără punctuație) se taie la un spațiu
+        while len(sentence) > chunk_chars:
+            cut = sentence.rfind(' ', 0, chunk_chars)
+            cut = cut if cut > 0 else chunk_chars
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:].lstrip()
+        current.append(sentence)
+        size += len(sentence) + 1
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def preprocess_text(text):
+    return preprocess_texts([text], n_process=1)[0]
+
+def preprocess_texts(texts, batch_size=PIPE_BATCH_SIZE, n_process=PIPE_N_PROCESS, max_tokens=MAX_TOKENS):
+    # Procesează documentele în loturi prin nlp.pipe; rezultatele păstrează ordinea intrării
+    nlp = get_nlp()
+    stop_words = get_stop_words()
+    words = []
+    whole = []
+    chunked = []
+    for idx, text in enumerate(texts):
+        words.append([])
+        chunks = split_chunks(text)
+        if len(chunks) == 1:
+            whole.append((_clean(chunks[0]), idx))
+        else:
+            chunked.append((idx, chunks))
+
+    for doc, idx in nlp.pipe(whole, as_tuples=True, batch_size=batch_size, n_process=n_process):
+        words[idx] = _filter_words(doc, stop_words)
+
+    def stream_chunks():
+        # Bucățile sunt curățate și trimise pe rând; după epuizarea bugetului restul paginii nu mai intră
+        for idx, chunks in chunked:
+            for chunk in chunks:
+                if max_tokens and len(words[idx]) >= max_tokens:
+                    break
+                yield _clean(chunk), idx
+
+    for doc, idx in nlp.pipe(stream_chunks(), as_tuples=True, batch_size=CHUNK_BATCH_SIZE, n_process=n_process):
+        words[idx].extend(_filter_words(doc, stop_words))
+
+    return [' '.join(doc_words[:max_tokens] if max_tokens else doc_words) for doc_words in words]
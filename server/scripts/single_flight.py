@@ -0,0 +1,159 @@
+import os
+import time
+import uuid
+import logging
+import datetime
+import threading
+from .database import get_db
+from . import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+COALESCE_ENABLED = os.getenv('COALESCE_ENABLED', '1') == '1'
+# Durata maximă a unui calcul (extragere + predicție); după ea, lease-ul poate fi preluat de alt proces
+LEASE_SECONDS = float(os.getenv('COALESCE_LEASE_SECONDS', 120))
+# Cât timp rămâne rezultatul în lease după calcul
+RESULT_SECONDS = float(os.getenv('COALESCE_RESULT_SECONDS', 30))
+POLL_INTERVAL = float(os.getenv('COALESCE_POLL_INTERVAL', 0.2))
+
+
+def _is_error(result):
+    return isinstance(result, dict) and 'error' in result
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    """Un singur calcul per cheie: în proces prin evenimente, între workeri prin lease-uri MongoDB.
+
+    Primul apelant din proces pentru o cheie conduce: obține lease-ul și calculează, sau,
+    dacă lease-ul este al altui worker, așteaptă rezultatul publicat în documentul lease.
+    Ceilalți apelanți din proces așteaptă rezultatul primului.
+    """
+
+    def __init__(self, lease_seconds=LEASE_SECONDS, result_seconds=RESULT_SECONDS, poll_interval=POLL_INTERVAL):
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._flights = {}
+
+    def _owner(self):
+        # Identitatea se calculează per proces: după fork, fiecare worker are propriul owner
+        return f"{os.getpid()}-{threading.get_ident()}-{uuid.uuid4().hex[:8]}"
+
+    def _join(self, keys):
+        leading, following = {}, {}
+        with self._lock:
+            for key in keys:
+                flight = self._flights.get(key)
+                if flight is None:
+                    flight = self._flights[key] = _Flight()
+                    leading[key] = flight
+                else:
+                    following[key] = flight
+        return leading, following
+
+    def _finish(self, flights, results):
+        with self._lock:
+            for key, flight in flights.items():
+                flight.result = results.get(key)
+                flight.done.set()
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+
+    def _wait_remote(self, db, keys):
+        # Rezultatele calculate de alți workeri, citite din lease-uri cu o interogare $in per interval
+        results = {}
+        pending = set(keys)
+        deadline = time.monotonic() + self.lease_seconds
+        while pending and time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            now = datetime.datetime.utcnow()
+            leases = db.get_leases(pending)
+            for key in list(pending):
+                lease = leases.get(key)
+                if lease and lease.get('done'):
+                    results[key] = lease.get('result')
+                    pending.discard(key)
+                elif lease is None or lease['expires_at'] < now:
+                    # Workerul care calcula s-a oprit: cheia se calculează aici
+                    pending.discard(key)
+        return results
+
+    def run_many(self, keys, compute):
+        """Rezultatul pentru fiecare cheie; compute(chei) -> {cheie: rezultat} rulează doar pentru
+        cheile pe care nu le calculează deja alt apelant. Rezultatele trebuie să fie serializabile BSON.
+        """
+        keys = list(dict.fromkeys(keys))
+        if not COALESCE_ENABLED:
+            return compute(keys)
+
+        db = get_db()
+        owner = self._owner()
+        leading, following = self._join(keys)
+        results = {}
+        acquired = set()
+        published = set()
+        try:
+            try:
+                acquired = db.acquire_leases(leading, owner, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"Lease-urile nu au putut fi obținute, se calculează local: {e}")
+                acquired = set(leading)
+
+            remote = [key for key in leading if key not in acquired]
+            if remote:
+                metrics.inc('coalesced_requests_total', len(remote), scope='worker')
+                with metrics.timed('coalesce_wait'):
+                    results.update(self._wait_remote(db, remote))
+
+            # Cheile proprii și cele al căror calcul de la alt worker nu s-a încheiat
+            to_compute = [key for key in leading if key not in results]
+            if to_compute:
+                computed = compute(to_compute)
+                results.update(computed)
+                # O eroare (de obicei temporară, ca un timeout) nu se publică: cererile următoare
+                # pentru URL, din orice worker, încearcă din nou în loc să primească eroarea păstrată
+                successful = {key: computed[key] for key in to_compute
+                              if key in acquired and key in computed and not _is_error(computed[key])}
+                try:
+                    db.publish_lease_results(successful, owner, self.result_seconds)
+                    published.update(successful)
+                except Exception as e:
+                    logger.warning(f"Rezultatele nu au putut fi publicate în lease-uri: {e}")
+        finally:
+            # Apelanții locali nu rămân blocați nici dacă calculul a aruncat o excepție
+            self._finish(leading, results)
+            # Lease-urile fără rezultat publicat (excepție sau eroare în calcul) sunt eliberate,
+            # altfel ceilalți workeri ar aștepta până la expirarea lor
+            unfinished = [key for key in acquired if key not in published]
+            if unfinished:
+                try:
+                    db.release_leases(unfinished, owner)
+                except Exception as e:
+                    logger.warning(f"Lease-urile nu au putut fi eliberate: {e}")
+
+        if following:
+            metrics.inc('coalesced_requests_total', len(following), scope='process')
+            missing = []
+            with metrics.timed('coalesce_wait'):
+                for key, flight in following.items():
+                    if flight.done.wait(self.lease_seconds) and flight.result is not None:
+                        results[key] = flight.result
+                    else:
+                        missing.append(key)
+            if missing:
+                results.update(compute(missing))
+        return results
+
+    def run(self, key, compute):
+        return self.run_many([key], lambda keys: {keys[0]: compute()})[key]
+
+
+single_flight = SingleFlight()
@@ -0,0 +1,39 @@
+import time
+import logging
+from contextlib import contextmanager
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Măsoară separat durata fiecărei etape a unui proces lung (de ex. antrenarea)."""
+
+    def __init__(self, name, on_stage=None, on_start=None):
+        self.name = name
+        # on_start(etapă) la intrarea în etapă, on_stage(etapă, secunde) la ieșire
+        self.on_stage = on_stage
+        self.on_start = on_start
+        self.timings = {}
+
+    @contextmanager
+    def stage(self, stage_name):
+        if self.on_start:
+            self.on_start(stage_name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.timings[stage_name] = self.timings.get(stage_name, 0.0) + elapsed
+            logger.info(f"[{self.name}] etapa '{stage_name}' a durat {elapsed:.2f}s")
+            if self.on_stage:
+                self.on_stage(stage_name, elapsed)
+
+    def total(self):
+        return sum(self.timings.values())
+
+    def report(self):
+        summary = ', '.join(f"{stage}={seconds:.2f}s" for stage, seconds in self.timings.items())
+        logger.info(f"[{self.name}] total {self.total():.2f}s ({summary})")
+        return dict(self.timings)
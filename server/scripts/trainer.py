@@ -0,0 +1,176 @@
+"""Procesul dedicat antrenărilor: consumă coada training_jobs, câte un job pe rând.
+
+Workerii gunicorn doar pun joburile în coadă (/upload_csv, /retrain_model) și servesc predicții;
+modelul nou ajunge la ei prin pointerul de versiune din model_registry.
+
+Rulare din rădăcina proiectului (proces separat de gunicorn):
+    python -m server.scripts.trainer [--once]
+"""
+import os
+import time
+import socket
+import argparse
+import datetime
+import logging
+import threading
+from .database import get_db
+from .timing import StageTimer
+from .model_registry import read_current_version
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = float(os.getenv('TRAINER_POLL_INTERVAL', 2))
+# Trainerul își confirmă periodic jobul; unul fără semn de viață atâta timp este preluat din nou
+HEARTBEAT_SECONDS = float(os.getenv('TRAINER_HEARTBEAT_SECONDS', 30))
+STALE_SECONDS = float(os.getenv('TRAINER_STALE_SECONDS', 300))
+# Un job care a oprit trainerul de atâtea ori nu mai este reluat
+MAX_ATTEMPTS = int(os.getenv('TRAINER_MAX_ATTEMPTS', 3))
+# Etapa în care se publică modelul: pornește doar după ce trainerul își confirmă jobul
+PUBLISH_STAGE = 'save_model'
+
+
+class JobCancelled(Exception):
+    """Jobul a fost preluat de alt trainer; antrenarea locală se oprește la următoarea etapă."""
+
+
+def _run_csv(job, timer):
+    from .model_training import process_csv
+    process_csv(job['params']['file_path'], timer=timer)
+    return "CSV procesat și datele stocate în MongoDB"
+
+def _run_csv_streaming(job, timer):
+    from .model_training import process_csv_streaming
+    process_csv_streaming(job['params']['file_path'], timer=timer)
+    return "CSV procesat în mod streaming și datele stocate în MongoDB"
+
+def _run_retrain(job, timer):
+    from .model_training import retrain_model
+    success, message = retrain_model(job['params']['urls'], job['params'].get('user_id'), timer=timer)
+    if not success:
+        raise RuntimeError(message)
+    return message
+
+RUNNERS = {
+    'csv': _run_csv,
+    'csv_streaming': _run_csv_streaming,
+    'retrain': _run_retrain
+}
+
+
+def _heartbeat(db, job_id, worker, stop, cancelled):
+    while not stop.wait(HEARTBEAT_SECONDS):
+        try:
+            if not db.update_training_job(job_id, worker):
+                logger.warning(f"Jobul {job_id} a fost preluat de alt trainer")
+                cancelled.set()
+                return
+        except Exception as e:
+            logger.warning(f"Heartbeat eșuat pentru jobul {job_id}: {e}")
+
+def _start_stage(db, job_id, worker, stage, cancelled):
+    if cancelled.is_set():
+        raise JobCancelled(f"Jobul {job_id} a fost preluat de alt trainer")
+    try:
+        owned = db.update_training_job(job_id, worker, stage)
+    except Exception as e:
+        # Modelul nu se publică fără confirmarea jobului; celelalte etape continuă
+        if stage == PUBLISH_STAGE:
+            raise
+        logger.warning(f"Progresul jobului {job_id} nu a putut fi salvat: {e}")
+        return
+    if not owned:
+        cancelled.set()
+        raise JobCancelled(f"Jobul {job_id} a fost preluat de alt trainer")
+
+def _report(db, job_id, worker, stage, seconds, cancelled):
+    # O eroare temporară a bazei de date nu oprește o antrenare de ore întregi
+    try:
+        if not db.update_training_job(job_id, worker, stage, seconds):
+            cancelled.set()
+    except Exception as e:
+        logger.warning(f"Progresul jobului {job_id} nu a putut fi salvat: {e}")
+
+def run_job(db, job, worker):
+    job_id = job['_id']
+    # Setat de heartbeat sau de o actualizare respinsă când jobul a trecut la alt trainer;
+    # fiecare etapă îl verifică la intrare
+    cancelled = threading.Event()
+    timer = StageTimer(
+        f"training_job {job_id}",
+        on_start=lambda stage: _start_stage(db, job_id, worker, stage, cancelled),
+        on_stage=lambda stage, seconds: _report(db, job_id, worker, stage, seconds, cancelled)
+    )
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(db, job_id, worker, stop, cancelled),
+                                 name='trainer-heartbeat', daemon=True)
+    heartbeat.start()
+    try:
+        if job['attempts'] > MAX_ATTEMPTS:
+            raise RuntimeError(f"Jobul a fost întrerupt de {job['attempts'] - 1} ori și nu mai este reluat")
+        runner = RUNNERS.get(job['kind'])
+        if runner is None:
+            raise ValueError(f"Tip de job necunoscut: {job['kind']}")
+        message = runner(job, timer)
+        # Scrierile write-behind ale antrenării ajung în MongoDB înainte ca jobul să apară terminat
+        db.flush()
+        if db.finish_training_job(job_id, worker, 'completed', message,
+                                  {'model_version': read_current_version(), 'total_seconds': round(timer.total(), 3)}):
+            logger.info(f"Jobul de antrenare {job_id} s-a încheiat în {timer.total():.2f}s")
+            _remove_upload(job)
+        else:
+            # Preluat după publicare: fișierul rămâne pentru trainerul care îl rulează acum
+            logger.warning(f"Jobul {job_id} a fost preluat de alt trainer după publicarea modelului")
+    except Exception as e:
+        # retrain_model întoarce erorile ca mesaj, deci anularea se recunoaște după eveniment
+        if cancelled.is_set():
+            logger.warning(f"Antrenarea jobului {job_id} a fost oprită: jobul a fost preluat de alt trainer")
+        else:
+            logger.error(f"Jobul de antrenare {job_id} a eșuat: {e}")
+            # Fișierul încărcat rămâne pe disc pentru diagnosticare
+            db.finish_training_job(job_id, worker, 'failed', str(e))
+    finally:
+        stop.set()
+
+def _remove_upload(job):
+    file_path = job['params'].get('file_path')
+    if file_path:
+        try:
+            os.remove(file_path)
+        except FileNotFoundError:
+            pass
+
+def run_once(db, worker):
+    """Procesează următorul job din coadă; întoarce False dacă nu era niciunul."""
+    stale_before = datetime.datetime.now() - datetime.timedelta(seconds=STALE_SECONDS)
+    job = db.claim_training_job(worker, stale_before)
+    if job is None:
+        return False
+    if job['attempts'] > 1:
+        logger.warning(f"Jobul {job['_id']} este reluat (încercarea {job['attempts']})")
+    logger.info(f"Jobul de antrenare {job['_id']} ({job['kind']}) a fost preluat")
+    run_job(db, job, worker)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--once', action='store_true', help='procesează joburile din coadă, apoi ieșire')
+    args = parser.parse_args()
+
+    db = get_db()
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    logger.info(f"Trainerul {worker} așteaptă joburi")
+    while True:
+        try:
+            processed = run_once(db, worker)
+        except Exception as e:
+            logger.error(f"Eroare la preluarea jobului de antrenare: {e}")
+            processed = False
+        if not processed:
+            if args.once:
+                break
+            time.sleep(POLL_INTERVAL)
+    db.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+import os
+import uuid
+import logging
+from .database import get_db
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Fișierele CSV încărcate, câte unul per job, până când trainerul le procesează.
+# Directorul trebuie să fie comun serverului și procesului trainer
+UPLOAD_DIR = os.getenv('TRAINING_UPLOAD_DIR', 'uploads')
+
+
+def staged_path(job_id):
+    return os.path.join(UPLOAD_DIR, f"{job_id}.csv")
+
+def stage_upload(file, job_id):
+    # Se scrie sub un nume temporar: trainerul nu vede niciodată un fișier parțial
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = staged_path(job_id)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    file.save(tmp_path)
+    os.replace(tmp_path, path)
+    return path
+
+def submit_csv_job(file, streaming=False, user_id=None):
+    job_id = str(uuid.uuid4())
+    path = stage_upload(file, job_id)
+    kind = 'csv_streaming' if streaming else 'csv'
+    try:
+        get_db().create_training_job(job_id, kind, {'file_path': path}, user_id)
+    except Exception:
+        os.remove(path)
+        raise
+    logger.info(f"Jobul de antrenare {job_id} ({kind}) a fost pus în coadă")
+    return {'job_id': job_id, 'status': 'queued', 'kind': kind}, 202
+
+def submit_retrain_job(urls, user_id=None):
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {"success": False, "message": "Nu au fost furnizate URL-uri pentru reantrenare"}, 400
+
+    job_id = str(uuid.uuid4())
+    get_db().create_training_job(job_id, 'retrain', {'urls': urls, 'user_id': user_id}, user_id)
+    logger.info(f"Jobul de reantrenare {job_id} ({len(urls)} URL-uri) a fost pus în coadă")
+    return {
+        'success': True,
+        'message': f"Reantrenarea cu {len(urls)} URL-uri a fost pusă în coadă",
+        'job_id': job_id,
+        'status': 'queued'
+    }, 202
+
+def _status(job):
+    finished_at = job.get('finished_at')
+    started_at = job.get('started_at')
+    return {
+        'job_id': job['_id'],
+        'kind': job['kind'],
+        'status': job['status'],
+        'stage': job.get('stage'),
+        'timings': {stage: round(seconds, 3) for stage, seconds in (job.get('timings') or {}).items()},
+        'attempts': job.get('attempts', 0),
+        'message': job.get('message'),
+        'result': job.get('result'),
+        'created_at': job['created_at'].isoformat(),
+        'started_at': started_at.isoformat() if started_at else None,
+        'finished_at': finished_at.isoformat() if finished_at else None
+    }
+
+def get_training_job_status(job_id):
+    job = get_db().get_training_job(job_id)
+    if not job:
+        return {"error": "Jobul de antrenare nu a fost găsit"}, 404
+    return _status(job), 200
+
+def list_training_jobs(status=None, limit=50):
+    return [_status(job) for job in get_db().list_training_jobs(status, limit)], 200
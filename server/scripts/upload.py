@@ -1,4 +1,4 @@
-from server.main import process_csv
+from server.scripts.model_training import process_csv
 
 file_path = '../../data/training_data.csv'
 process_csv(file_path)
@@ -0,0 +1,17 @@
+import logging
+from .preprocess import get_nlp, get_stop_words
+from .model_registry import get_model
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+def warmup():
+    # Încarcă spaCy, stopwords și modelul; rulat în master-ul gunicorn (preload), paginile
+    # de memorie sunt apoi partajate copy-on-write de workeri. Nu deschide conexiuni MongoDB.
+    get_nlp()
+    get_stop_words()
+    try:
+        get_model()
+    except Exception as e:
+        logger.warning(f"Modelul nu a putut fi preîncărcat: {e}")
+    logger.info("Modulele NLP/ML au fost preîncărcate")
@@ -1,15 +1,113 @@
+import os
+import threading
+import importlib.util
+from collections import namedtuple
 import requests
+from requests.adapters import HTTPAdapter
 from requests.exceptions import Timeout
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from .preprocess import preprocess_text
+from . import metrics
+from .fetch_policy import policy as fetch_policy
 
-def scrape_text_from_url(url, timeout = 60):
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+# lxml închide <p> înaintea elementelor bloc (<div>, <table>, <ul>), ca browserele; html.parser le
+# păstrează în paragraf. SCRAPER_HTML_PARSER=html.parser păstrează textul extras de versiunile vechi
+HTML_PARSER = os.getenv('SCRAPER_HTML_PARSER') or HTML_PARSER
+
+# Dimensiunea pool-ului de conexiuni keep-alive per sesiune
+POOL_CONNECTIONS = int(os.getenv('SCRAPER_POOL_CONNECTIONS', 32))
+POOL_MAXSIZE = int(os.getenv('SCRAPER_POOL_MAXSIZE', 8))
+# Se citesc cel mult atâția octeți din corpul răspunsului; restul paginii este ignorat
+MAX_PAGE_BYTES = int(os.getenv('SCRAPER_MAX_PAGE_BYTES', 5 * 1024 * 1024))
+READ_CHUNK_BYTES = 64 * 1024
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+# Se construiesc doar elementele <p> și descendenții lor, nu tot arborele documentului
+PARAGRAPHS_ONLY = SoupStrainer('p')
+
+_local = threading.local()
+
+# Rezultatul unei extrageri; not_modified=True când serverul a răspuns 304 la cererea condiționată
+Page = namedtuple('Page', ['url', 'text', 'etag', 'last_modified', 'not_modified'])
+
+def get_session():
+    # Câte o sesiune per thread: conexiunile se refolosesc între cereri succesive
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        _local.session = session
+    return session
+
+def _download(url, timeouts, headers, validators):
+    # O singură încercare; întoarce (conținut, etag, last_modified, not_modified)
+    with get_session().get(url, timeout=timeouts, headers=headers, stream=True) as response:
+        if response.status_code == 304 and validators:
+            return None, validators.get('etag'), validators.get('last_modified'), True
+        # 5xx/429: eroare temporară a domeniului, reîncercată de politica de extragere
+        if response.status_code >= 500 or response.status_code == 429:
+            response.raise_for_status()
+
+        etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        # PDF-uri, imagini etc. nu au paragrafe: corpul nici nu se mai descarcă
+        if not is_html_response(response):
+            return b'', etag, last_modified, False
+        return read_limited(response), etag, last_modified, False
+
+def fetch_page(url, timeout=60, validators=None):
+    # validators: ETag/Last-Modified salvate la extragerea anterioară a paginii
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+    # Timeout-urile adaptive, reîncercările și circuit breaker-ul domeniului (fetch_policy)
+    with metrics.timed('fetch'):
+        content, etag, last_modified, not_modified = fetch_policy.call(
+            url, timeout, lambda timeouts: _download(url, timeouts, headers, validators)
+        )
+    if not_modified:
+        return Page(url, None, etag, last_modified, True)
+    if not content:
+        return Page(url, '', etag, last_modified, False)
+    with metrics.timed('parse'):
+        text = extract_paragraph_text(content)
+    return Page(url, text, etag, last_modified, False)
+
+def is_html_response(response):
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    return not content_type or content_type in HTML_CONTENT_TYPES
+
+def read_limited(response, max_bytes=MAX_PAGE_BYTES):
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(READ_CHUNK_BYTES):
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= max_bytes:
+            break
+    return b''.join(chunks)[:max_bytes]
+
+def extract_paragraph_text(content, parser=HTML_PARSER):
+    soup = BeautifulSoup(content, parser, parse_only=PARAGRAPHS_ONLY)
+    paragraphs = soup.find_all('p')
+    return ' '.join([para.get_text() for para in paragraphs])
+
+def fetch_paragraph_text(url, timeout=60):
+    return fetch_page(url, timeout).text
+
+def scrape_raw_text_from_url(url, timeout=60):
+    # Textul paragrafelor, nepreprocesat; folosit de căile care preprocesează în lot
     try:
-        response = requests.get(url, timeout=timeout)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        paragraphs = soup.find_all('p')
-        text = ' '.join([para.get_text() for para in paragraphs])
-        return preprocess_text(text)
+        return fetch_paragraph_text(url, timeout)
     except Timeout:
         print(f"Timeout apărut în timpul încercării de a extrage {url}")
-        return ''
\ No newline at end of file
+        return ''
+
+def scrape_text_from_url(url, timeout = 60):
+    return preprocess_text(scrape_raw_text_from_url(url, timeout))
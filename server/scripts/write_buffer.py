@@ -0,0 +1,195 @@
+import os
+import time
+import queue
+import logging
+import threading
+from pymongo.errors import BulkWriteError
+from . import metrics
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindBuffer:
+    """Coadă de scrieri MongoDB golită în fundal prin bulk_write, după dimensiune sau timp.
+
+    Fiecare element este (colecție, operație, cheie, on_written); operațiile cu aceeași cheie din
+    același lot se reduc la ultima, ca upsert-urile repetate pentru un URL să nu concureze.
+    on_written, dacă există, se apelează după ce MongoDB a confirmat scrierea.
+
+    Un lot eșuat din cauza conexiunii este reîncercat de până la retries ori, cu backoff.
+    Dacă tot nu ajunge în MongoDB, operațiile sunt numărate ca pierdute (dead letter), iar
+    scrierile următoare devin sincrone, cu eroarea vizibilă apelantului, până la prima reușită.
+    """
+
+    def __init__(self, max_batch=500, flush_interval=1.0, max_pending=10000, put_timeout=2.0,
+                 retries=3, backoff=0.5, backoff_max=10.0):
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._closed = False
+        self.flushed = 0
+        self.failed = 0
+        self.retried = 0
+        self.dead_letters = 0
+        self.sync_fallbacks = 0
+        # Setat după un lot pierdut: scrierile trec sincron prin put() până când una reușește
+        self.degraded = False
+
+    def _ensure_thread(self):
+        # Thread-ul nu supraviețuiește unui fork, deci se pornește la prima scriere din proces
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def put(self, collection, operation, key=None, on_written=None):
+        item = (collection, operation, key, on_written)
+        if self._closed or self.degraded:
+            self._write_sync([item])
+            return
+        self._ensure_thread()
+        try:
+            # Backpressure: când coada e plină, cererea așteaptă un timp limitat...
+            self._queue.put(item, timeout=self.put_timeout)
+        except queue.Full:
+            # ...iar apoi scrie sincron, ca memoria să rămână limitată
+            self.sync_fallbacks += 1
+            self._write_sync([item])
+
+    def _drain(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    @staticmethod
+    def _group(batch):
+        grouped = {}
+        for item in batch:
+            collection, operation, key, _ = item
+            operations = grouped.setdefault(collection.full_name, (collection, {}))[1]
+            operations[key if key is not None else id(operation)] = item
+        return grouped.values()
+
+    def _count_flushed(self, items):
+        self.flushed += len(items)
+        metrics.inc('write_buffer_operations_total', len(items), result='flushed')
+        self._notify(items)
+
+    @staticmethod
+    def _notify(items):
+        for _, _, _, on_written in items:
+            if on_written is not None:
+                try:
+                    on_written()
+                except Exception as e:
+                    logger.warning(f"Eroare în callback-ul unei scrieri confirmate: {e}")
+
+    def _write(self, batch):
+        """Scrie lotul; întoarce (elementele de reîncercat, elementele respinse definitiv)."""
+        retry, rejected = [], []
+        for collection, items in self._group(batch):
+            items = list(items.values())
+            try:
+                collection.bulk_write([operation for _, operation, _, _ in items], ordered=False)
+                self._count_flushed(items)
+            except BulkWriteError as e:
+                # Cu ordered=False restul operațiilor au fost aplicate. Cheia duplicată înseamnă
+                # că operația a ajuns deja în MongoDB (de ex. la o reîncercare); celelalte erori
+                # de scriere sunt deterministe și nu se reîncearcă
+                failed = [error for error in e.details.get('writeErrors', []) if error.get('code') != 11000]
+                failed_indexes = {error['index'] for error in failed}
+                rejected.extend(items[idx] for idx in sorted(failed_indexes))
+                self._count_flushed([item for idx, item in enumerate(items) if idx not in failed_indexes])
+                if failed:
+                    logger.error(f"{len(failed)} operații respinse la scrierea în lot în {collection.name}: "
+                                 f"{failed[0].get('errmsg')}")
+            except Exception as e:
+                self.failed += len(items)
+                logger.warning(f"Eroare la scrierea în lot în {collection.name}: {e}")
+                retry.extend(items)
+        return retry, rejected
+
+    def _write_sync(self, batch):
+        # Scriere directă, în threadul apelantului; erorile ajung la apelant, ca fără write-behind
+        for collection, items in self._group(batch):
+            collection.bulk_write([operation for _, operation, _, _ in items.values()], ordered=False)
+            self.flushed += len(items)
+            self._notify(items.values())
+        metrics.inc('write_buffer_operations_total', len(batch), result='sync')
+        if self.degraded:
+            logger.info("Scrierea în MongoDB funcționează din nou; se revine la write-behind")
+            self.degraded = False
+
+    def _dead_letter(self, items, reason):
+        self.dead_letters += len(items)
+        metrics.inc('write_buffer_operations_total', len(items), result='dead_letter')
+        for collection, operation, _, _ in items:
+            logger.error(f"Operație pierdută în {collection.name} ({reason}): {operation}")
+
+    def _write_with_retries(self, batch):
+        pending = batch
+        for attempt in range(self.retries + 1):
+            pending, rejected = self._write(pending)
+            if rejected:
+                self._dead_letter(rejected, 'respinsă de MongoDB')
+            if not pending:
+                return
+            if attempt < self.retries:
+                self.retried += len(pending)
+                metrics.inc('write_buffer_operations_total', len(pending), result='retry')
+                time.sleep(min(self.backoff_max, self.backoff * 2 ** attempt))
+        self._dead_letter(pending, f"după {self.retries} reîncercări")
+        self.degraded = True
+        logger.error("Scrierile write-behind eșuează; scrierile următoare se fac sincron până la prima reușită")
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            batch = self._drain(first)
+            try:
+                self._write_with_retries(batch)
+            except Exception as e:
+                logger.error(f"Eroare neașteptată în threadul write-behind: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        # Așteaptă până când toate scrierile puse în coadă până acum au ajuns în MongoDB
+        if self._thread is not None and self._pid == os.getpid():
+            self._queue.join()
+
+    def close(self):
+        self.flush()
+        self._closed = True
+
+    def stats(self):
+        return {
+            'pending': self._queue.qsize(),
+            'flushed': self.flushed,
+            'failed': self.failed,
+            'retried': self.retried,
+            'dead_letters': self.dead_letters,
+            'sync_fallbacks': self.sync_fallbacks,
+            'degraded': self.degraded
+        }
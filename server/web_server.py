@@ -4,6 +4,8 @@ import os
 
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000')
+# Rutele administrative (de ex. /models/rollback) cer acest token; fără el sunt dezactivate
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": CORS_ORIGINS}})
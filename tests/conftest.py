@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+# Testele rulează fără MongoDB real: scrierile sunt sincrone, metricile merg într-un director temporar
+os.environ.setdefault('DB_WRITE_BEHIND', '0')
+os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix='topic_analysis_test_metrics_'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mongomock
+import pytest
+
+from server.scripts.database import Database, set_db
+
+
+@pytest.fixture
+def db():
+    database = Database(client=mongomock.MongoClient(), write_behind=False)
+    database.ensure_indexes()
+    set_db(database)
+    yield database
+    set_db(None)
@@ -0,0 +1,28 @@
+import pytest
+
+from server import main
+
+
+@pytest.fixture
+def client(db):
+    return main.app.test_client()
+
+
+def test_rollback_disabled_without_admin_token(client, monkeypatch):
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', '')
+    response = client.post('/models/rollback', json={'version': 'v1'})
+    assert response.status_code == 403
+
+
+def test_rollback_rejects_wrong_token(client, monkeypatch):
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', 'secret')
+    assert client.post('/models/rollback', json={'version': 'v1'}).status_code == 401
+    response = client.post('/models/rollback', json={'version': 'v1'}, headers={'Authorization': 'Bearer wrong'})
+    assert response.status_code == 401
+
+
+def test_rollback_with_token_reaches_handler(client, monkeypatch):
+    monkeypatch.setattr(main, 'ADMIN_TOKEN', 'secret')
+    response = client.post('/models/rollback', json={'version': 'missing'}, headers={'Authorization': 'Bearer secret'})
+    # Versiunea nu există: cererea a trecut de verificarea tokenului
+    assert response.status_code == 404
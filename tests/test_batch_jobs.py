@@ -0,0 +1,36 @@
+import json
+import datetime
+
+from server.scripts import batch_jobs
+
+
+def _finished_job(db, batch_id, count):
+    urls = [f'http://site.test/{idx}' for idx in range(count)]
+    db.create_batch_job(batch_id, None, urls, 'w')
+    now = datetime.datetime.now()
+    db.history_collection.insert_many([
+        {'url': url, 'prediction': 'WORLD', 'confidence': 0.9, 'batch_id': batch_id, 'timestamp': now}
+        for url in urls
+    ])
+    db.finish_batch_job(batch_id, 'completed', worker='w')
+    return urls
+
+
+def test_finished_job_streams_every_result_before_final_progress(db):
+    urls = _finished_job(db, 'b1', 1200)
+    events = [json.loads(line) for line in batch_jobs.stream_ndjson('b1')]
+
+    assert [event['url'] for event in events if event['type'] == 'result'] == urls
+    assert events[-1]['type'] == 'progress'
+    assert events[-1]['status'] == 'completed'
+    assert sum(event['type'] == 'progress' for event in events) == 1
+
+
+def test_reconnect_with_cursor_resumes_after_last_result(db):
+    urls = _finished_job(db, 'b1', 700)
+    events = [json.loads(line) for line in batch_jobs.stream_ndjson('b1')]
+    cursor = events[99]['cursor']
+
+    resumed = [json.loads(line) for line in batch_jobs.stream_ndjson('b1', cursor)]
+    assert [event['url'] for event in resumed if event['type'] == 'result'] == urls[100:]
+    assert resumed[-1]['status'] == 'completed'
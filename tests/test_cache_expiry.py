@@ -0,0 +1,49 @@
+import time
+import datetime
+
+import pytest
+
+from server.scripts import database
+from server.scripts.database import local_cache
+
+
+@pytest.fixture
+def bucharest_time(monkeypatch):
+    # Un fus orar diferit de UTC, ca diferența dintre ora locală și UTC să conteze
+    monkeypatch.setenv('TZ', 'Europe/Bucharest')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def insert_cache(db, url, **fields):
+    db.cache_collection.insert_one(dict({'url': url, 'prediction': 'WORLD'}, **fields))
+    local_cache.clear()
+
+
+def test_expired_entry_is_a_miss_before_ttl_cleanup(db):
+    insert_cache(db, 'http://a/', timestamp=datetime.datetime.now(),
+                 expires_at=datetime.datetime.utcnow() - datetime.timedelta(seconds=1))
+    insert_cache(db, 'http://b/', timestamp=datetime.datetime.now(),
+                 expires_at=datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+    assert db.check_cache('http://a/') is None
+    assert db.check_cache('http://b/')['prediction'] == 'WORLD'
+    assert set(db.check_cache_many(['http://a/', 'http://b/'])) == {'http://b/'}
+
+
+def test_legacy_entry_without_expiry_uses_timestamp(db, bucharest_time):
+    ttl = datetime.timedelta(seconds=database.CACHE_TTL_SECONDS)
+    insert_cache(db, 'http://old/', timestamp=datetime.datetime.now() - ttl - datetime.timedelta(minutes=1))
+    insert_cache(db, 'http://new/', timestamp=datetime.datetime.now() - ttl + datetime.timedelta(minutes=10))
+    assert db.check_cache('http://old/') is None
+    assert db.check_cache('http://new/') is not None
+
+
+def test_backfill_converts_local_timestamp_to_utc(db, bucharest_time):
+    timestamp = datetime.datetime(2099, 7, 1, 12, 0, 0)
+    insert_cache(db, 'http://a/', timestamp=timestamp)
+    db.backfill_cache_expiry()
+    doc = db.cache_collection.find_one({'url': 'http://a/'})
+    # Ora de vară a Bucureștiului este UTC+3
+    assert doc['expires_at'] == datetime.datetime(2099, 7, 1, 9, 0, 0) + datetime.timedelta(seconds=database.CACHE_TTL_SECONDS)
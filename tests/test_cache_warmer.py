@@ -0,0 +1,36 @@
+import datetime
+
+from server.scripts import cache_warmer
+from server.scripts.cache import normalize_url
+
+
+def _hits(db, url, count):
+    now = datetime.datetime.now()
+    db.history_collection.insert_many([{'url': url, 'prediction': 'WORLD', 'timestamp': now} for _ in range(count)])
+
+
+def test_variants_are_merged_before_threshold(db, monkeypatch):
+    monkeypatch.setattr(cache_warmer, 'MIN_HITS', 2)
+    _hits(db, 'http://a.com/news?utm_source=x', 1)
+    _hits(db, 'http://a.com/news/', 1)
+    _hits(db, 'http://b.com/', 1)
+    candidates = cache_warmer.select_candidates(db)
+    assert [normalize_url(url) for url in candidates] == ['http://a.com/news']
+
+
+def test_top_n_applies_to_merged_counts(db, monkeypatch):
+    monkeypatch.setattr(cache_warmer, 'MIN_HITS', 1)
+    monkeypatch.setattr(cache_warmer, 'TOP_N', 1)
+    _hits(db, 'http://b.com/', 2)
+    for source in ('a', 'b', 'c'):
+        _hits(db, f'http://a.com/?utm_source={source}', 1)
+    candidates = cache_warmer.select_candidates(db)
+    assert [normalize_url(url) for url in candidates] == ['http://a.com/']
+
+
+def test_fresh_cache_entries_are_skipped(db, monkeypatch):
+    monkeypatch.setattr(cache_warmer, 'MIN_HITS', 1)
+    _hits(db, 'http://a.com/', 2)
+    _hits(db, 'http://b.com/', 1)
+    db.save_to_cache('http://a.com/', 'text', 'WORLD')
+    assert cache_warmer.select_candidates(db) == ['http://b.com/']
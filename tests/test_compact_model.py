@@ -0,0 +1,59 @@
+import os
+
+import pytest
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+from sklearn.naive_bayes import MultinomialNB
+
+from server.scripts import model_registry
+from server.scripts.compact_model import CompactModel, export_compact_model, verify_compact_model
+from server.scripts.model_training import ReservoirSample
+
+DOCUMENTS = ['stock market bank rates', 'football match goal', 'bank inflation rates', 'tennis match win'] * 5
+TOPICS = ['BUSINESS', 'SPORTS', 'BUSINESS', 'SPORTS'] * 5
+
+
+@pytest.fixture
+def models_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(model_registry, 'VERSIONS_DIR', str(tmp_path / 'versions'))
+    monkeypatch.setattr(model_registry, 'CURRENT_PATH', str(tmp_path / 'CURRENT'))
+    return tmp_path
+
+
+def train(vectorizer):
+    dtm = vectorizer.fit_transform(DOCUMENTS)
+    return MultinomialNB().fit(dtm, TOPICS), vectorizer
+
+
+@pytest.mark.parametrize('vectorizer', [
+    CountVectorizer(),
+    HashingVectorizer(n_features=2 ** 10, alternate_sign=False, norm=None)
+])
+def test_compact_model_matches_predict(tmp_path, vectorizer):
+    model, vectorizer = train(vectorizer)
+    export_compact_model(model, vectorizer, str(tmp_path))
+    assert verify_compact_model(str(tmp_path), model, vectorizer, DOCUMENTS)
+    assert list(CompactModel(str(tmp_path)).predict(['bank rates', 'match goal'])) == ['BUSINESS', 'SPORTS']
+
+
+def test_verification_fails_without_documents(tmp_path):
+    model, vectorizer = train(CountVectorizer())
+    export_compact_model(model, vectorizer, str(tmp_path))
+    assert not verify_compact_model(str(tmp_path), model, vectorizer, [])
+
+
+def test_publish_skips_unverified_compact_export(models_dir):
+    model, vectorizer = train(CountVectorizer())
+    unverified = model_registry.publish_model(model, vectorizer)
+    assert not os.path.exists(os.path.join(model_registry.version_dir(unverified), model_registry.COMPACT_DIRNAME))
+    verified = model_registry.publish_model(model, vectorizer, DOCUMENTS)
+    assert os.path.exists(os.path.join(model_registry.version_dir(verified), model_registry.COMPACT_DIRNAME, 'meta.json'))
+
+
+def test_reservoir_sample_is_bounded_and_uniform_over_stream():
+    sample = ReservoirSample(10, seed=1)
+    for start in range(0, 1000, 100):
+        sample.extend(range(start, start + 100))
+    assert len(sample.items) == 10
+    assert sample.seen == 1000
+    # Elementele din a doua jumătate a fluxului au aceeași șansă să rămână în eșantion
+    assert any(item >= 500 for item in sample.items)
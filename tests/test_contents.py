@@ -0,0 +1,49 @@
+import pytest
+
+from server.scripts import database
+from server.scripts.cache import content_hash
+from server.scripts.content_migration import migrate_collection
+
+
+@pytest.fixture(autouse=True)
+def clear_content_refs():
+    database._stored_contents.clear()
+    yield
+    database._stored_contents.clear()
+
+
+def test_refreshing_legacy_cache_entry_drops_old_text(db):
+    db.cache_collection.insert_one({'url': 'http://a/', 'text': 'old text', 'prediction': 'WORLD'})
+    db.save_to_cache('http://a/', 'new text', 'SCIENCE')
+
+    doc = db.cache_collection.find_one({'url': 'http://a/'})
+    assert 'text' not in doc
+    assert doc['content_hash'] == content_hash('new text')
+    assert db.resolve_texts([doc]) == ['new text']
+    # Migrarea nu mai găsește text vechi cu care să suprascrie hash-ul nou
+    assert migrate_collection(db, db.cache_collection, pause=0) == 0
+    assert db.cache_collection.find_one({'url': 'http://a/'})['content_hash'] == content_hash('new text')
+
+
+def test_content_hash_is_remembered_only_after_write(db, monkeypatch):
+    def failing_bulk_write(operations, ordered=True):
+        raise RuntimeError('MongoDB indisponibil')
+
+    monkeypatch.setattr(db.contents_collection, 'bulk_write', failing_bulk_write)
+    with pytest.raises(RuntimeError):
+        db._store_contents({'h1': 'text'})
+    assert not database._stored_contents.get('h1')
+
+    monkeypatch.undo()
+    db._store_contents({'h1': 'text'})
+    assert database._stored_contents.get('h1')
+    assert db.get_contents(['h1']) == {'h1': 'text'}
+
+
+def test_migration_moves_text_to_contents(db):
+    db.history_collection.insert_many([{'url': f'http://a/{idx}', 'text': 'same text'} for idx in range(3)])
+    assert migrate_collection(db, db.history_collection, batch_size=2, pause=0) == 3
+    docs = list(db.history_collection.find())
+    assert all('text' not in doc for doc in docs)
+    assert db.resolve_texts(docs) == ['same text'] * 3
+    assert db.contents_collection.count_documents({}) == 1
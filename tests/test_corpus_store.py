@@ -0,0 +1,57 @@
+import datetime
+
+from server.scripts.corpus_store import load_documents
+
+
+class Scraper:
+    def __init__(self, pages):
+        self.pages = pages
+        self.requested = []
+
+    def __call__(self, links):
+        self.requested.extend(links)
+        return [self.pages.get(link, '') for link in links]
+
+
+def age_documents(db, days):
+    db.corpus_collection.update_many({}, {'$set': {'checked_at': datetime.datetime.now() - datetime.timedelta(days=days)}})
+
+
+def test_fresh_documents_are_reused(db):
+    load_documents(db, ['a', 'b'], Scraper({'a': 'text a', 'b': 'text b'}))
+    scraper = Scraper({'a': 'new a', 'b': 'new b'})
+    assert load_documents(db, ['a', 'b', 'a'], scraper, max_age_days=30) == ['text a', 'text b', 'text a']
+    assert scraper.requested == []
+
+
+def test_failed_scrapes_are_not_stored(db):
+    assert load_documents(db, ['a', 'b'], Scraper({'a': 'text a'})) == ['text a', '']
+    scraper = Scraper({'b': 'text b'})
+    assert load_documents(db, ['a', 'b'], scraper) == ['text a', 'text b']
+    assert scraper.requested == ['b']
+
+
+def test_stale_documents_are_refreshed_when_changed(db):
+    load_documents(db, ['a', 'b'], Scraper({'a': 'text a', 'b': 'text b'}))
+    age_documents(db, 40)
+    scraper = Scraper({'a': 'text a', 'b': 'changed b'})
+    assert load_documents(db, ['a', 'b'], scraper, max_age_days=30) == ['text a', 'changed b']
+    assert scraper.requested == ['a', 'b']
+    # Ambele au fost verificate acum: nu se mai extrag la următoarea rulare
+    scraper = Scraper({})
+    assert load_documents(db, ['a', 'b'], scraper, max_age_days=30) == ['text a', 'changed b']
+    assert scraper.requested == []
+
+
+def test_stale_document_kept_when_refresh_fails(db):
+    load_documents(db, ['a'], Scraper({'a': 'text a'}))
+    age_documents(db, 40)
+    assert load_documents(db, ['a'], Scraper({}), max_age_days=30) == ['text a']
+
+
+def test_zero_max_age_never_refreshes(db):
+    load_documents(db, ['a'], Scraper({'a': 'text a'}))
+    age_documents(db, 4000)
+    scraper = Scraper({'a': 'changed'})
+    assert load_documents(db, ['a'], scraper, max_age_days=0) == ['text a']
+    assert scraper.requested == []
@@ -0,0 +1,137 @@
+import pytest
+from requests import Response
+from requests.exceptions import ConnectionError, HTTPError
+
+from server.scripts import fetch_policy
+from server.scripts.fetch_policy import CLOSED, HALF_OPEN, OPEN, CircuitOpenError, FetchPolicy
+
+URL = 'http://site.test/page'
+HOST = 'site.test'
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class FakeAttempt:
+    """Răspunde cu valorile din outcomes, în ordine; o excepție din listă este aruncată."""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.timeouts = []
+
+    def __call__(self, timeouts):
+        self.timeouts.append(timeouts)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(fetch_policy, 'time', clock)
+    monkeypatch.setattr(fetch_policy, 'FAILURE_THRESHOLD', 3)
+    monkeypatch.setattr(fetch_policy, 'OPEN_SECONDS', 60)
+    monkeypatch.setattr(fetch_policy, 'OPEN_SECONDS_MAX', 200)
+    monkeypatch.setattr(fetch_policy, 'RETRIES', 0)
+    return clock
+
+
+def _http_error(status):
+    response = Response()
+    response.status_code = status
+    return HTTPError(response=response)
+
+
+def _fail(policy, count):
+    for _ in range(count):
+        with pytest.raises(ConnectionError):
+            policy.call(URL, 30, FakeAttempt(ConnectionError('refuzat')))
+
+
+def test_circuit_opens_after_consecutive_failures(clock):
+    policy = FetchPolicy()
+    _fail(policy, 2)
+    assert policy._hosts[HOST].state == CLOSED
+    _fail(policy, 1)
+    assert policy._hosts[HOST].state == OPEN
+
+    attempt = FakeAttempt('nefolosit')
+    with pytest.raises(CircuitOpenError) as error:
+        policy.call(URL, 30, attempt)
+    assert error.value.retry_after == pytest.approx(60)
+    assert attempt.timeouts == []
+
+
+def test_half_open_allows_a_single_trial(clock):
+    policy = FetchPolicy()
+    _fail(policy, 3)
+    clock.now += 61
+
+    def trial(timeouts):
+        # Cât timp proba rulează, celelalte cereri către domeniu sunt refuzate
+        assert policy._hosts[HOST].state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            policy.call(URL, 30, FakeAttempt('nefolosit'))
+        return 'pagina'
+
+    assert policy.call(URL, 30, trial) == 'pagina'
+    state = policy._hosts[HOST]
+    assert state.state == CLOSED
+    assert state.consecutive_failures == 0
+    assert state.open_seconds == 60
+
+
+def test_failed_trial_reopens_with_doubled_interval(clock):
+    policy = FetchPolicy()
+    _fail(policy, 3)
+    for expected in (120, 200):
+        clock.now += policy._hosts[HOST].open_seconds + 1
+        _fail(policy, 1)
+        state = policy._hosts[HOST]
+        assert state.state == OPEN
+        assert state.open_seconds == expected
+        assert state.open_until == pytest.approx(clock.now + expected)
+
+
+def test_retryable_errors_are_retried_within_the_same_call(clock, monkeypatch):
+    monkeypatch.setattr(fetch_policy, 'RETRIES', 2)
+    policy = FetchPolicy()
+    attempt = FakeAttempt(ConnectionError('resetat'), _http_error(503), 'pagina')
+    assert policy.call(URL, 30, attempt) == 'pagina'
+    assert len(attempt.timeouts) == 3
+    assert policy._hosts[HOST].state == CLOSED
+    assert policy._hosts[HOST].failures == 2
+    assert policy._hosts[HOST].consecutive_failures == 0
+
+
+def test_non_retryable_errors_leave_the_circuit_alone(clock, monkeypatch):
+    monkeypatch.setattr(fetch_policy, 'RETRIES', 2)
+    policy = FetchPolicy()
+    for _ in range(5):
+        attempt = FakeAttempt(_http_error(404))
+        with pytest.raises(HTTPError):
+            policy.call(URL, 30, attempt)
+        assert len(attempt.timeouts) == 1
+    state = policy._hosts[HOST]
+    assert state.state == CLOSED
+    assert state.failures == 0
+
+
+def test_non_retryable_error_during_trial_frees_the_trial(clock):
+    policy = FetchPolicy()
+    _fail(policy, 3)
+    clock.now += 61
+    with pytest.raises(HTTPError):
+        policy.call(URL, 30, FakeAttempt(_http_error(404)))
+    assert policy.call(URL, 30, FakeAttempt('pagina')) == 'pagina'
+    assert policy._hosts[HOST].state == CLOSED
@@ -0,0 +1,43 @@
+import datetime
+
+from server import main
+
+
+def add_history(db, count, user_id='u1'):
+    start = datetime.datetime(2026, 1, 1)
+    db.save_many_to_history([
+        {'url': f'http://example.com/{idx}', 'text': f'text {idx}', 'prediction': 'WORLD',
+         'timestamp': start + datetime.timedelta(minutes=idx)}
+        for idx in range(count)
+    ], user_id)
+
+
+def test_history_pages_follow_cursor(db):
+    add_history(db, 7)
+    client = main.app.test_client()
+    seen = []
+    cursor = None
+    while True:
+        response = client.get('/history', query_string={'user_id': 'u1', 'limit': 3, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        page = response.get_json()
+        assert all('text' not in item for item in page)
+        seen.extend(item['url'] for item in page)
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            break
+    assert len(seen) == 7 and len(set(seen)) == 7
+
+
+def test_invalid_cursor_is_rejected(db):
+    response = main.app.test_client().get('/history', query_string={'cursor': 'not-a-cursor'})
+    assert response.status_code == 400
+
+
+def test_migration_drops_redundant_history_indexes(db):
+    db.history_collection.create_index([('user_id', 1)])
+    db.history_collection.create_index([('timestamp', -1)])
+    db.ensure_indexes()
+    indexes = db.history_collection.index_information()
+    assert 'user_id_1' not in indexes and 'timestamp_-1' not in indexes
+    assert 'user_id_1_timestamp_-1__id_-1' in indexes
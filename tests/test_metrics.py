@@ -0,0 +1,39 @@
+import os
+
+import pytest
+
+from server.scripts import metrics
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, 'METRICS_DIR', str(tmp_path))
+    yield tmp_path
+    metrics.reset('process')
+
+
+def _model_loads():
+    histograms, _ = metrics._merged()
+    return sum(value['count'] for (name, labels), value in histograms.items()
+               if name == 'stage_duration_seconds' and dict(labels)['stage'] == 'model_load')
+
+
+def test_worker_does_not_report_measurements_inherited_from_master(metrics_dir):
+    # Masterul preîncarcă modelul și își scrie fișierul; workerul pornește cu valori goale
+    with metrics.timed('model_load'):
+        pass
+    metrics.set_role('master')
+    metrics.flush()
+    metrics.reset('worker')
+    metrics.inc('page_analyses_total', source='model')
+    metrics.flush()
+
+    assert sorted(os.listdir(metrics_dir)) == [f'metrics-master-{os.getpid()}.json', f'metrics-worker-{os.getpid()}.json']
+    assert _model_loads() == 1
+
+
+def test_clear_snapshots_keeps_files_of_other_processes(metrics_dir):
+    for name in ('metrics-master-1.json', 'metrics-worker-2.json', 'metrics-process-3.json'):
+        (metrics_dir / name).write_text('{}')
+    metrics.clear_snapshots()
+    assert os.listdir(metrics_dir) == ['metrics-process-3.json']
@@ -0,0 +1,17 @@
+from server.scripts import prediction
+
+
+def test_cached_batch_is_read_with_one_lookup(db, monkeypatch):
+    urls = ['http://a.test/', 'http://b.test/?utm_source=x', 'http://b.test/']
+    db.save_to_cache('http://a.test/', 'text a', 'WORLD')
+    db.save_to_cache('http://b.test/', 'text b', 'SCIENCE')
+
+    def check_cache(url):
+        raise AssertionError('lotul trebuie citit cu check_cache_many')
+
+    monkeypatch.setattr(db, 'check_cache', check_cache)
+    results = prediction._predict_batch(urls, None, 'b1')
+
+    assert [result['predicted_topic'] for result in results] == ['WORLD', 'SCIENCE', 'SCIENCE']
+    assert all(result['from_cache'] for result in results)
+    assert db.history_collection.count_documents({'batch_id': 'b1'}) == 3
@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+import pytest
+
+from server.scripts import preprocess
+from server.scripts.preprocess import split_chunks
+
+
+def _sentences(count):
+    return ' '.join(f"Sentence number {idx} talks about topic{idx}." for idx in range(count))
+
+
+def test_short_text_stays_whole():
+    text = _sentences(5)
+    assert split_chunks(text, threshold=len(text)) == [text]
+
+
+def test_long_text_is_split_at_sentence_boundaries():
+    text = _sentences(200)
+    chunks = split_chunks(text, threshold=100, chunk_chars=500)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 500 for chunk in chunks)
+    assert all(chunk.endswith('.') for chunk in chunks)
+    assert ' '.join(chunks) == text
+
+
+def test_sentence_longer_than_a_chunk_is_cut_at_spaces():
+    text = ' '.join(f"word{idx}" for idx in range(300))
+    chunks = split_chunks(text, threshold=100, chunk_chars=200)
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert ' '.join(chunks).split() == text.split()
+
+
+def test_text_beyond_max_chars_is_dropped():
+    text = _sentences(100)
+    chunks = split_chunks(text, threshold=100, chunk_chars=500, max_chars=1000)
+    assert ' '.join(chunks) == text[:1000]
+
+
+class FakeNlp:
+    """Fiecare cuvânt devine un substantiv cu lema în litere mici; se rețin textele primite."""
+
+    def __init__(self):
+        self.texts = []
+
+    def pipe(self, items, as_tuples, batch_size, n_process):
+        for text, idx in items:
+            self.texts.append(text)
+            yield [SimpleNamespace(text=word, lemma_=word.lower(), pos_='NOUN', ent_type_='')
+                   for word in text.split()], idx
+
+
+@pytest.fixture
+def nlp(monkeypatch):
+    nlp = FakeNlp()
+    monkeypatch.setattr(preprocess, 'get_nlp', lambda: nlp)
+    monkeypatch.setattr(preprocess, 'get_stop_words', lambda: frozenset({'about'}))
+    return nlp
+
+
+def test_chunked_and_whole_texts_keep_input_order(nlp, monkeypatch):
+    monkeypatch.setattr(preprocess.split_chunks, '__defaults__', (1000, 300, preprocess.MAX_CHARS))
+    large, small = _sentences(100), 'Short page about cats.'
+
+    results = preprocess.preprocess_texts([large, small, large], n_process=1)
+    expected_large = ' '.join(preprocess._clean(large).lower().replace('about ', '').split())
+    assert results == [expected_large, 'short page cats', expected_large]
+    assert max(len(text) for text in nlp.texts) <= 300
+
+
+def test_max_tokens_caps_words_and_stops_feeding_chunks(nlp, monkeypatch):
+    monkeypatch.setattr(preprocess.split_chunks, '__defaults__', (1000, 300, preprocess.MAX_CHARS))
+    monkeypatch.setattr(preprocess, 'CHUNK_BATCH_SIZE', 1)
+    large = _sentences(500)
+
+    result = preprocess.preprocess_texts([large], n_process=1, max_tokens=10)
+    assert len(result[0].split()) == 10
+    assert len(nlp.texts) < len(split_chunks(large, 1000, 300))
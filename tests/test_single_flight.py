@@ -0,0 +1,99 @@
+import datetime
+import threading
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+from server.scripts.single_flight import SingleFlight
+
+
+def _lease(key, owner, seconds, **fields):
+    return dict({'_id': key, 'owner': owner, 'done': False,
+                 'expires_at': datetime.datetime.utcnow() + datetime.timedelta(seconds=seconds)}, **fields)
+
+
+def test_live_lease_of_other_worker_is_not_acquired(db):
+    db.leases_collection.insert_one(_lease('k', 'other', 60))
+    assert db.acquire_leases(['k', 'free'], 'me', 60) == {'free'}
+    assert db.leases_collection.find_one({'_id': 'k'})['owner'] == 'other'
+
+
+def test_expired_lease_is_taken_over(db):
+    db.leases_collection.insert_one(_lease('k', 'other', -5, result='vechi'))
+    assert db.acquire_leases(['k'], 'me', 60) == {'k'}
+    lease = db.leases_collection.find_one({'_id': 'k'})
+    assert lease['owner'] == 'me'
+    assert 'result' not in lease
+
+
+def test_non_duplicate_lease_errors_are_raised(db, monkeypatch):
+    def insert_many(documents, ordered=True):
+        raise BulkWriteError({'writeErrors': [{'index': 0, 'code': 121, 'errmsg': 'validare eșuată'}]})
+
+    monkeypatch.setattr(db.leases_collection, 'insert_many', insert_many)
+    with pytest.raises(BulkWriteError):
+        db.acquire_leases(['k'], 'me', 60)
+    # run_many calculează local când lease-urile nu pot fi scrise
+    assert SingleFlight(poll_interval=0.01).run_many(['k'], lambda keys: {key: 1 for key in keys}) == {'k': 1}
+
+
+def test_result_published_by_other_worker_is_reused(db):
+    db.leases_collection.insert_one(_lease('k', 'other', 60, done=True, result={'prediction': 'WORLD'}))
+
+    def compute():
+        raise AssertionError('rezultatul trebuia preluat din lease')
+
+    assert SingleFlight(poll_interval=0.01).run('k', compute) == {'prediction': 'WORLD'}
+
+
+def test_leases_are_released_when_compute_fails(db):
+    flight = SingleFlight(poll_interval=0.01)
+
+    def failing(keys):
+        raise RuntimeError('extragere eșuată')
+
+    with pytest.raises(RuntimeError):
+        flight.run_many(['a', 'b'], failing)
+    assert db.leases_collection.count_documents({}) == 0
+    assert flight.run_many(['a', 'b'], lambda keys: {key: key.upper() for key in keys}) == {'a': 'A', 'b': 'B'}
+    assert db.leases_collection.find_one({'_id': 'a'})['done']
+
+
+def test_concurrent_callers_in_process_share_one_computation(db):
+    flight = SingleFlight(poll_interval=0.01)
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'rezultat'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.run('k', compute)))
+    leader.start()
+    assert started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.run('k', compute)))
+    follower.start()
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    assert results == ['rezultat', 'rezultat']
+    assert calls == [1]
+
+
+def test_error_outcome_is_not_replayed_to_later_requests(db):
+    flight = SingleFlight(poll_interval=0.01)
+    outcomes = iter([{'error': 'Connection refused'}, {'prediction': 'WORLD'}])
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return next(outcomes)
+
+    assert flight.run('k', compute) == {'error': 'Connection refused'}
+    assert db.leases_collection.count_documents({}) == 0
+    assert flight.run('k', compute) == {'prediction': 'WORLD'}
+    assert len(calls) == 2
+    assert db.leases_collection.find_one({'_id': 'k'})['result'] == {'prediction': 'WORLD'}
@@ -0,0 +1,121 @@
+import os
+import datetime
+import threading
+
+import pytest
+
+from server.scripts import trainer
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    """Un runner fals cu etapele unei antrenări; during_train rulează în etapa train_nb."""
+    calls = {'published': 0, 'during_train': None}
+
+    def run(job, timer):
+        with timer.stage('train_nb'):
+            if calls['during_train']:
+                calls['during_train']()
+        with timer.stage(trainer.PUBLISH_STAGE):
+            calls['published'] += 1
+        return 'antrenat'
+
+    monkeypatch.setitem(trainer.RUNNERS, 'csv', run)
+    monkeypatch.setattr(trainer, 'read_current_version', lambda: 'v2')
+    return calls
+
+
+@pytest.fixture
+def upload(tmp_path):
+    path = tmp_path / 'job.csv'
+    path.write_text('Link,Topic\n')
+    return str(path)
+
+
+def _stale_before(seconds=trainer.STALE_SECONDS):
+    return datetime.datetime.now() - datetime.timedelta(seconds=seconds)
+
+
+def test_job_is_claimed_and_completed(db, runner, upload):
+    db.create_training_job('j1', 'csv', {'file_path': upload})
+    assert trainer.run_once(db, 'a')
+    assert not trainer.run_once(db, 'a')
+
+    job = db.get_training_job('j1')
+    assert job['status'] == 'completed'
+    assert job['worker'] == 'a'
+    assert job['attempts'] == 1
+    assert job['result']['model_version'] == 'v2'
+    assert set(job['timings']) == {'train_nb', 'save_model'}
+    assert runner['published'] == 1
+    assert not os.path.exists(upload)
+
+
+def test_stale_job_is_reclaimed(db):
+    db.create_training_job('j1', 'csv', {'file_path': 'x.csv'})
+    assert db.claim_training_job('a', _stale_before())['worker'] == 'a'
+    # Un job cu heartbeat recent nu este preluat
+    assert db.claim_training_job('b', _stale_before()) is None
+
+    job = db.claim_training_job('b', datetime.datetime.now() + datetime.timedelta(seconds=1))
+    assert job['worker'] == 'b'
+    assert job['attempts'] == 2
+    assert not db.update_training_job('j1', 'a', 'train_nb')
+    assert not db.finish_training_job('j1', 'a', 'failed', 'vechi')
+    assert db.get_training_job('j1')['status'] == 'running'
+
+
+def test_takeover_cancels_before_publishing(db, runner, upload):
+    db.create_training_job('j1', 'csv', {'file_path': upload})
+    job = db.claim_training_job('a', _stale_before())
+
+    def takeover():
+        db.training_jobs_collection.update_one({'_id': 'j1'}, {'$set': {'worker': 'b'}})
+
+    runner['during_train'] = takeover
+    trainer.run_job(db, job, 'a')
+
+    assert runner['published'] == 0
+    stored = db.get_training_job('j1')
+    assert stored['status'] == 'running'
+    assert stored['worker'] == 'b'
+    # Fișierul rămâne pentru trainerul care a preluat jobul
+    assert os.path.exists(upload)
+
+
+def test_heartbeat_sets_cancel_flag_when_job_is_lost(db, monkeypatch):
+    monkeypatch.setattr(trainer, 'HEARTBEAT_SECONDS', 0.01)
+    db.create_training_job('j1', 'csv', {'file_path': 'x.csv'})
+    db.claim_training_job('b', _stale_before())
+
+    stop, cancelled = threading.Event(), threading.Event()
+    heartbeat = threading.Thread(target=trainer._heartbeat, args=(db, 'j1', 'a', stop, cancelled))
+    heartbeat.start()
+    heartbeat.join(5)
+    stop.set()
+    assert cancelled.is_set()
+    with pytest.raises(trainer.JobCancelled):
+        trainer._start_stage(db, 'j1', 'a', 'vectorize', cancelled)
+
+
+def test_database_error_blocks_only_the_publish_stage(db, monkeypatch):
+    def failing_update(*args, **kwargs):
+        raise RuntimeError('MongoDB indisponibil')
+
+    monkeypatch.setattr(db, 'update_training_job', failing_update)
+    cancelled = threading.Event()
+    trainer._start_stage(db, 'j1', 'a', 'scrape', cancelled)
+    with pytest.raises(RuntimeError):
+        trainer._start_stage(db, 'j1', 'a', trainer.PUBLISH_STAGE, cancelled)
+    assert not cancelled.is_set()
+
+
+def test_job_interrupted_too_often_fails(db, runner, monkeypatch):
+    monkeypatch.setattr(trainer, 'MAX_ATTEMPTS', 1)
+    db.create_training_job('j1', 'csv', {'file_path': 'x.csv'})
+    db.training_jobs_collection.update_one({'_id': 'j1'}, {'$set': {'attempts': 1}})
+    assert trainer.run_once(db, 'a')
+
+    job = db.get_training_job('j1')
+    assert job['status'] == 'failed'
+    assert runner['published'] == 0
@@ -0,0 +1,108 @@
+import pytest
+import mongomock
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import AutoReconnect
+
+from server.scripts.write_buffer import WriteBehindBuffer
+
+
+class FlakyCollection:
+    """Colecție care eșuează de failures ori înainte de a scrie în colecția mongomock dată."""
+
+    def __init__(self, collection, failures):
+        self.collection = collection
+        self.failures = failures
+        self.calls = 0
+        self.name = collection.name
+        self.full_name = collection.full_name
+
+    def bulk_write(self, operations, ordered=True):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect('conexiune pierdută')
+        return self.collection.bulk_write(operations, ordered=ordered)
+
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient()['test']['items']
+
+
+def make_buffer(**kwargs):
+    return WriteBehindBuffer(max_batch=10, flush_interval=0.01, backoff=0, **kwargs)
+
+
+def test_flush_writes_queued_operations(collection):
+    buffer = make_buffer()
+    for idx in range(25):
+        buffer.put(collection, InsertOne({'_id': idx}))
+    buffer.flush()
+    assert collection.count_documents({}) == 25
+    assert buffer.stats()['flushed'] == 25
+
+
+def test_operations_with_same_key_collapse_to_last(collection):
+    buffer = make_buffer()
+    batch = [(collection, UpdateOne({'_id': 'a'}, {'$set': {'v': value}}, upsert=True), 'a', None) for value in range(3)]
+    buffer._write_with_retries(batch)
+    assert collection.find_one({'_id': 'a'})['v'] == 2
+    assert buffer.stats()['flushed'] == 1
+
+
+def test_transient_failure_is_retried(collection):
+    flaky = FlakyCollection(collection, failures=2)
+    buffer = make_buffer(retries=3)
+    buffer.put(flaky, InsertOne({'_id': 1}))
+    buffer.flush()
+    assert collection.count_documents({}) == 1
+    assert flaky.calls == 3
+    stats = buffer.stats()
+    assert stats['retried'] == 2
+    assert stats['dead_letters'] == 0
+    assert not stats['degraded']
+
+
+def test_exhausted_retries_dead_letter_and_switch_to_sync(collection):
+    flaky = FlakyCollection(collection, failures=3)
+    buffer = make_buffer(retries=2)
+    buffer.put(flaky, InsertOne({'_id': 1}))
+    buffer.flush()
+    stats = buffer.stats()
+    assert stats['dead_letters'] == 1
+    assert stats['degraded']
+
+    # În modul degradat scrierea este sincronă și eroarea ajunge la apelant
+    flaky.failures = 1
+    with pytest.raises(AutoReconnect):
+        buffer.put(flaky, InsertOne({'_id': 2}))
+    assert buffer.stats()['degraded']
+
+    buffer.put(flaky, InsertOne({'_id': 3}))
+    assert not buffer.stats()['degraded']
+    assert collection.count_documents({'_id': 3}) == 1
+
+
+def test_duplicate_key_counts_as_written(collection):
+    collection.insert_one({'_id': 1})
+    buffer = make_buffer()
+    buffer._write_with_retries([(collection, InsertOne({'_id': 1}), None, None), (collection, InsertOne({'_id': 2}), None, None)])
+    stats = buffer.stats()
+    assert stats['flushed'] == 2
+    assert stats['dead_letters'] == 0
+    assert collection.count_documents({}) == 2
+
+
+def test_on_written_runs_only_after_successful_write(collection):
+    written = []
+    flaky = FlakyCollection(collection, failures=3)
+    buffer = make_buffer(retries=1)
+    buffer.put(flaky, InsertOne({'_id': 1}), on_written=lambda: written.append(1))
+    buffer.flush()
+    assert written == []
+
+    with pytest.raises(AutoReconnect):
+        buffer.put(flaky, InsertOne({'_id': 2}), on_written=lambda: written.append(2))
+    assert written == []
+    buffer.put(flaky, InsertOne({'_id': 3}), on_written=lambda: written.append(3))
+    assert written == [3]